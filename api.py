@@ -1,24 +1,35 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+import time
+_inicio_importacao = time.perf_counter()
+
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.responses import FileResponse, JSONResponse, Response, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+import asyncio
 import tempfile
 import os
 import shutil
 from pathlib import Path
 import logging
-import time
+import io
+import json
+import hashlib
+import hmac
+import threading
+import zipfile
+import uuid
+from typing import List, Optional
+from collections import OrderedDict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from multipart.multipart import MultipartParser, parse_options_header
 
-# Importa as funções do main.py
-from main import (
-    validar_arquivo_entrada,
-    extrair_dados_cabecalho,
-    identificar_e_extrair_tabelas,
-    gerar_word_evolucao,
-    carregar_configuracao,
-    CONFIG_PADRAO
-)
+# As funções do main.py (python-docx + lxml) são importadas no primeiro uso,
+# dentro de cada função, para não atrasar a inicialização da API; o startup
+# inicia o aquecimento (importação + template) em segundo plano
+from metricas import exportar_prometheus, medir_etapa, registrar_tamanho_arquivo
+from perfil import executar_com_perfil, novo_id_perfil, caminhos_perfil, carregar_resumo_perfil
 
 # Configuração de logging
 logging.basicConfig(
@@ -49,6 +60,370 @@ app.add_middleware(
 Path("temp_uploads").mkdir(exist_ok=True)
 Path("temp_outputs").mkdir(exist_ok=True)
 
+# Pool de workers para o processamento dos documentos (CPU + disco),
+# fora do event loop. Configurável por variáveis de ambiente.
+WORKERS_PROCESSAMENTO = max(1, int(os.environ.get("WORKERS_PROCESSAMENTO", "2")))
+FILA_MAXIMA_PROCESSAMENTO = max(0, int(os.environ.get("FILA_MAXIMA_PROCESSAMENTO", "8")))
+RETRY_AFTER_SEGUNDOS = int(os.environ.get("RETRY_AFTER_SEGUNDOS", "10"))
+# Limite de tamanho por arquivo enviado (verificado durante a leitura, em blocos)
+TAMANHO_MAXIMO_UPLOAD_MB = float(os.environ.get("TAMANHO_MAXIMO_UPLOAD_MB", "50"))
+TAMANHO_MAXIMO_UPLOAD = int(TAMANHO_MAXIMO_UPLOAD_MB * 1024 * 1024)
+TAMANHO_BLOCO_UPLOAD = 1024 * 1024
+# Uploads até este tamanho são processados inteiramente em memória (sem arquivos temporários)
+LIMITE_PROCESSAMENTO_EM_MEMORIA = int(float(os.environ.get("LIMITE_PROCESSAMENTO_EM_MEMORIA_MB", "10")) * 1024 * 1024)
+# Processos do pool de /processar-lote, criado uma vez e mantido (padrão: WORKERS_PROCESSAMENTO)
+WORKERS_LOTE = max(1, int(os.environ.get("WORKERS_LOTE", "0")) or WORKERS_PROCESSAMENTO)
+
+# Jobs assíncronos (POST /jobs): pool próprio, fila e tempo de retenção dos resultados
+WORKERS_JOBS = max(1, int(os.environ.get("WORKERS_JOBS", "2")))
+FILA_MAXIMA_JOBS = max(0, int(os.environ.get("FILA_MAXIMA_JOBS", "50")))
+TTL_JOBS_SEGUNDOS = int(os.environ.get("TTL_JOBS_SEGUNDOS", "900"))
+JOBS_RESULTADOS_MAX_BYTES = int(float(os.environ.get("JOBS_RESULTADOS_MAX_MB", "64")) * 1024 * 1024)
+
+# Token dos recursos de administrador (perfil de CPU/memória); vazio = recursos desativados
+TOKEN_ADMIN = os.environ.get("TOKEN_ADMIN", "")
+
+executor_processamento = ThreadPoolExecutor(
+    max_workers=WORKERS_PROCESSAMENTO,
+    thread_name_prefix="processamento"
+)
+
+executor_jobs = ThreadPoolExecutor(
+    max_workers=WORKERS_JOBS,
+    thread_name_prefix="jobs"
+)
+
+# Arquivos em processamento + aguardando na fila (acessado só no event loop)
+_tarefas_processamento = 0
+CAPACIDADE_PROCESSAMENTO = WORKERS_PROCESSAMENTO + FILA_MAXIMA_PROCESSAMENTO
+
+def reservar_vaga_processamento(vagas=1):
+    """
+    Reserva vagas no pool (uma por arquivo) ou lança 503 (com Retry-After) se
+    a fila não as comportar.
+    """
+    global _tarefas_processamento
+    if _tarefas_processamento + vagas > CAPACIDADE_PROCESSAMENTO:
+        logger.warning(f"Fila de processamento cheia ({_tarefas_processamento}+{vagas}/{CAPACIDADE_PROCESSAMENTO}) - requisicao recusada")
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado processando outros arquivos. Tente novamente em instantes.",
+            headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)}
+        )
+    _tarefas_processamento += vagas
+
+def liberar_vaga_processamento(vagas=1):
+    """Libera as vagas reservadas por reservar_vaga_processamento()."""
+    global _tarefas_processamento
+    _tarefas_processamento -= vagas
+
+def vagas_lote(quantidade_arquivos):
+    """Vagas ocupadas por um lote: uma por arquivo, até a capacidade inteira da fila."""
+    return min(max(1, quantidade_arquivos), CAPACIDADE_PROCESSAMENTO)
+
+# Pool de processos do lote: criado no aquecimento (ou no primeiro lote) e mantido,
+# para que cada worker carregue o template uma única vez
+executor_lote = None
+_lock_executor_lote = threading.Lock()
+
+def obter_executor_lote():
+    """Pool de processos de /processar-lote (criado uma única vez, com o template padrão)."""
+    global executor_lote
+    with _lock_executor_lote:
+        if executor_lote is None:
+            from main import carregar_configuracao, criar_pool_lote
+            executor_lote = criar_pool_lote(WORKERS_LOTE, carregar_configuracao()["caminho_template"])
+            logger.info(f"Pool de processos do lote criado: {WORKERS_LOTE} worker(s)")
+        return executor_lote
+
+def descartar_executor_lote(executor):
+    """Descarta o pool (ex.: um worker morreu e o pool quebrou); o próximo lote cria outro."""
+    global executor_lote
+    with _lock_executor_lote:
+        if executor_lote is executor:
+            executor_lote = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+async def executar_no_pool(funcao, *args):
+    """Executa uma função síncrona no pool de workers sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor_processamento, funcao, *args)
+
+# Cache de resultados: mesma entrada + mesma configuração + mesmo template → mesma evolução.
+# Camada em memória (LRU limitada em MB) e camada opcional em disco (CACHE_RESULTADOS_DIR).
+CACHE_RESULTADOS_MAX_BYTES = int(float(os.environ.get("CACHE_RESULTADOS_MAX_MB", "64")) * 1024 * 1024)
+CACHE_RESULTADOS_DIR = os.environ.get("CACHE_RESULTADOS_DIR", "")
+CACHE_RESULTADOS_DISCO_MAX_BYTES = int(float(os.environ.get("CACHE_RESULTADOS_DISCO_MAX_MB", "512")) * 1024 * 1024)
+
+_cache_resultados = OrderedDict()
+_cache_resultados_bytes = 0
+_lock_cache_resultados = threading.Lock()
+estatisticas_cache_resultados = {
+    "acertos_memoria": 0,
+    "acertos_disco": 0,
+    "falhas": 0,
+    "armazenados": 0,
+    "removidos": 0
+}
+
+def calcular_chave_cache(entrada, config, caminho_template=None):
+    """
+    Chave do cache de resultados: hash do arquivo enviado + configuração efetiva
+    + impressão digital do template. Retorna None se o template não puder ser carregado.
+    """
+    from main import obter_template
+    template = obter_template(caminho_template or config["caminho_template"])
+    if template is None:
+        return None
+    
+    hash_entrada = hashlib.sha256()
+    if isinstance(entrada, io.BytesIO):
+        hash_entrada.update(entrada.getbuffer())
+    elif isinstance(entrada, str):
+        with open(entrada, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO_UPLOAD), b''):
+                hash_entrada.update(bloco)
+    else:
+        # Upload em disco (arquivo temporário do Starlette)
+        entrada.seek(0)
+        for bloco in iter(lambda: entrada.read(TAMANHO_BLOCO_UPLOAD), b''):
+            hash_entrada.update(bloco)
+        entrada.seek(0)
+    
+    hash_config = hashlib.sha256(
+        json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+    
+    return hashlib.sha256(
+        f"{hash_entrada.hexdigest()}:{hash_config}:{template['hash']}".encode('utf-8')
+    ).hexdigest()
+
+def _caminho_cache_disco(chave):
+    return os.path.join(CACHE_RESULTADOS_DIR, f"{chave}.docx")
+
+def _caminho_contagem_cache_disco(chave):
+    return os.path.join(CACHE_RESULTADOS_DIR, f"{chave}.json")
+
+def _guardar_cache_memoria(chave, conteudo, contagem):
+    """Guarda o resultado na camada em memória, removendo os menos usados se necessário."""
+    global _cache_resultados_bytes
+    if len(conteudo) > CACHE_RESULTADOS_MAX_BYTES:
+        return
+    with _lock_cache_resultados:
+        if chave in _cache_resultados:
+            _cache_resultados.move_to_end(chave)
+            return
+        _cache_resultados[chave] = (conteudo, contagem)
+        _cache_resultados_bytes += len(conteudo)
+        while _cache_resultados_bytes > CACHE_RESULTADOS_MAX_BYTES:
+            _, (removido, _) = _cache_resultados.popitem(last=False)
+            _cache_resultados_bytes -= len(removido)
+            estatisticas_cache_resultados["removidos"] += 1
+
+def _limpar_cache_disco():
+    """Remove os arquivos menos usados do cache em disco até respeitar o limite."""
+    arquivos = []
+    for nome in os.listdir(CACHE_RESULTADOS_DIR):
+        if nome.endswith('.docx'):
+            info = os.stat(os.path.join(CACHE_RESULTADOS_DIR, nome))
+            arquivos.append((info.st_mtime, info.st_size, nome))
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, nome in sorted(arquivos):
+        if total <= CACHE_RESULTADOS_DISCO_MAX_BYTES:
+            break
+        cleanup_files(os.path.join(CACHE_RESULTADOS_DIR, nome))
+        cleanup_files(os.path.join(CACHE_RESULTADOS_DIR, nome[:-len('.docx')] + '.json'))
+        total -= tamanho
+
+def obter_resultado_cache(chave):
+    """
+    Retorna (bytes do resultado, atendimentos por especialidade) do cache
+    (memória ou disco) ou None.
+    """
+    if chave is None:
+        return None
+    
+    with _lock_cache_resultados:
+        entrada_cache = _cache_resultados.get(chave)
+        if entrada_cache is not None:
+            _cache_resultados.move_to_end(chave)
+            estatisticas_cache_resultados["acertos_memoria"] += 1
+            return entrada_cache
+    
+    if CACHE_RESULTADOS_DIR:
+        caminho = _caminho_cache_disco(chave)
+        try:
+            # A contagem é gravada antes do .docx; sem ela, a entrada é tratada como falha
+            with open(_caminho_contagem_cache_disco(chave), encoding='utf-8') as f:
+                contagem = json.load(f)
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+            os.utime(caminho)  # marca como usado recentemente
+        except (OSError, ValueError):
+            conteudo = None
+        if conteudo is not None:
+            with _lock_cache_resultados:
+                estatisticas_cache_resultados["acertos_disco"] += 1
+            _guardar_cache_memoria(chave, conteudo, contagem)
+            return conteudo, contagem
+    
+    with _lock_cache_resultados:
+        estatisticas_cache_resultados["falhas"] += 1
+    return None
+
+def guardar_resultado_cache(chave, saida, contagem):
+    """
+    Guarda no cache o resultado gerado (BytesIO ou caminho do arquivo) e a
+    contagem de atendimentos por especialidade.
+    """
+    if chave is None:
+        return
+    
+    try:
+        if isinstance(saida, io.BytesIO):
+            conteudo = saida.getvalue()
+        elif os.path.getsize(saida) <= CACHE_RESULTADOS_MAX_BYTES:
+            with open(saida, 'rb') as f:
+                conteudo = f.read()
+        else:
+            conteudo = None
+        
+        if conteudo is not None:
+            _guardar_cache_memoria(chave, conteudo, contagem)
+        
+        if CACHE_RESULTADOS_DIR:
+            # Grava em arquivo temporário e renomeia (nunca expõe arquivo parcial)
+            os.makedirs(CACHE_RESULTADOS_DIR, exist_ok=True)
+            caminho = _caminho_cache_disco(chave)
+            temporario = f"{caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(contagem, f, ensure_ascii=False)
+            os.replace(temporario, _caminho_contagem_cache_disco(chave))
+            if conteudo is not None:
+                with open(temporario, 'wb') as f:
+                    f.write(conteudo)
+            else:
+                shutil.copyfile(saida, temporario)
+            os.replace(temporario, caminho)
+            _limpar_cache_disco()
+        
+        with _lock_cache_resultados:
+            estatisticas_cache_resultados["armazenados"] += 1
+    except Exception as e:
+        logger.warning(f"Nao foi possivel guardar o resultado no cache: {e}")
+
+def resumo_cache_resultados():
+    """Estatísticas do cache de resultados (acertos, falhas, ocupação)."""
+    with _lock_cache_resultados:
+        estatisticas = dict(estatisticas_cache_resultados)
+        itens_memoria = len(_cache_resultados)
+        bytes_memoria = _cache_resultados_bytes
+    consultas = estatisticas["acertos_memoria"] + estatisticas["acertos_disco"] + estatisticas["falhas"]
+    acertos = estatisticas["acertos_memoria"] + estatisticas["acertos_disco"]
+    return {
+        **estatisticas,
+        "taxa_acerto": round(acertos / consultas, 4) if consultas else 0.0,
+        "itens_memoria": itens_memoria,
+        "bytes_memoria": bytes_memoria,
+        "limite_bytes_memoria": CACHE_RESULTADOS_MAX_BYTES,
+        "disco_habilitado": bool(CACHE_RESULTADOS_DIR),
+        "diretorio_disco": CACHE_RESULTADOS_DIR or None
+    }
+
+def erro_upload_muito_grande():
+    """HTTPException 413 para arquivos acima de TAMANHO_MAXIMO_UPLOAD."""
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo excede o tamanho máximo permitido ({TAMANHO_MAXIMO_UPLOAD_MB:g} MB)"
+    )
+
+async def salvar_upload_em_disco(arquivo, diretorio, nome=None):
+    """
+    Copia o upload para um arquivo em disco, em blocos, sem carregá-lo inteiro na memória.
+    
+    O limite de tamanho é verificado a cada bloco lido; se for excedido, o arquivo
+    parcial é removido e é lançado 413. Retorna o caminho do arquivo salvo.
+    """
+    if nome:
+        caminho = os.path.join(diretorio, nome)
+        destino = open(caminho, 'wb')
+    else:
+        destino = tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir=diretorio)
+        caminho = destino.name
+    
+    tamanho = 0
+    try:
+        with destino:
+            while True:
+                bloco = await arquivo.read(TAMANHO_BLOCO_UPLOAD)
+                if not bloco:
+                    break
+                tamanho += len(bloco)
+                if tamanho > TAMANHO_MAXIMO_UPLOAD:
+                    logger.warning(f"Upload rejeitado: {arquivo.filename} excede {TAMANHO_MAXIMO_UPLOAD_MB:g} MB")
+                    raise erro_upload_muito_grande()
+                destino.write(bloco)
+    except BaseException:
+        cleanup_files(caminho)
+        raise
+    
+    registrar_tamanho_arquivo("upload", tamanho)
+    logger.info(f"Arquivo salvo: {caminho}")
+    logger.info(f"Tamanho: {tamanho} bytes ({tamanho / (1024 * 1024):.2f} MB)")
+    return caminho
+
+async def receber_upload(arquivo, assumir=False):
+    """
+    Recebe o upload em memória (BytesIO) se ele couber em LIMITE_PROCESSAMENTO_EM_MEMORIA.
+    
+    Arquivos maiores são usados no próprio arquivo temporário em que o Starlette
+    já gravou o upload (sem uma segunda cópia em disco). Retorna o BytesIO ou esse
+    arquivo, posicionado no início.
+    
+    O FastAPI fecha os uploads ao fim da requisição; com assumir=True (jobs, que
+    rodam depois dela) o arquivo passa a ser de quem chamou, que deve fechá-lo
+    com cleanup_files().
+    """
+    arquivo.file.seek(0, os.SEEK_END)
+    tamanho = arquivo.file.tell()
+    arquivo.file.seek(0)
+    if tamanho > TAMANHO_MAXIMO_UPLOAD:
+        logger.warning(f"Upload rejeitado: {arquivo.filename} excede {TAMANHO_MAXIMO_UPLOAD_MB:g} MB")
+        raise erro_upload_muito_grande()
+    registrar_tamanho_arquivo("upload", tamanho)
+    logger.info(f"Tamanho: {tamanho} bytes ({tamanho / (1024 * 1024):.2f} MB)")
+    
+    if tamanho <= LIMITE_PROCESSAMENTO_EM_MEMORIA:
+        logger.info(f"Arquivo recebido em memoria")
+        return io.BytesIO(await arquivo.read())
+    
+    logger.info(f"Arquivo recebido em disco (arquivo temporario do upload)")
+    entrada = arquivo.file
+    if assumir:
+        arquivo.file = io.BytesIO()
+    return entrada
+
+def descrever_cliente(request: Request):
+    """Endereço do cliente (o TestClient e alguns proxies não informam)."""
+    return request.client.host if request.client else "desconhecido"
+
+def verificar_admin(request: Request):
+    """Lança 403 se a requisição não trouxer o token de administrador (header X-Token-Admin)."""
+    if not TOKEN_ADMIN:
+        raise HTTPException(
+            status_code=403,
+            detail="Recurso restrito a administradores (TOKEN_ADMIN não configurado no servidor)"
+        )
+    token = request.headers.get("x-token-admin", "")
+    if not hmac.compare_digest(token.encode(), TOKEN_ADMIN.encode()):
+        logger.warning(f"Token de administrador invalido - Cliente: {descrever_cliente(request)}")
+        raise HTTPException(status_code=403, detail="Token de administrador inválido")
+
+def perfil_solicitado(request: Request):
+    """Perfil pedido pelo header X-Perfil ou pela query ?perfil= (1/true/sim)."""
+    valor = request.headers.get("x-perfil") or request.query_params.get("perfil") or ""
+    return valor.strip().lower() in ("1", "true", "sim")
+
 # Handler global de exceções
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -57,7 +432,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"EXCECAO NAO TRATADA")
     logger.error(f"URL: {request.url}")
     logger.error(f"Metodo: {request.method}")
-    logger.error(f"Cliente: {request.client.host}")
+    logger.error(f"Cliente: {descrever_cliente(request)}")
     logger.error(f"Erro: {str(exc)}")
     logger.error("="*60)
     logger.exception("Traceback completo:")
@@ -70,6 +445,91 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# Quantos arquivos cada rota de upload recebe (o lote não tem limite de quantidade)
+ARQUIVOS_POR_ROTA_UPLOAD = {"/processar": 1, "/jobs": 1, "/atualizar": 2}
+
+class LimiteTamanhoUpload:
+    """
+    Middleware ASGI que aplica TAMANHO_MAXIMO_UPLOAD enquanto o corpo da requisição chega.
+    
+    - Content-Length acima do permitido para a rota: 413 sem ler o corpo;
+    - multipart/form-data: cada bloco recebido passa por um parser incremental que
+      conta os bytes de cada parte; quando uma parte excede o limite, a leitura é
+      interrompida com 413, sem esperar (nem bufferizar) o resto do upload.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = Headers(scope=scope)
+        arquivos = ARQUIVOS_POR_ROTA_UPLOAD.get(scope["path"])
+        content_length = headers.get("content-length", "")
+        if arquivos and content_length.isdigit() \
+                and int(content_length) > arquivos * TAMANHO_MAXIMO_UPLOAD + TAMANHO_BLOCO_UPLOAD:
+            logger.warning(f"Upload rejeitado pelo Content-Length: {content_length} bytes ({scope['path']})")
+            await self.responder_413(scope, receive, send)
+            return
+        
+        tipo, parametros = parse_options_header(headers.get("content-type", ""))
+        boundary = parametros.get(b"boundary")
+        if tipo != b"multipart/form-data" or not boundary:
+            await self.app(scope, receive, send)
+            return
+        
+        estado = {"tamanho_parte": 0, "excedeu": False}
+        
+        def inicio_parte():
+            estado["tamanho_parte"] = 0
+        
+        def dados_parte(dados, inicio, fim):
+            estado["tamanho_parte"] += fim - inicio
+            if estado["tamanho_parte"] > TAMANHO_MAXIMO_UPLOAD:
+                estado["excedeu"] = True
+        
+        parser = MultipartParser(boundary, {"on_part_begin": inicio_parte, "on_part_data": dados_parte})
+        
+        async def receber():
+            nonlocal parser
+            mensagem = await receive()
+            if parser is not None and mensagem["type"] == "http.request":
+                try:
+                    parser.write(mensagem.get("body", b""))
+                except Exception:
+                    # Corpo malformado: o erro fica para o parser do Starlette
+                    parser = None
+                if estado["excedeu"]:
+                    logger.warning(f"Upload rejeitado durante a leitura: parte excede {TAMANHO_MAXIMO_UPLOAD_MB:g} MB")
+                    raise erro_upload_muito_grande()
+            return mensagem
+        
+        resposta_iniciada = False
+        
+        async def enviar(mensagem):
+            nonlocal resposta_iniciada
+            if mensagem["type"] == "http.response.start":
+                resposta_iniciada = True
+            await send(mensagem)
+        
+        try:
+            await self.app(scope, receber, enviar)
+        except HTTPException as e:
+            # Normalmente o FastAPI já respondeu o 413; aqui só se a exceção escapar
+            if e.status_code != 413 or resposta_iniciada:
+                raise
+            await self.responder_413(scope, receive, send)
+    
+    @staticmethod
+    async def responder_413(scope, receive, send):
+        resposta = JSONResponse(status_code=413, content={"detail": erro_upload_muito_grande().detail})
+        await resposta(scope, receive, send)
+
+app.add_middleware(LimiteTamanhoUpload)
+
 # Middleware para logging de todas as requisições
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -78,7 +538,7 @@ async def log_requests(request: Request, call_next):
     timestamp = datetime.now().strftime("%H:%M:%S")
     
     # Log da requisição recebida
-    logger.info(f"[{timestamp}] {request.method} {request.url.path} - Cliente: {request.client.host}")
+    logger.info(f"[{timestamp}] {request.method} {request.url.path} - Cliente: {descrever_cliente(request)}")
     
     try:
         response = await call_next(request)
@@ -110,8 +570,18 @@ async def root():
             "version": "1.0.0",
             "endpoints": {
                 "POST /processar": "Upload de arquivo de frequência e geração de evolução",
+                "POST /processar-lote": "Upload de vários arquivos (.docx/.zip) e geração de um .zip de evoluções",
+                "POST /atualizar": "Atualiza uma evolução já preenchida com a nova folha de frequência (preserva o texto digitado)",
+                "POST /jobs": "Upload de arquivo para processamento assíncrono (retorna o id do job)",
+                "GET /jobs/{id}": "Status e etapa do job",
+                "GET /jobs/{id}/result": "Download do documento gerado pelo job",
                 "GET /health": "Status da API",
                 "GET /config": "Configurações atuais",
+                "POST /config/recarregar": "Relê o config.json e informa o que mudou",
+                "GET /templates": "Templates disponíveis (por unidade), com tempo de carga e memória",
+                "GET /cache": "Estatísticas do cache de resultados",
+                "GET /metrics": "Métricas de desempenho (formato Prometheus)",
+                "GET /perfis/{id}": "Resumo de um perfil de CPU/memória (administradores)",
                 "GET /docs": "Documentação interativa"
             },
             "nota": "Arquivo interface.html não encontrado"
@@ -126,8 +596,18 @@ async def api_info():
         "version": "1.0.0",
         "endpoints": {
             "POST /processar": "Upload de arquivo de frequência e geração de evolução",
+            "POST /processar-lote": "Upload de vários arquivos (.docx/.zip) e geração de um .zip de evoluções",
+            "POST /atualizar": "Atualiza uma evolução já preenchida com a nova folha de frequência (preserva o texto digitado)",
+            "POST /jobs": "Upload de arquivo para processamento assíncrono (retorna o id do job)",
+            "GET /jobs/{id}": "Status e etapa do job",
+            "GET /jobs/{id}/result": "Download do documento gerado pelo job",
             "GET /health": "Status da API",
-            "GET /config": "Configurações atuais"
+            "GET /config": "Configurações atuais",
+            "POST /config/recarregar": "Relê o config.json e informa o que mudou",
+            "GET /templates": "Templates disponíveis (por unidade), com tempo de carga e memória",
+            "GET /cache": "Estatísticas do cache de resultados",
+            "GET /metrics": "Métricas de desempenho (formato Prometheus)",
+            "GET /perfis/{id}": "Resumo de um perfil de CPU/memória (administradores)"
         }
     }
 
@@ -137,12 +617,25 @@ async def health_check():
     logger.debug("Health check solicitado")
     return {
         "status": "ok",
-        "message": "API está funcionando corretamente"
+        "message": "API está funcionando corretamente",
+        "processamento": {
+            "em_andamento": _tarefas_processamento,
+            "capacidade": WORKERS_PROCESSAMENTO + FILA_MAXIMA_PROCESSAMENTO,
+            "workers": WORKERS_PROCESSAMENTO
+        },
+        "jobs": {
+            "pendentes": contar_jobs_pendentes(),
+            "capacidade": WORKERS_JOBS + FILA_MAXIMA_JOBS,
+            "workers": WORKERS_JOBS,
+            "resultados_em_memoria_mb": round(_resultados_jobs_bytes / (1024 * 1024), 2)
+        },
+        "inicializacao": estado_inicializacao
     }
 
 @app.get("/config")
 async def get_config():
     """Retorna as configurações atuais."""
+    from main import carregar_configuracao
     logger.info("Configuracoes solicitadas")
     config = carregar_configuracao()
     template_exists = os.path.exists(config["caminho_template"])
@@ -153,14 +646,76 @@ async def get_config():
         "template_exists": template_exists
     }
 
+@app.post("/config/recarregar")
+async def recarregar_config():
+    """
+    Relê o config.json e informa o que mudou. Um arquivo inválido não substitui
+    a configuração em uso: os erros são retornados e a anterior é mantida.
+    """
+    from main import recarregar_configuracao
+    resultado = recarregar_configuracao(forcar=True)
+    if resultado["erros"]:
+        logger.warning(f"Recarga do config.json rejeitada: {len(resultado['erros'])} erro(s)")
+    else:
+        logger.info(f"Config recarregada: {len(resultado['alteracoes'])} chave(s) alterada(s)")
+    return {
+        "recarregada": not resultado["erros"],
+        "alteracoes": resultado["alteracoes"],
+        "erros": resultado["erros"],
+        "config": resultado["config"]
+    }
+
+@app.get("/cache")
+async def get_cache():
+    """Retorna as estatísticas do cache de resultados (acertos, falhas, ocupação)."""
+    return resumo_cache_resultados()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas no formato Prometheus: duração por etapa, tamanhos de arquivo e contadores."""
+    return Response(content=exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/templates")
+async def get_templates():
+    """Templates disponíveis (um por unidade), com tempo de carga e memória estimada de cada um."""
+    from main import carregar_configuracao, listar_templates, nome_template_padrao
+    config = carregar_configuracao()
+    return {
+        "padrao": nome_template_padrao(config),
+        "templates": listar_templates(config)
+    }
+
+def resolver_template_requisicao(nome):
+    """Caminho do template escolhido na requisição (None: padrão). Lança 400 se não existir."""
+    if not nome:
+        return None
+    from main import carregar_configuracao, resolver_template, listar_templates
+    config = carregar_configuracao()
+    caminho = resolver_template(nome, config)
+    if caminho is None:
+        disponiveis = ", ".join(t["nome"] for t in listar_templates(config))
+        logger.warning(f"Template desconhecido solicitado: {nome}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Template '{nome}' não encontrado. Disponíveis: {disponiveis}"
+        )
+    return caminho
+
 @app.post("/processar")
 async def processar_folha_frequencia(
-    arquivo: UploadFile = File(..., description="Arquivo .docx da Folha de Frequência")
+    request: Request,
+    arquivo: UploadFile = File(..., description="Arquivo .docx da Folha de Frequência"),
+    template: Optional[str] = Form(None, description="Nome do template (unidade); padrão se omitido")
 ):
     """
     Processa uma Folha de Frequência e retorna a Folha de Evolução gerada.
     
     - **arquivo**: Arquivo .docx da Folha de Frequência
+    - **template**: Nome do template da unidade (ver GET /templates); opcional
+    
+    Com o header X-Perfil: 1 (ou ?perfil=1) e o X-Token-Admin, o processamento
+    roda sob cProfile e tracemalloc, sem usar o cache de resultados; o id do
+    perfil vem no header X-Perfil-Id (ver GET /perfis/{id}).
     
     Retorna: Arquivo .docx da Folha de Evolução gerada
     """
@@ -180,65 +735,239 @@ async def processar_folha_frequencia(
         )
     
     logger.info("Validacao: Formato .docx OK")
+    caminho_template = resolver_template_requisicao(template)
+    
+    id_perfil = None
+    if perfil_solicitado(request):
+        verificar_admin(request)
+        id_perfil = novo_id_perfil()
+        logger.info(f"Perfil de CPU/memoria solicitado: {id_perfil}")
+    
+    # Recusa a requisição (em vez de travar o servidor) se a fila estiver cheia
+    reservar_vaga_processamento()
+    entrada = None
+    try:
+        # Arquivos pequenos ficam em memória; os grandes são gravados em disco,
+        # em blocos (com limite de tamanho)
+        logger.info("Recebendo arquivo...")
+        with medir_etapa("receber_upload"):
+            entrada = await receber_upload(arquivo)
+        
+        # O processamento (python-docx + I/O) roda no pool de workers,
+        # mantendo o event loop livre para /health e demais requisições
+        if id_perfil is None:
+            saida, status_cache, contagem = await executar_no_pool(processar_upload, entrada, None, caminho_template)
+        else:
+            saida, status_cache, contagem = await executar_no_pool(
+                executar_com_perfil, id_perfil, f"POST /processar {arquivo.filename}",
+                processar_upload, entrada, None, caminho_template, False
+            )
+    except BaseException:
+        cleanup_files(entrada)
+        raise
+    finally:
+        liberar_vaga_processamento()
+    
+    headers = {
+        "Content-Disposition": f"attachment; filename=Evolucao_{Path(arquivo.filename).stem}.docx",
+        "X-Cache": status_cache,
+        "X-Atendimentos-Por-Especialidade": json.dumps(contagem, ensure_ascii=True),
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Content-Disposition, X-Cache, X-Atendimentos-Por-Especialidade"
+    }
+    if id_perfil is not None:
+        headers["X-Perfil-Id"] = id_perfil
+        headers["Access-Control-Expose-Headers"] += ", X-Perfil-Id"
+    media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    
+    if isinstance(saida, io.BytesIO):
+        # Resultado em memória (processamento em memória ou cache): remove a
+        # entrada em disco, se houver, e envia os bytes diretamente
+        cleanup_files(entrada)
+        logger.info(f"Resposta enviada com sucesso - {saida.getbuffer().nbytes} bytes")
+        return Response(content=saida.getvalue(), media_type=media_type, headers=headers)
+    
+    # Envia o arquivo em streaming; os temporários são removidos DEPOIS do envio
+    logger.info(f"Enviando resposta em streaming - {os.path.getsize(saida)} bytes")
+    return FileResponse(
+        saida,
+        media_type=media_type,
+        headers=headers,
+        background=BackgroundTask(cleanup_files, entrada, saida)
+    )
+
+@app.get("/perfis/{id_perfil}")
+async def get_perfil(id_perfil: str, request: Request):
+    """Resumo de um perfil (funções mais caras, maiores alocações, pico de memória). Só administradores."""
+    verificar_admin(request)
+    resumo = carregar_resumo_perfil(id_perfil)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return resumo
+
+@app.get("/perfis/{id_perfil}/pstats")
+async def get_perfil_pstats(id_perfil: str, request: Request):
+    """Download das estatísticas completas do cProfile (formato pstats). Só administradores."""
+    verificar_admin(request)
+    caminhos = caminhos_perfil(id_perfil)
+    if caminhos is None or not os.path.exists(caminhos[0]):
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(caminhos[0], media_type="application/octet-stream", filename=f"perfil_{id_perfil}.pstats")
+
+@app.post("/atualizar")
+async def atualizar_evolucao(
+    arquivo: UploadFile = File(..., description="Arquivo .docx da Folha de Frequência (versão nova)"),
+    evolucao: UploadFile = File(..., description="Folha de Evolução gerada anteriormente (.docx)"),
+    template: Optional[str] = Form(None, description="Nome do template (unidade); padrão se omitido")
+):
+    """
+    Atualiza uma Folha de Evolução já gerada com a nova versão da Folha de Frequência.
+    
+    Apenas as tabelas das especialidades cujas sessões mudaram são alteradas; o
+    texto já digitado em EVOLUÇÃO DIÁRIA e TÉCNICO é preservado.
+    
+    Retorna: a Folha de Evolução atualizada (.docx); o header X-Atualizacao traz
+    o resumo (especialidades alteradas, novas, removidas, mantidas e inalteradas).
+    """
+    logger.info("="*60)
+    logger.info(f"NOVA ATUALIZACAO - Frequencia: {arquivo.filename} | Evolucao: {evolucao.filename}")
+    logger.info("="*60)
+    
+    for enviado in (arquivo, evolucao):
+        if not enviado.filename.endswith('.docx'):
+            logger.warning(f"Arquivo rejeitado: {enviado.filename} (formato invalido)")
+            raise HTTPException(status_code=400, detail=f"Arquivo '{enviado.filename}' deve ser no formato .docx")
+    caminho_template = resolver_template_requisicao(template)
+    
+    reservar_vaga_processamento()
+    entrada = anterior = None
+    try:
+        with medir_etapa("receber_upload"):
+            entrada = await receber_upload(arquivo)
+            anterior = await receber_upload(evolucao)
+        saida, relatorio = await executar_no_pool(processar_atualizacao, entrada, anterior, caminho_template)
+    finally:
+        liberar_vaga_processamento()
+        cleanup_files(entrada, anterior)
+    
+    logger.info(f"Evolucao atualizada enviada - {saida.getbuffer().nbytes} bytes")
+    return Response(
+        content=saida.getvalue(),
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        headers={
+            "Content-Disposition": f"attachment; filename={Path(evolucao.filename).name}",
+            "X-Atualizacao": json.dumps(relatorio, separators=(',', ':')),
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Content-Disposition, X-Atualizacao"
+        }
+    )
+
+def processar_atualizacao(entrada, anterior, caminho_template=None):
+    """
+    Extrai a nova Folha de Frequência e atualiza a evolução anterior (em memória).
+    Retorna (BytesIO com a evolução atualizada, relatório da atualização).
+    
+    Função síncrona (CPU): deve ser executada no pool de workers.
+    """
+    from main import extrair_dados_entrada, atualizar_word_evolucao, carregar_configuracao
+    
+    config = carregar_configuracao()
+    doc_entrada, dados_cabecalho, dados, erros, avisos = extrair_dados_entrada(entrada, config)
+    if doc_entrada is None:
+        raise HTTPException(status_code=400, detail="Folha de frequência inválida ou corrompida")
+    if not dados:
+        raise HTTPException(
+            status_code=400,
+            detail="Nenhum dado válido encontrado no arquivo. Verifique se contém as colunas: DATA, HORÁRIO, PROCEDIMENTO"
+        )
+    
+    saida = io.BytesIO()
+    relatorio = atualizar_word_evolucao(anterior, dados, saida, config, dados_cabecalho, caminho_template=caminho_template)
+    if relatorio is None:
+        raise HTTPException(
+            status_code=422,
+            detail="Não foi possível atualizar: a evolução enviada não foi reconhecida como gerada por este template"
+        )
+    logger.info(f"Atualizacao: {len(relatorio['alteradas'])} especialidade(s) alterada(s), "
+                f"{len(relatorio['novas'])} nova(s), {len(relatorio['removidas'])} removida(s)")
+    return saida, relatorio
+
+def processar_upload(entrada, notificar_etapa=None, caminho_template=None, usar_cache=True):
+    """
+    Processa uma Folha de Frequência e retorna (Folha de Evolução gerada, status
+    do cache, atendimentos por especialidade).
+    
+    - entrada em memória (BytesIO): a saída também é gerada em memória (BytesIO);
+    - entrada em disco (caminho): a saída é gravada em temp_outputs/ e o caminho é retornado;
+    - resultado já em cache: a saída é o BytesIO com o resultado e o status é "HIT";
+    - usar_cache=False (perfil): o cache não é consultado e o status é "BYPASS".
+    
+    notificar_etapa, se informado, é chamado com o nome de cada etapa de
+    ETAPAS_PROCESSAMENTO ao iniciá-la (usado no progresso dos jobs).
+    caminho_template escolhe o template do registro (padrão: config["caminho_template"]).
+    
+    Função síncrona (CPU + disco): deve ser executada no pool de workers.
+    Lança HTTPException em caso de erro (removendo o arquivo de saída parcial).
+    """
+    from main import (
+        extrair_dados_entrada,
+        gerar_word_evolucao,
+        carregar_configuracao,
+        agrupar_por_especialidade,
+        contar_por_especialidade
+    )
     
-    # Cria arquivos temporários
-    temp_input = None
     temp_output = None
     
+    def iniciar_etapa(etapa):
+        if notificar_etapa is not None:
+            notificar_etapa(etapa)
+    
     try:
-        # Salva o arquivo de entrada temporariamente
-        logger.info("Salvando arquivo temporariamente...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir='temp_uploads') as tmp_input:
-            temp_input = tmp_input.name
-            content = await arquivo.read()
-            tmp_input.write(content)
-        
-        tamanho_mb = len(content) / (1024 * 1024)
-        logger.info(f"Arquivo salvo: {temp_input}")
-        logger.info(f"Tamanho: {len(content)} bytes ({tamanho_mb:.2f} MB)")
-        
-        # Valida o arquivo
-        logger.info("Validando integridade do arquivo...")
-        if not validar_arquivo_entrada(temp_input):
-            logger.error("Arquivo invalido ou corrompido")
+        # Configurações em memória (o config.json só é relido quando muda)
+        config = carregar_configuracao()
+        caminho_template = caminho_template or config["caminho_template"]
+        
+        # Verifica se o template existe
+        if not os.path.exists(caminho_template):
+            logger.error(f"Template nao encontrado: {caminho_template}")
             raise HTTPException(
-                status_code=400,
-                detail="Arquivo inválido ou corrompido"
+                status_code=500,
+                detail=f"Template não encontrado: {caminho_template}"
             )
         
-        logger.info("Validacao: Arquivo integro OK")
+        logger.info(f"Template encontrado: {caminho_template}")
         
-        # Carrega configurações
-        logger.info("Carregando configuracoes...")
-        config = carregar_configuracao()
-        logger.info(f"Configuracoes carregadas: duracao={config['duracao_atendimento_minutos']}min")
+        # Mesmo arquivo + mesma configuração + mesmo template: devolve o resultado em cache
+        chave_cache = calcular_chave_cache(entrada, config, caminho_template)
+        resultado_cache = obter_resultado_cache(chave_cache) if usar_cache else None
+        if resultado_cache is not None:
+            conteudo, contagem_especialidades = resultado_cache
+            logger.info(f"Resultado encontrado no cache ({len(conteudo)} bytes) - processamento dispensado")
+            return io.BytesIO(conteudo), "HIT", contagem_especialidades
         
-        # Verifica se o template existe
-        if not os.path.exists(config["caminho_template"]):
-            logger.error(f"Template nao encontrado: {config['caminho_template']}")
+        # Valida o arquivo e extrai cabeçalho e tabelas
+        # (o documento é aberto uma única vez e reaproveitado nas etapas seguintes)
+        logger.info("Validando e extraindo dados do arquivo...")
+        doc_entrada, dados_cabecalho, dados, erros, avisos = extrair_dados_entrada(entrada, config, iniciar_etapa)
+        if doc_entrada is None:
+            logger.error("Arquivo invalido ou corrompido")
             raise HTTPException(
-                status_code=500,
-                detail=f"Template não encontrado: {config['caminho_template']}"
+                status_code=400,
+                detail="Arquivo inválido ou corrompido"
             )
         
-        logger.info(f"Template encontrado: {config['caminho_template']}")
-        
-        # Extrai dados do cabeçalho
-        dados_cabecalho = None
-        if config.get("extrair_cabecalho_de_entrada", False):
-            logger.info("Extraindo dados do cabecalho...")
-            dados_cabecalho = extrair_dados_cabecalho(temp_input)
-            if dados_cabecalho:
-                logger.info(f"Cabecalho extraido: {len(dados_cabecalho)} campos")
-                for key, value in dados_cabecalho.items():
-                    valor_resumido = str(value)[:50] + "..." if len(str(value)) > 50 else str(value)
-                    logger.info(f"  - {key}: {valor_resumido}")
-            else:
-                logger.warning("Nenhum dado de cabecalho extraido")
+        logger.info("Validacao: Arquivo integro OK")
         
-        # Extrai dados das tabelas
-        logger.info("Identificando e extraindo tabelas...")
-        dados, erros, avisos = identificar_e_extrair_tabelas(temp_input, config)
+        if dados_cabecalho:
+            confianca = dados_cabecalho["confianca"]
+            logger.info(f"Cabecalho extraido: {len(confianca)} campos")
+            for key in confianca:
+                value = dados_cabecalho[key]
+                valor_resumido = str(value)[:50] + "..." if len(str(value)) > 50 else str(value)
+                logger.info(f"  - {key}: {valor_resumido} (confianca {confianca[key]:.0%})")
+        elif config.get("extrair_cabecalho_de_entrada", False):
+            logger.warning("Nenhum dado de cabecalho extraido")
         
         if erros:
             logger.warning(f"Erros encontrados durante extracao: {len(erros)}")
@@ -255,34 +984,32 @@ async def processar_folha_frequencia(
                 detail="Nenhum dado válido encontrado no arquivo. Verifique se contém as colunas: DATA, HORÁRIO, PROCEDIMENTO"
             )
         
-        # Conta procedimentos (especialidades serão extraídas depois)
-        procedimentos_unicos = set()
-        for item in dados:
-            proc = item.get('procedimento', '')
-            # Extrai a especialidade do procedimento (primeira palavra em maiúscula)
-            palavras = proc.upper().split()
-            if palavras:
-                especialidade = palavras[0]
-                procedimentos_unicos.add(especialidade)
+        # Agrupa por especialidade uma única vez (o mesmo agrupamento é usado na geração)
+        grupos = agrupar_por_especialidade(dados)
+        contagem_especialidades = contar_por_especialidade(grupos)
         
         total_registros = len(dados)
         logger.info(f"Dados extraidos com sucesso:")
         logger.info(f"  - Total de registros: {total_registros}")
-        logger.info(f"  - Procedimentos/Especialidades encontradas: {len(procedimentos_unicos)}")
-        for esp in sorted(procedimentos_unicos):
-            count = sum(1 for item in dados if esp in item.get('procedimento', '').upper())
+        logger.info(f"  - Procedimentos/Especialidades encontradas: {len(contagem_especialidades)}")
+        for esp, count in contagem_especialidades.items():
             logger.info(f"    * {esp}: {count} atendimento(s)")
         
-        # Gera o arquivo de saída
-        logger.info("Criando arquivo de saida temporario...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir='temp_outputs') as tmp_output:
-            temp_output = tmp_output.name
-        
-        logger.info(f"Arquivo de saida: {temp_output}")
+        # Gera o arquivo de saída (em memória se a entrada também estiver em memória)
+        if isinstance(entrada, io.BytesIO):
+            saida = io.BytesIO()
+            logger.info("Arquivo de saida: em memoria")
+        else:
+            logger.info("Criando arquivo de saida temporario...")
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir='temp_outputs') as tmp_output:
+                temp_output = tmp_output.name
+            saida = temp_output
+            logger.info(f"Arquivo de saida: {temp_output}")
         
         # Gera o documento de evolução
+        iniciar_etapa("gerando_documento")
         logger.info("Gerando documento de evolucao (pode levar alguns segundos)...")
-        sucesso = gerar_word_evolucao(dados, temp_output, config, dados_cabecalho)
+        sucesso = gerar_word_evolucao(dados, saida, config, dados_cabecalho, grupos, caminho_template)
         
         if not sucesso:
             logger.error("Erro ao gerar o documento de evolucao")
@@ -292,47 +1019,28 @@ async def processar_folha_frequencia(
             )
         
         # Verifica tamanho do arquivo gerado
-        tamanho_saida = os.path.getsize(temp_output)
+        tamanho_saida = saida.getbuffer().nbytes if temp_output is None else os.path.getsize(temp_output)
         tamanho_saida_mb = tamanho_saida / (1024 * 1024)
         logger.info(f"Documento gerado com sucesso!")
         logger.info(f"  - Tamanho: {tamanho_saida} bytes ({tamanho_saida_mb:.2f} MB)")
         logger.info(f"  - Registros processados: {total_registros}")
-        logger.info(f"  - Procedimentos/Especialidades: {len(procedimentos_unicos)}")
-        
-        logger.info("Enviando arquivo para o cliente...")
+        logger.info(f"  - Procedimentos/Especialidades: {len(contagem_especialidades)}")
         
-        # Lê o arquivo em memória antes de enviar
-        with open(temp_output, 'rb') as f:
-            arquivo_bytes = f.read()
+        guardar_resultado_cache(chave_cache, saida, contagem_especialidades)
         
-        logger.info(f"Arquivo lido em memoria: {len(arquivo_bytes)} bytes")
-        
-        # Limpa arquivos temporários ANTES de enviar
-        cleanup_files(temp_input, temp_output)
-        
-        # Retorna o arquivo como bytes
-        response = Response(
-            content=arquivo_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f"attachment; filename=Evolucao_{Path(arquivo.filename).stem}.docx",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Expose-Headers": "Content-Disposition"
-            }
-        )
+        logger.info("Enviando arquivo para o cliente...")
         
-        logger.info(f"Resposta enviada com sucesso - {len(arquivo_bytes)} bytes")
-        return response
+        return saida, "MISS" if usar_cache else "BYPASS", contagem_especialidades
     
     except HTTPException:
         # Re-raise HTTP exceptions
-        cleanup_files(temp_input, temp_output)
+        cleanup_files(temp_output)
         logger.error("Requisicao finalizada com erro HTTP")
         raise
     
     except Exception as e:
         # Limpa arquivos temporários em caso de erro
-        cleanup_files(temp_input, temp_output)
+        cleanup_files(temp_output)
         logger.error(f"ERRO CRITICO ao processar arquivo: {e}")
         logger.exception("Traceback completo:")
         raise HTTPException(
@@ -340,16 +1048,474 @@ async def processar_folha_frequencia(
             detail=f"Erro ao processar arquivo: {str(e)}"
         )
 
+# ----------------------------------------------------------------------------
+# Jobs assíncronos: o upload retorna um id na hora e o processamento segue no
+# pool de jobs; o cliente consulta o status e baixa o resultado quando pronto.
+# ----------------------------------------------------------------------------
+
+ETAPAS_PROCESSAMENTO = ["validando", "extraindo_cabecalho", "extraindo_tabelas", "gerando_documento"]
+
+_jobs = {}
+_lock_jobs = threading.Lock()
+# Bytes dos resultados de jobs retidos em memória (protegido por _lock_jobs)
+_resultados_jobs_bytes = 0
+
+def _formatar_instante(instante):
+    return datetime.fromtimestamp(instante).isoformat(timespec="seconds") if instante else None
+
+def criar_job(nome_arquivo, caminho_template=None):
+    """
+    Reserva uma vaga na fila de jobs e retorna o dicionário de estado do job
+    (status "recebendo", até o upload ser recebido e o job ser enfileirado
+    por enfileirar_job) ou lança 503 (com Retry-After) se a fila estiver cheia.
+    
+    A vaga é reservada antes de receber o upload: requisições simultâneas não
+    passam da capacidade da fila. Se o recebimento falhar, descartar_job() a libera.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "arquivo": nome_arquivo,
+        "caminho_template": caminho_template,
+        "status": "recebendo",
+        "etapa": None,
+        "criado_em": time.time(),
+        "iniciado_em": None,
+        "concluido_em": None,
+        "expira_em": None,
+        "erro": None,
+        "codigo_erro": None,
+        "cache": None,
+        "atendimentos_por_especialidade": None,
+        "entrada": None,
+        "saida": None
+    }
+    capacidade = WORKERS_JOBS + FILA_MAXIMA_JOBS
+    with _lock_jobs:
+        if _contar_jobs_pendentes() >= capacidade:
+            job = None
+        else:
+            _jobs[job["id"]] = job
+    if job is None:
+        logger.warning(f"Fila de jobs cheia ({capacidade}) - requisicao recusada")
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de processamento cheia. Tente novamente em instantes.",
+            headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)}
+        )
+    return job
+
+def enfileirar_job(job, entrada):
+    """Entrega o upload recebido ao job reservado e o envia ao pool de jobs."""
+    with _lock_jobs:
+        job.update(status="na_fila", entrada=entrada, criado_em=time.time())
+    executor_jobs.submit(executar_job, job["id"])
+
+def descartar_job(job):
+    """Libera a vaga de um job cujo upload não foi recebido."""
+    with _lock_jobs:
+        _jobs.pop(job["id"], None)
+
+def guardar_resultado_job(saida):
+    """
+    Resultado a ser retido até o job expirar: fica em memória enquanto o total
+    dos resultados em memória couber em JOBS_RESULTADOS_MAX_BYTES; os demais
+    são gravados em temp_outputs/ (e removidos quando o job expira).
+    """
+    global _resultados_jobs_bytes
+    if not isinstance(saida, io.BytesIO):
+        return saida
+    tamanho = saida.getbuffer().nbytes
+    with _lock_jobs:
+        if _resultados_jobs_bytes + tamanho <= JOBS_RESULTADOS_MAX_BYTES:
+            _resultados_jobs_bytes += tamanho
+            return saida
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir='temp_outputs') as destino:
+        destino.write(saida.getbuffer())
+    logger.info(f"Resultado de job gravado em disco ({tamanho} bytes): limite de resultados em memoria atingido")
+    return destino.name
+
+def obter_job(job_id):
+    """Retorna o job (não expirado) ou lança 404."""
+    remover_jobs_expirados()
+    with _lock_jobs:
+        job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job
+
+def _contar_jobs_pendentes():
+    # Chamado com _lock_jobs adquirido
+    return sum(1 for job in _jobs.values() if job["status"] in ("recebendo", "na_fila", "processando"))
+
+def contar_jobs_pendentes():
+    """Número de jobs recebendo o upload, na fila ou em processamento."""
+    with _lock_jobs:
+        return _contar_jobs_pendentes()
+
+def remover_jobs_expirados():
+    """Remove os jobs finalizados há mais de TTL_JOBS_SEGUNDOS (e seus arquivos de saída)."""
+    global _resultados_jobs_bytes
+    agora = time.time()
+    with _lock_jobs:
+        expirados = [job for job in _jobs.values() if job["expira_em"] and job["expira_em"] <= agora]
+        for job in expirados:
+            del _jobs[job["id"]]
+            if isinstance(job["saida"], io.BytesIO):
+                _resultados_jobs_bytes -= job["saida"].getbuffer().nbytes
+    for job in expirados:
+        if not isinstance(job["saida"], io.BytesIO):
+            cleanup_files(job["saida"])
+    if expirados:
+        logger.info(f"Jobs expirados removidos: {len(expirados)}")
+
+def resumo_job(job):
+    """Estado público do job (sem os dados de entrada/saída)."""
+    with _lock_jobs:
+        etapa = job["etapa"]
+        resumo = {
+            "id": job["id"],
+            "arquivo": job["arquivo"],
+            "status": job["status"],
+            "etapa": etapa,
+            "etapas_concluidas": ETAPAS_PROCESSAMENTO.index(etapa) if etapa else 0,
+            "total_etapas": len(ETAPAS_PROCESSAMENTO),
+            "criado_em": _formatar_instante(job["criado_em"]),
+            "iniciado_em": _formatar_instante(job["iniciado_em"]),
+            "concluido_em": _formatar_instante(job["concluido_em"]),
+            "expira_em": _formatar_instante(job["expira_em"])
+        }
+        if job["status"] == "na_fila":
+            resumo["posicao_fila"] = 1 + sum(
+                1 for outro in _jobs.values()
+                if outro["status"] == "na_fila" and outro["criado_em"] < job["criado_em"]
+            )
+        elif job["status"] == "concluido":
+            resumo["etapas_concluidas"] = len(ETAPAS_PROCESSAMENTO)
+            resumo["resultado"] = f"/jobs/{job['id']}/result"
+            resumo["atendimentos_por_especialidade"] = job["atendimentos_por_especialidade"]
+        elif job["status"] == "erro":
+            resumo["erro"] = job["erro"]
+    return resumo
+
+def executar_job(job_id):
+    """Processa o job no pool de jobs, registrando etapa, resultado ou erro."""
+    with _lock_jobs:
+        job = _jobs[job_id]
+        job["status"] = "processando"
+        job["iniciado_em"] = time.time()
+        entrada = job["entrada"]
+        caminho_template = job["caminho_template"]
+    logger.info(f"Job {job_id}: processamento iniciado ({job['arquivo']})")
+    
+    def notificar_etapa(etapa):
+        with _lock_jobs:
+            job["etapa"] = etapa
+    
+    try:
+        saida, status_cache, contagem = processar_upload(entrada, notificar_etapa, caminho_template)
+        saida = guardar_resultado_job(saida)
+        with _lock_jobs:
+            job.update(status="concluido", saida=saida, cache=status_cache, atendimentos_por_especialidade=contagem)
+        logger.info(f"Job {job_id}: concluido")
+    except HTTPException as e:
+        with _lock_jobs:
+            job.update(status="erro", erro=e.detail, codigo_erro=e.status_code)
+        logger.warning(f"Job {job_id}: erro - {e.detail}")
+    except Exception as e:
+        with _lock_jobs:
+            job.update(status="erro", erro=f"Erro ao processar arquivo: {e}", codigo_erro=500)
+        logger.exception(f"Job {job_id}: erro inesperado")
+    finally:
+        cleanup_files(entrada)
+        with _lock_jobs:
+            job["entrada"] = None
+            job["concluido_em"] = time.time()
+            job["expira_em"] = job["concluido_em"] + TTL_JOBS_SEGUNDOS
+
+@app.post("/jobs", status_code=202)
+async def criar_job_processamento(
+    arquivo: UploadFile = File(..., description="Arquivo .docx da Folha de Frequência"),
+    template: Optional[str] = Form(None, description="Nome do template (unidade); padrão se omitido")
+):
+    """
+    Recebe uma Folha de Frequência e a enfileira para processamento assíncrono.
+    
+    Retorna na hora o id do job; o andamento é consultado em GET /jobs/{id} e o
+    documento gerado é baixado em GET /jobs/{id}/result.
+    """
+    logger.info(f"NOVO JOB - Arquivo: {arquivo.filename}")
+    
+    if not arquivo.filename.endswith('.docx'):
+        logger.warning(f"Arquivo rejeitado: {arquivo.filename} (formato invalido)")
+        raise HTTPException(status_code=400, detail="Arquivo deve ser no formato .docx")
+    caminho_template = resolver_template_requisicao(template)
+    
+    remover_jobs_expirados()
+    job = criar_job(arquivo.filename, caminho_template)
+    try:
+        with medir_etapa("receber_upload"):
+            entrada = await receber_upload(arquivo, assumir=True)
+    except BaseException:
+        descartar_job(job)
+        raise
+    
+    enfileirar_job(job, entrada)
+    logger.info(f"Job {job['id']} enfileirado")
+    
+    return JSONResponse(
+        status_code=202,
+        content=resumo_job(job),
+        headers={"Location": f"/jobs/{job['id']}"}
+    )
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(job_id: str):
+    """Status do job: na_fila, processando, concluido ou erro (com a etapa atual)."""
+    return resumo_job(obter_job(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def baixar_resultado_job(job_id: str):
+    """Baixa a Folha de Evolução gerada pelo job (disponível até expirar)."""
+    job = obter_job(job_id)
+    
+    if job["status"] == "erro":
+        raise HTTPException(status_code=job["codigo_erro"], detail=job["erro"])
+    if job["status"] != "concluido":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job ainda não concluído (status: {job['status']})",
+            headers={"Retry-After": "1"}
+        )
+    
+    headers = {
+        "Content-Disposition": f"attachment; filename=Evolucao_{Path(job['arquivo']).stem}.docx",
+        "X-Cache": job["cache"],
+        "X-Atendimentos-Por-Especialidade": json.dumps(job["atendimentos_por_especialidade"], ensure_ascii=True),
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Content-Disposition, X-Cache, X-Atendimentos-Por-Especialidade"
+    }
+    media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    
+    # O resultado fica disponível (pode ser baixado de novo) até o job expirar
+    if isinstance(job["saida"], io.BytesIO):
+        return Response(content=job["saida"].getvalue(), media_type=media_type, headers=headers)
+    return FileResponse(job["saida"], media_type=media_type, headers=headers)
+
+@app.post("/processar-lote")
+async def processar_lote_frequencia(
+    arquivos: List[UploadFile] = File(..., description="Arquivos .docx e/ou .zip com Folhas de Frequência")
+):
+    """
+    Processa várias Folhas de Frequência de uma vez e retorna um .zip com as Folhas de Evolução.
+    
+    - **arquivos**: Arquivos .docx e/ou arquivos .zip contendo .docx
+    
+    Retorna: Arquivo .zip com as evoluções geradas e `relatorio_lote.json`
+    (resultado, erros de parsing e avisos de data de cada arquivo)
+    """
+    logger.info("="*60)
+    logger.info(f"NOVA REQUISICAO DE LOTE - {len(arquivos)} arquivo(s) enviado(s)")
+    logger.info("="*60)
+    
+    for arquivo in arquivos:
+        if not arquivo.filename.lower().endswith(('.docx', '.zip')):
+            logger.warning(f"Arquivo rejeitado: {arquivo.filename} (formato invalido)")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo '{arquivo.filename}' deve ser .docx ou .zip"
+            )
+    
+    # Cada arquivo do lote ocupa uma vaga da fila (os .zip são recontados ao serem expandidos)
+    vagas = vagas_lote(len(arquivos))
+    reservar_vaga_processamento(vagas)
+    diretorio_lote = tempfile.mkdtemp(dir='temp_uploads')
+    try:
+        # Cada arquivo tem sua própria pasta (nomes repetidos não se sobrescrevem).
+        # Os .docx vão para processos separados e precisam de um caminho; os .zip
+        # são lidos direto do arquivo temporário do upload, sem cópia
+        entradas = []
+        for indice, arquivo in enumerate(arquivos):
+            diretorio_arquivo = os.path.join(diretorio_lote, 'entrada', f"{indice:04d}")
+            os.makedirs(diretorio_arquivo)
+            if arquivo.filename.lower().endswith('.zip'):
+                await arquivo.seek(0)
+                entradas.append((diretorio_arquivo, arquivo.file))
+            else:
+                entradas.append((diretorio_arquivo, await salvar_upload_em_disco(
+                    arquivo, diretorio_arquivo, Path(arquivo.filename).name
+                )))
+        
+        arquivos_lote = await executar_no_pool(expandir_lote_upload, entradas)
+        adicionais = vagas_lote(len(arquivos_lote)) - vagas
+        if adicionais > 0:
+            reservar_vaga_processamento(adicionais)
+            vagas += adicionais
+        
+        caminho_zip, relatorios = await executar_no_pool(processar_lote_upload, diretorio_lote, arquivos_lote)
+    except BaseException:
+        shutil.rmtree(diretorio_lote, ignore_errors=True)
+        raise
+    finally:
+        liberar_vaga_processamento(vagas)
+    
+    sucessos = sum(1 for r in relatorios if r["sucesso"])
+    logger.info(f"Lote enviado com sucesso - {sucessos}/{len(relatorios)} arquivo(s) - {os.path.getsize(caminho_zip)} bytes")
+    
+    return FileResponse(
+        caminho_zip,
+        media_type="application/zip",
+        background=BackgroundTask(shutil.rmtree, diretorio_lote, ignore_errors=True),
+        headers={
+            "Content-Disposition": "attachment; filename=Evolucoes_lote.zip",
+            "X-Lote-Total": str(len(relatorios)),
+            "X-Lote-Sucesso": str(sucessos),
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Content-Disposition, X-Lote-Total, X-Lote-Sucesso"
+        }
+    )
+
+def expandir_lote_upload(entradas):
+    """
+    Lista os .docx de um lote enviado, expandindo os .zip.
+    
+    entradas: (pasta do arquivo, caminho do .docx salvo ou arquivo do upload .zip).
+    
+    Função síncrona (disco): deve ser executada no pool de workers.
+    """
+    from main import listar_arquivos_lote, carregar_configuracao
+    
+    config = carregar_configuracao()
+    # Os limites (nº de arquivos e tamanho descompactado) valem para o lote inteiro
+    uso = {"arquivos": sum(1 for _, origem in entradas if isinstance(origem, str)), "bytes": 0}
+    arquivos = []
+    for diretorio_arquivo, origem in entradas:
+        if isinstance(origem, str):
+            arquivos.append(origem)
+            continue
+        try:
+            arquivos.extend(listar_arquivos_lote(origem, os.path.join(diretorio_arquivo, 'zip'), config, uso))
+        except ValueError as e:
+            logger.warning(f"Lote rejeitado: {e}")
+            raise HTTPException(status_code=413, detail=str(e))
+    
+    if not arquivos:
+        raise HTTPException(status_code=400, detail="Nenhum arquivo .docx encontrado no lote")
+    return arquivos
+
+def processar_lote_upload(diretorio_lote, arquivos):
+    """
+    Processa os .docx de um lote salvo em diretorio_lote (ver expandir_lote_upload)
+    no pool de processos do lote e retorna (caminho do .zip, relatórios por arquivo).
+    
+    Função síncrona: deve ser executada no pool de workers.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    from main import carregar_configuracao, processar_lote, registrar_resumo_lote
+    
+    # Configuração e template carregados uma única vez para todo o lote
+    config = carregar_configuracao()
+    if not os.path.exists(config["caminho_template"]):
+        logger.error(f"Template nao encontrado: {config['caminho_template']}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Template não encontrado: {config['caminho_template']}"
+        )
+    
+    diretorio_saida = os.path.join(diretorio_lote, 'saida')
+    executor = obter_executor_lote()
+    try:
+        relatorios = processar_lote(arquivos, diretorio_saida, config, executor=executor)
+    except BrokenProcessPool:
+        descartar_executor_lote(executor)
+        logger.error("Pool de processos do lote interrompido (worker encerrado)")
+        raise HTTPException(status_code=500, detail="Erro ao processar o lote: worker interrompido")
+    registrar_resumo_lote(relatorios)
+    
+    # Monta o .zip de resposta em disco: evoluções geradas + relatório do lote
+    caminho_zip = os.path.join(diretorio_lote, 'Evolucoes_lote.zip')
+    with zipfile.ZipFile(caminho_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for relatorio in relatorios:
+            if relatorio["sucesso"]:
+                zf.write(os.path.join(diretorio_saida, relatorio["saida"]), relatorio["saida"])
+        zf.writestr('relatorio_lote.json', json.dumps(relatorios, indent=4, ensure_ascii=False))
+    
+    return caminho_zip, relatorios
+
 def cleanup_files(*files):
-    """Limpa arquivos temporários."""
+    """Limpa arquivos temporários (caminhos são removidos; uploads em disco, fechados)."""
     for file in files:
-        if file and os.path.exists(file):
+        # Ignora entradas/saídas processadas em memória (BytesIO)
+        if file is None or isinstance(file, io.BytesIO):
+            continue
+        if not isinstance(file, str):
+            file.close()
+        elif os.path.exists(file):
             try:
                 os.unlink(file)
                 logger.info(f"Arquivo temporario removido: {os.path.basename(file)}")
             except Exception as e:
                 logger.warning(f"Nao foi possivel remover arquivo temporario {file}: {e}")
 
+# Relatório de inicialização (exibido no startup e no /health)
+estado_inicializacao = {
+    "ate_startup_ms": None,
+    "aquecimento": "pendente",
+    "aquecimento_ms": None
+}
+
+def segundos_desde_inicio_processo():
+    """Segundos desde o início do processo (Linux, via /proc), ou None se indisponível."""
+    try:
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        with open("/proc/self/stat") as f:
+            # Campo 22 (starttime), contado após o nome do processo entre parênteses
+            inicio = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        return uptime - inicio
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def aquecer_dependencias():
+    """
+    Importa o main.py (python-docx, lxml), carrega as configurações e pré-carrega
+    os templates em memória (o padrão primeiro, depois os demais do registro). Roda em segundo plano a partir do startup; uma
+    requisição que chegue antes faz o mesmo trabalho (uma única vez) sob demanda.
+    """
+    estado_inicializacao["aquecimento"] = "em_andamento"
+    inicio = time.perf_counter()
+    try:
+        from main import carregar_configuracao, obter_template, carregar_registro_templates
+        
+        config = carregar_configuracao()
+        if os.path.exists(config["caminho_template"]):
+            logger.info(f"Template encontrado: {config['caminho_template']}")
+            # Pré-carrega o template em memória (as requisições usam apenas cópias dele)
+            if obter_template(config["caminho_template"]) is not None:
+                logger.info("Template pre-carregado em memoria")
+            else:
+                logger.warning("AVISO: Template invalido - nao foi possivel pre-carregar")
+        else:
+            logger.warning(f"AVISO: Template NAO encontrado: {config['caminho_template']}")
+            logger.warning("A API nao conseguira processar arquivos sem o template!")
+        
+        # Pool do lote: cada worker já sobe com o template carregado
+        obter_executor_lote()
+        
+        # Demais templates do registro (um por unidade)
+        templates = carregar_registro_templates(config)
+        logger.info(f"Templates registrados: {', '.join(templates)}")
+        estado_inicializacao["aquecimento"] = "concluido"
+    except Exception as e:
+        estado_inicializacao["aquecimento"] = "erro"
+        logger.exception(f"Erro no aquecimento da API: {e}")
+    
+    estado_inicializacao["aquecimento_ms"] = round((time.perf_counter() - inicio) * 1000)
+    desde_processo = segundos_desde_inicio_processo()
+    logger.info(
+        f"Aquecimento {estado_inicializacao['aquecimento']} em {estado_inicializacao['aquecimento_ms']} ms"
+        + (f" ({desde_processo * 1000:.0f} ms desde o inicio do processo)" if desde_processo is not None else "")
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Executado ao iniciar a API."""
@@ -359,29 +1525,23 @@ async def startup_event():
     logger.info("="*60)
     logger.info("Versao: 1.0.0")
     logger.info("Porta: 8000")
-    logger.info("")
-    logger.info("Verificando configuracoes...")
+    logger.info(f"Workers de processamento: {WORKERS_PROCESSAMENTO} (fila maxima: {FILA_MAXIMA_PROCESSAMENTO})")
+    logger.info(f"Workers de jobs: {WORKERS_JOBS} (fila maxima: {FILA_MAXIMA_JOBS}, resultados por {TTL_JOBS_SEGUNDOS}s)")
+    logger.info(f"Processos do lote: {WORKERS_LOTE}")
     
-    config = carregar_configuracao()
-    if os.path.exists(config["caminho_template"]):
-        logger.info(f"Template encontrado: {config['caminho_template']}")
-    else:
-        logger.warning(f"AVISO: Template NAO encontrado: {config['caminho_template']}")
-        logger.warning("A API nao conseguira processar arquivos sem o template!")
-    
-    # Verifica diretórios temporários
-    if os.path.exists("temp_uploads"):
-        logger.info("Diretorio temp_uploads: OK")
-    else:
-        logger.info("Criando diretorio temp_uploads...")
-        Path("temp_uploads").mkdir(exist_ok=True)
-    
-    if os.path.exists("temp_outputs"):
-        logger.info("Diretorio temp_outputs: OK")
-    else:
-        logger.info("Criando diretorio temp_outputs...")
-        Path("temp_outputs").mkdir(exist_ok=True)
+    # Importação do main.py, configurações e template em segundo plano:
+    # a API (e o /health) fica disponível sem esperar por eles
+    threading.Thread(target=aquecer_dependencias, name="aquecimento", daemon=True).start()
     
+    desde_importacao = time.perf_counter() - _inicio_importacao
+    desde_processo = segundos_desde_inicio_processo()
+    estado_inicializacao["ate_startup_ms"] = round((desde_processo or desde_importacao) * 1000)
+    logger.info("")
+    logger.info("Tempo de inicializacao:")
+    if desde_processo is not None:
+        logger.info(f"  - Desde o inicio do processo: {desde_processo * 1000:.0f} ms")
+    logger.info(f"  - Desde a importacao da API: {desde_importacao * 1000:.0f} ms")
+    logger.info("  - Aquecimento (main.py + template): em segundo plano")
     logger.info("")
     logger.info("="*60)
     logger.info("API PRONTA PARA RECEBER REQUISICOES")
@@ -390,7 +1550,14 @@ async def startup_event():
     logger.info("  GET  /         - Informacoes da API")
     logger.info("  GET  /health   - Status da API")
     logger.info("  GET  /config   - Configuracoes atuais")
+    logger.info("  POST /config/recarregar - Rele o config.json")
+    logger.info("  GET  /templates - Templates disponiveis (tempo de carga e memoria)")
+    logger.info("  GET  /cache    - Estatisticas do cache de resultados")
+    logger.info("  GET  /metrics  - Metricas de desempenho (Prometheus)")
     logger.info("  POST /processar - Processar folha de frequencia")
+    logger.info("  POST /processar-lote - Processar varias folhas (.docx/.zip)")
+    logger.info("  POST /atualizar - Atualizar evolucao ja preenchida (incremental)")
+    logger.info("  POST /jobs     - Processamento assincrono (GET /jobs/{id}, /jobs/{id}/result)")
     logger.info("  GET  /docs     - Documentacao interativa (Swagger)")
     logger.info("="*60)
     logger.info("")
@@ -403,6 +1570,13 @@ async def shutdown_event():
     logger.info("ENCERRANDO API...")
     logger.info("="*60)
     
+    # Aguarda os processamentos em andamento antes de limpar os temporários
+    # (jobs ainda na fila são descartados)
+    executor_processamento.shutdown(wait=True)
+    executor_jobs.shutdown(wait=True, cancel_futures=True)
+    if executor_lote is not None:
+        executor_lote.shutdown(wait=True)
+    
     # Limpa diretórios temporários
     for dir_path in ["temp_uploads", "temp_outputs"]:
         if os.path.exists(dir_path):
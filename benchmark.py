@@ -0,0 +1,425 @@
+"""
+Benchmark do Gerador de Folha de Evolução
+
+Gera folhas de frequência sintéticas (tabelas DATA/HORÁRIO/PROCEDIMENTO) em
+vários tamanhos e mede separadamente cada etapa do processamento:
+
+  • identificar_e_extrair_tabelas
+  • extrair_dados_cabecalho
+  • gerar_word_evolucao
+  • POST /processar completo (via TestClient, sem servidor)
+
+Para cada cenário/etapa informa throughput, latência p50/p99 e pico de memória,
+e salva os resultados em JSON para comparar entre versões.
+
+Uso:
+    python benchmark.py
+    python benchmark.py --repeticoes 20 --cenarios pequena,media
+    python benchmark.py --cenarios "" --inicializacao
+    python benchmark.py --comparar benchmarks/benchmark_20250701_120000.json
+"""
+
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+import zipfile
+from datetime import datetime
+
+from lxml import etree
+
+# O benchmark mede o processamento, não o cache de resultados da API
+os.environ["CACHE_RESULTADOS_MAX_MB"] = "0"
+os.environ["CACHE_RESULTADOS_DIR"] = ""
+
+DIRETORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+os.chdir(DIRETORIO_BASE)
+sys.path.insert(0, DIRETORIO_BASE)
+
+from docx import Document
+
+from main import (
+    identificar_e_extrair_tabelas,
+    extrair_dados_cabecalho,
+    gerar_word_evolucao,
+    carregar_configuracao,
+    obter_template
+)
+
+# Cenários: (tabelas, linhas por tabela, especialidades)
+CENARIOS = {
+    "pequena": (1, 30, 3),
+    "media": (4, 80, 6),
+    "grande": (10, 200, 12),
+}
+
+ESPECIALIDADES = [
+    "FONOAUDIOLOGIA", "PSICOLOGIA", "TERAPIA OCUPACIONAL", "FISIOTERAPIA",
+    "PSICOPEDAGOGIA", "MUSICOTERAPIA", "NUTRIÇÃO", "NEUROPSICOLOGIA",
+    "PSICOMOTRICIDADE", "EQUOTERAPIA", "HIDROTERAPIA", "ABA",
+]
+
+ETAPAS = ["extrair_tabelas", "extrair_cabecalho", "gerar_word", "processar_api"]
+
+# Meta documentada (README): do início do processo ao primeiro /health com 200
+META_INICIALIZACAO_MS = 1500
+PORTA_INICIALIZACAO = 8765
+
+def gerar_folha_frequencia_sintetica(caminho, n_tabelas, linhas_por_tabela, n_especialidades, semente=42):
+    """
+    Gera uma folha de frequência sintética no layout esperado pelo sistema.
+
+    O cabeçalho tem nome, nascimento, diagnóstico e mês de referência; cada
+    tabela tem as colunas DATA, HORÁRIO, PROCEDIMENTO e ASSINATURA, com a data
+    preenchida apenas na primeira sessão do dia (como nas folhas reais).
+
+    Returns:
+        int: Número de registros válidos gerados
+    """
+    rnd = random.Random(semente)
+    especialidades = ESPECIALIDADES[:n_especialidades]
+    especialidades += [f"ESPECIALIDADE {i}" for i in range(len(especialidades) + 1, n_especialidades + 1)]
+
+    doc = Document()
+    cabecalho = doc.sections[0].header
+    cabecalho.paragraphs[0].text = "FOLHA DE FREQUÊNCIA – MÊS DE JULHO/2025"
+    cabecalho.add_paragraph("Nome: Paciente Sintético da Silva Nasc.: 15/03/2018")
+    cabecalho.add_paragraph("Diagnóstico: F84.0 Autismo infantil")
+
+    registros = 0
+    for _ in range(n_tabelas):
+        tabela = doc.add_table(rows=1, cols=4)
+        for celula, texto in zip(tabela.rows[0].cells, ["DATA", "HORÁRIO", "PROCEDIMENTO", "ASSINATURA"]):
+            celula.text = texto
+
+        dia = 0
+        for i in range(linhas_por_tabela):
+            celulas = tabela.add_row().cells
+            if i % 4 == 0:
+                dia = dia % 31 + 1
+                celulas[0].text = f"{dia:02d}/07/2025"
+            celulas[1].text = f"{7 + i % 4 * 2 + rnd.randint(0, 1):02d}:{rnd.choice(['00', '20', '40'])}"
+            celulas[2].text = rnd.choice(especialidades)
+            registros += 1
+        doc.add_paragraph("")
+
+    doc.save(caminho)
+    return registros
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores em qualquer ordem)."""
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+def medir_tempos(funcao, repeticoes):
+    """Executa a função uma vez para aquecimento e `repeticoes` vezes cronometradas (em segundos)."""
+    funcao()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def medir_pico_memoria(funcao):
+    """
+    Pico de memória alocada pelo Python (bytes) durante uma execução da função.
+
+    Roda à parte das medições de tempo: o tracemalloc deixa a execução mais lenta
+    e infla o uso de memória do processo.
+    """
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+def resumir_medicao(cenario, etapa, tempos, pico, pico_rss, registros, tamanho_entrada):
+    media = sum(tempos) / len(tempos)
+    p50 = percentil(tempos, 50)
+    return {
+        "cenario": cenario,
+        "etapa": etapa,
+        "amostras": len(tempos),
+        "registros": registros,
+        "tamanho_entrada_kb": round(tamanho_entrada / 1024, 1),
+        "p50_ms": round(p50 * 1000, 2),
+        "p99_ms": round(percentil(tempos, 99) * 1000, 2),
+        "media_ms": round(media * 1000, 2),
+        "min_ms": round(min(tempos) * 1000, 2),
+        "documentos_por_s": round(1 / media, 2),
+        "registros_por_s": round(registros / p50, 1),
+        "pico_memoria_kb": round(pico / 1024, 1),
+        "pico_rss_processo_kb": pico_rss,
+    }
+
+def verificar_escrita_streaming(dados, dados_cabecalho, config):
+    """
+    Gera o documento pelo DOM e em streaming e confere que os dois pacotes
+    abrem no python-docx instalado, têm as mesmas partes e que o
+    word/document.xml representa o mesmo XML.
+    """
+    pacotes = []
+    for limite in (0, 1):
+        saida = io.BytesIO()
+        gerar_word_evolucao(dados, saida, dict(config, escrita_streaming_a_partir_de_linhas=limite), dados_cabecalho)
+        if not Document(saida).tables:
+            raise RuntimeError("Documento gerado sem tabelas ao ser reaberto com o python-docx")
+        with zipfile.ZipFile(saida) as pacote:
+            pacotes.append({nome: pacote.read(nome) for nome in pacote.namelist()})
+    dom, streaming = pacotes
+    if sorted(dom) != sorted(streaming):
+        raise RuntimeError(f"Partes diferentes entre DOM e streaming: {sorted(set(dom) ^ set(streaming))}")
+    for nome in dom:
+        original, gravado = dom[nome], streaming[nome]
+        if nome == "word/document.xml":
+            original = etree.tostring(etree.fromstring(original), method="c14n")
+            gravado = etree.tostring(etree.fromstring(gravado), method="c14n")
+        if original != gravado:
+            raise RuntimeError(f"'{nome}' difere entre a gravação pelo DOM e em streaming")
+    print(f"  ✓ Escrita em streaming equivalente à do DOM ({len(dom)} partes)")
+
+def executar_cenario(nome, parametros, config, repeticoes, cliente, diretorio):
+    """Gera a folha do cenário e mede todas as etapas."""
+    n_tabelas, linhas, n_especialidades = parametros
+    caminho = os.path.join(diretorio, f"folha_{nome}.docx")
+    registros = gerar_folha_frequencia_sintetica(caminho, n_tabelas, linhas, n_especialidades)
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+
+    print(f"\n→ Cenário '{nome}': {n_tabelas} tabela(s) × {linhas} linhas, "
+          f"{n_especialidades} especialidades ({registros} registros, {tamanho/1024:.1f} KB)")
+
+    dados, _, _ = identificar_e_extrair_tabelas(caminho, config)
+    dados_cabecalho = extrair_dados_cabecalho(caminho)
+    if len(dados) != registros:
+        raise RuntimeError(f"Extração retornou {len(dados)} registros (esperado {registros})")
+    verificar_escrita_streaming(dados, dados_cabecalho, config)
+
+    def processar_api():
+        resposta = cliente.post(
+            "/processar",
+            files={"arquivo": ("folha.docx", conteudo,
+                               "application/vnd.openxmlformats-officedocument.wordprocessingml.document")}
+        )
+        if resposta.status_code != 200:
+            raise RuntimeError(f"/processar retornou {resposta.status_code}: {resposta.text[:200]}")
+
+    funcoes = {
+        "extrair_tabelas": lambda: identificar_e_extrair_tabelas(caminho, config),
+        "extrair_cabecalho": lambda: extrair_dados_cabecalho(caminho),
+        "gerar_word": lambda: gerar_word_evolucao(dados, io.BytesIO(), config, dados_cabecalho),
+        "processar_api": processar_api,
+    }
+
+    etapas = [etapa for etapa in ETAPAS if etapa != "processar_api" or cliente is not None]
+    tempos = {etapa: medir_tempos(funcoes[etapa], repeticoes) for etapa in etapas}
+    # Lido antes do tracemalloc, que infla a memória do processo
+    pico_rss = pico_rss_kb()
+
+    resultados = []
+    for etapa in etapas:
+        pico = medir_pico_memoria(funcoes[etapa])
+        resultado = resumir_medicao(nome, etapa, tempos[etapa], pico, pico_rss, registros, tamanho)
+        resultados.append(resultado)
+        print(f"  • {etapa:<18} p50 {resultado['p50_ms']:>9.2f} ms   p99 {resultado['p99_ms']:>9.2f} ms   "
+              f"{resultado['registros_por_s']:>10.1f} reg/s   pico {resultado['pico_memoria_kb']:>9.1f} KB")
+    if pico_rss:
+        print(f"  ℹ Pico de memória residente do processo até aqui: {pico_rss/1024:.1f} MB")
+    return resultados
+
+def medir_inicializacao(repeticoes):
+    """
+    Inicia `uvicorn api:app` `repeticoes` vezes e mede, a partir do início do
+    processo, o tempo até o /health responder 200 e até o aquecimento em
+    segundo plano (main.py + template) terminar.
+    """
+    url = f"http://127.0.0.1:{PORTA_INICIALIZACAO}/health"
+    tempos = {"health_ok": [], "aquecimento_concluido": []}
+
+    print(f"\n→ Inicialização da API: {repeticoes} partida(s) a frio de 'uvicorn api:app'")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(PORTA_INICIALIZACAO), "--log-level", "warning"],
+            cwd=DIRETORIO_BASE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            saudavel = None
+            while True:
+                if processo.poll() is not None:
+                    raise RuntimeError("o servidor terminou durante a inicialização")
+                if time.perf_counter() - inicio > 60:
+                    raise RuntimeError("tempo esgotado aguardando o /health")
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as resposta:
+                        estado = json.load(resposta)
+                except (OSError, ValueError):
+                    time.sleep(0.005)
+                    continue
+                agora = time.perf_counter()
+                if saudavel is None:
+                    saudavel = agora - inicio
+                if estado.get("inicializacao", {}).get("aquecimento") in ("concluido", "erro"):
+                    tempos["health_ok"].append(saudavel)
+                    tempos["aquecimento_concluido"].append(agora - inicio)
+                    break
+                time.sleep(0.005)
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    resultados = []
+    for etapa, valores in tempos.items():
+        resultado = {
+            "cenario": "inicializacao",
+            "etapa": etapa,
+            "amostras": len(valores),
+            "p50_ms": round(percentil(valores, 50) * 1000, 2),
+            "p99_ms": round(percentil(valores, 99) * 1000, 2),
+            "media_ms": round(sum(valores) / len(valores) * 1000, 2),
+            "min_ms": round(min(valores) * 1000, 2),
+        }
+        meta = ""
+        if etapa == "health_ok":
+            resultado["meta_ms"] = META_INICIALIZACAO_MS
+            meta = f"   meta {META_INICIALIZACAO_MS} ms {'✓' if resultado['p50_ms'] <= META_INICIALIZACAO_MS else '✗'}"
+        resultados.append(resultado)
+        print(f"  • {etapa:<22} p50 {resultado['p50_ms']:>9.2f} ms   p99 {resultado['p99_ms']:>9.2f} ms{meta}")
+    return resultados
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=DIRETORIO_BASE
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def pico_rss_kb():
+    """Pico de memória residente do processo em KB (inclui as alocações do lxml, que o tracemalloc não vê)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+def comparar_resultados(atual, caminho_base, tolerancia):
+    """
+    Compara o p50 de cada cenário/etapa com um resultado salvo anteriormente.
+
+    Returns:
+        bool: True se alguma etapa ficou mais lenta que a tolerância (%)
+    """
+    with open(caminho_base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    anteriores = {(r["cenario"], r["etapa"]): r for r in base["resultados"]}
+
+    print(f"\n{'='*60}")
+    print(f"COMPARAÇÃO COM {caminho_base} (commit {base.get('commit') or '?'})")
+    print(f"{'='*60}")
+
+    regressao = False
+    for resultado in atual["resultados"]:
+        anterior = anteriores.get((resultado["cenario"], resultado["etapa"]))
+        if anterior is None:
+            continue
+        variacao = (resultado["p50_ms"] / anterior["p50_ms"] - 1) * 100
+        if variacao > tolerancia:
+            marcador = "✗ REGRESSÃO"
+            regressao = True
+        elif variacao < -tolerancia:
+            marcador = "✓ mais rápido"
+        else:
+            marcador = "•"
+        print(f"  {marcador:<14} {resultado['cenario']:<8} {resultado['etapa']:<18} "
+              f"{anterior['p50_ms']:>9.2f} → {resultado['p50_ms']:>9.2f} ms ({variacao:+.1f}%)")
+    return regressao
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do Gerador de Folha de Evolução")
+    parser.add_argument("--repeticoes", type=int, default=10, help="Execuções cronometradas por etapa (padrão: 10)")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help=f"Cenários separados por vírgula ({', '.join(CENARIOS)})")
+    parser.add_argument("--sem-api", action="store_true", help="Não mede o POST /processar")
+    parser.add_argument("--inicializacao", action="store_true",
+                        help=f"Mede também o tempo de partida a frio da API até o /health (porta {PORTA_INICIALIZACAO})")
+    parser.add_argument("--saida", default="benchmarks", help="Pasta onde salvar o resultado (padrão: benchmarks)")
+    parser.add_argument("--comparar", help="Resultado anterior (JSON) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=20.0, help="Aumento de p50 (%%) considerado regressão (padrão: 20)")
+    args = parser.parse_args()
+
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = [c for c in cenarios if c not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenário(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    # Os logs das etapas distorcem as medições e poluem a saída
+    logging.disable(logging.WARNING)
+
+    print("="*60)
+    print("BENCHMARK - GERADOR DE FOLHA DE EVOLUÇÃO")
+    print("="*60)
+
+    config = carregar_configuracao()
+    if obter_template(config["caminho_template"]) is None:
+        print(f"✗ Template não encontrado: {config['caminho_template']}")
+        return 1
+
+    cliente = None
+    if not args.sem_api:
+        from fastapi.testclient import TestClient
+        from api import app
+        cliente = TestClient(app)
+        cliente.__enter__()  # dispara o startup da API
+
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome in cenarios:
+                resultados.extend(executar_cenario(nome, CENARIOS[nome], config, args.repeticoes, cliente, diretorio))
+    finally:
+        if cliente is not None:
+            cliente.__exit__(None, None, None)
+
+    if args.inicializacao:
+        resultados.extend(medir_inicializacao(args.repeticoes))
+
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "resultados": resultados,
+    }
+
+    os.makedirs(args.saida, exist_ok=True)
+    caminho_resultado = os.path.join(args.saida, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(caminho_resultado, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✓ Resultados salvos em: {caminho_resultado}")
+
+    if args.comparar and comparar_resultados(resultado, args.comparar, args.tolerancia):
+        print(f"\n✗ Regressão de desempenho acima de {args.tolerancia:.0f}% detectada")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
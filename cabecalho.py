@@ -0,0 +1,179 @@
+"""
+Extração dos dados do cabeçalho da Folha de Frequência.
+
+Cada layout de cabeçalho é um conjunto de padrões (um regex por campo, com o
+valor no grupo 1, e opcionalmente um regex de validação do valor). Os padrões
+são compilados uma única vez — o layout padrão na importação do módulo, os
+definidos em config.json ("layouts_cabecalho") no primeiro uso — e todos os
+campos são procurados numa única passada sobre o texto do cabeçalho.
+
+Cada campo extraído recebe uma confiança: 1.0 se o valor passou na validação,
+0.5 se foi encontrado mas não passou, 0.0 se não foi encontrado.
+"""
+
+import json
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONFIANCA_VALIDADO = 1.0
+CONFIANCA_NAO_VALIDADO = 0.5
+
+# Layout original: "FOLHA DE FREQUÊNCIA – MÊS DE JULHO/2025",
+# "Nome: João Paulo Braz Nunes Nasc.: 27/12/2018", "Diagnóstico: F84.9 Transtornos..., F90.0 ..."
+LAYOUT_CABECALHO_PADRAO = {
+    "nome_paciente": {
+        "padrao": r"Nome:\s*([^\n]+?)(?=\s+Nasc)",
+        "validacao": r"\S+(?:\s+\S+)+"
+    },
+    "data_nascimento": {
+        "padrao": r"Nasc\.?:\s*(\d{2}/\d{2}/\d{4})",
+        "validacao": r"(?:0[1-9]|[12]\d|3[01])/(?:0[1-9]|1[0-2])/(?:19|20)\d{2}"
+    },
+    "mes_ano": {
+        "padrao": r"(?:M[ÊE]S\s+DE\s+)?([A-Z]+/\d{4})",
+        "validacao": r"(?:JANEIRO|FEVEREIRO|MAR[ÇC]O|ABRIL|MAIO|JUNHO|JULHO|AGOSTO|SETEMBRO|OUTUBRO|NOVEMBRO|DEZEMBRO)/\d{4}"
+    },
+    "codigos_cid_e_descricao": {
+        "padrao": r"Diagn[óo]stico:\s*(.+?)(?:\n|$)",
+        "validacao": r".*\b[A-Z0-9]\d[A-Z0-9](?:\.[A-Z0-9]+)?\b.*"
+    },
+}
+
+def compilar_layout(layout):
+    """
+    Compila os padrões de um layout.
+
+    Retorna um dicionário com o regex combinado (todos os campos em alternância,
+    para a busca em passada única), o regex e a validação de cada campo e o
+    número do grupo que contém o valor de cada campo no regex combinado.
+    Lança re.error se algum padrão for inválido.
+    """
+    campos = {}
+    alternativas = []
+    grupos_valor = {}
+    proximo_grupo = 1
+    for campo, definicao in layout.items():
+        padrao = re.compile(definicao["padrao"], re.IGNORECASE)
+        validacao = definicao.get("validacao")
+        campos[campo] = (padrao, re.compile(validacao, re.IGNORECASE) if validacao else None)
+
+        # Cada campo vira um grupo nomeado do regex combinado; o valor é o
+        # grupo 1 do padrão, deslocado pelos grupos dos campos anteriores
+        alternativas.append(f"(?P<{campo}>{definicao['padrao']})")
+        grupos_valor[campo] = proximo_grupo + 1
+        proximo_grupo += 1 + padrao.groups
+
+    try:
+        combinado = re.compile("|".join(alternativas), re.IGNORECASE)
+    except re.error:
+        # Padrões que não podem ser combinados (ex.: retrovisores \1):
+        # cada campo é procurado separadamente
+        combinado = None
+
+    return {"campos": campos, "combinado": combinado, "grupos_valor": grupos_valor}
+
+_LAYOUT_PADRAO_COMPILADO = compilar_layout(LAYOUT_CABECALHO_PADRAO)
+
+_cache_layouts = {}
+_lock_cache_layouts = threading.Lock()
+
+def obter_layouts(config=None):
+    """
+    Retorna {nome: layout compilado} com o layout "padrao" e os de config["layouts_cabecalho"].
+
+    Layouts inválidos são ignorados (com erro no log, uma vez). Os compilados ficam em cache.
+    """
+    layouts = {"padrao": _LAYOUT_PADRAO_COMPILADO}
+    for nome, layout in ((config or {}).get("layouts_cabecalho") or {}).items():
+        chave = json.dumps(layout, sort_keys=True, ensure_ascii=False)
+        with _lock_cache_layouts:
+            compilado = _cache_layouts.get(chave)
+        if compilado is None:
+            try:
+                compilado = compilar_layout(layout)
+            except (re.error, KeyError, TypeError, AttributeError) as e:
+                logger.error(f"✗ Layout de cabeçalho '{nome}' inválido em config.json: {e}")
+                compilado = False  # não tenta (nem registra o erro) de novo
+            with _lock_cache_layouts:
+                _cache_layouts[chave] = compilado
+        if compilado:
+            layouts[nome] = compilado
+    return layouts
+
+def _buscar_valores(texto, layout):
+    """Valor (grupo 1) da primeira ocorrência de cada campo no texto."""
+    valores = {}
+    combinado = layout["combinado"]
+    if combinado is not None:
+        # Passada única: a cada ocorrência, o grupo nomeado indica o campo
+        total_campos = len(layout["campos"])
+        for match in combinado.finditer(texto):
+            campo = match.lastgroup
+            if campo not in valores:
+                valores[campo] = match.group(layout["grupos_valor"][campo])
+                if len(valores) == total_campos:
+                    break
+
+    # Campos sem ocorrência na passada única (ou sobrepostos por outro campo)
+    for campo, (padrao, _) in layout["campos"].items():
+        if campo not in valores:
+            match = padrao.search(texto)
+            if match:
+                valores[campo] = match.group(1)
+    return valores
+
+def normalizar_valor(campo, valor):
+    """Normalização do valor extraído de cada campo."""
+    valor = valor.strip()
+    if campo == "mes_ano":
+        return valor.upper()
+    if campo == "codigos_cid_e_descricao":
+        return ' '.join(valor.split())
+    return valor
+
+def gerar_iniciais(nome):
+    return ''.join(palavra[0].upper() for palavra in nome.split() if palavra)
+
+def extrair_campos_cabecalho(texto, config=None):
+    """
+    Extrai os campos do cabeçalho com o layout configurado.
+
+    config["layout_cabecalho"] escolhe o layout pelo nome; "auto" (padrão)
+    testa todos e fica com o de maior confiança total.
+
+    Returns:
+        tuple: ({campo: {"valor": str, "confianca": float}}, nome do layout)
+    """
+    layouts = obter_layouts(config)
+    escolhido = (config or {}).get("layout_cabecalho", "auto")
+    if escolhido != "auto" and escolhido not in layouts:
+        logger.warning(f"⚠ Layout de cabeçalho '{escolhido}' não encontrado. Usando detecção automática.")
+        escolhido = "auto"
+    candidatos = layouts if escolhido == "auto" else {escolhido: layouts[escolhido]}
+
+    melhor, nome_melhor, pontuacao_melhor = None, None, -1.0
+    for nome, layout in candidatos.items():
+        valores = _buscar_valores(texto, layout)
+        campos = {}
+        for campo, (_, validacao) in layout["campos"].items():
+            valor = normalizar_valor(campo, valores.get(campo) or "")
+            if not valor:
+                confianca = 0.0
+            elif validacao is None or validacao.fullmatch(valor):
+                confianca = CONFIANCA_VALIDADO
+            else:
+                confianca = CONFIANCA_NAO_VALIDADO
+            campos[campo] = {"valor": valor, "confianca": confianca}
+        pontuacao = sum(c["confianca"] for c in campos.values())
+        if pontuacao > pontuacao_melhor:
+            melhor, nome_melhor, pontuacao_melhor = campos, nome, pontuacao
+
+    # Iniciais são derivadas do nome (mesma confiança)
+    if "nome_paciente" in melhor:
+        nome = melhor["nome_paciente"]
+        melhor["iniciais"] = {"valor": gerar_iniciais(nome["valor"]), "confianca": nome["confianca"]}
+
+    return melhor, nome_melhor
@@ -1,12 +1,38 @@
 from docx import Document
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.pkgwriter import PackageWriter
+from docx.opc.part import XmlPart
+from docx.table import Table, _Row
+from docx.text.paragraph import Paragraph
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
+from lxml import etree
 import os
+import re
+import io
 import json
 import logging
 import sys
+import time
 import copy
+import functools
+import hashlib
+import threading
+import shutil
+import tempfile
+import zipfile
+import multiprocessing
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from cabecalho import extrair_campos_cabecalho
+from metricas import (
+    medir_etapa, registrar_duracao_etapa, registrar_tamanho_arquivo, incrementar,
+    extrair_metricas, mesclar_metricas
+)
 
 # Configuração de logging
 logging.basicConfig(
@@ -16,6 +42,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tags WordprocessingML usadas pelo extrator de tabelas XML
+_W_BODY = qn('w:body')
+_W_TBL = qn('w:tbl')
+_W_TR = qn('w:tr')
+_W_TRPR = qn('w:trPr')
+_W_GRID_BEFORE = qn('w:gridBefore')
+_W_TC = qn('w:tc')
+_W_TCPR = qn('w:tcPr')
+_W_GRID_SPAN = qn('w:gridSpan')
+_W_VMERGE = qn('w:vMerge')
+_W_P = qn('w:p')
+_W_R = qn('w:r')
+_W_HYPERLINK = qn('w:hyperlink')
+_W_T = qn('w:t')
+_W_TAB = qn('w:tab')
+_W_PTAB = qn('w:ptab')
+_W_BR = qn('w:br')
+_W_CR = qn('w:cr')
+_W_NO_BREAK_HYPHEN = qn('w:noBreakHyphen')
+_W_TYPE = qn('w:type')
+_W_VAL = qn('w:val')
+
 # Configurações padrão
 CONFIG_PADRAO = {
     "duracao_atendimento_minutos": 40,
@@ -23,117 +71,313 @@ CONFIG_PADRAO = {
     "formato_hora": "%H:%M",
     "permitir_data_vazia_primeira_linha": False,
     "caminho_template": "template_saida/template_saida.docx",
-    "extrair_cabecalho_de_entrada": True
+    "diretorio_templates": "template_saida",
+    "extrair_cabecalho_de_entrada": True,
+    "extrator_tabelas": "xml",
+    "nivel_compressao_saida": 6,
+    "escrita_streaming_a_partir_de_linhas": 5000,
+    "lote_maximo_arquivos": 500,
+    "lote_maximo_descompactado_mb": 1024,
+    "layout_cabecalho": "auto",
+    "layouts_cabecalho": {}
 }
 
-def carregar_configuracao(caminho_config='config.json'):
-    """Carrega configurações do arquivo JSON ou usa padrões."""
-    if os.path.exists(caminho_config):
+# Intervalo mínimo entre verificações do config.json (mtime/tamanho) pelas
+# requisições; dentro dele a configuração em memória é usada sem acesso a disco
+INTERVALO_VERIFICACAO_CONFIG_SEGUNDOS = float(os.environ.get("INTERVALO_VERIFICACAO_CONFIG", "2"))
+
+EXTRATORES_TABELAS = ("xml", "docx")
+COLUNAS_OBRIGATORIAS = ("DATA", "HORÁRIO", "PROCEDIMENTO")
+
+class ConfiguracaoImutavel(dict):
+    """
+    Configuração somente leitura: um dict (serializável em JSON e picklável para
+    os processos do lote) que não aceita alterações. Listas viram tuplas e dicts
+    aninhados também ficam imutáveis.
+    """
+
+    def __init__(self, valores=()):
+        super().__init__((chave, _congelar(valor)) for chave, valor in dict(valores).items())
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError("Configuração somente leitura: altere o config.json e recarregue")
+
+    __setitem__ = __delitem__ = __ior__ = _somente_leitura
+    clear = pop = popitem = setdefault = update = _somente_leitura
+
+    def __reduce__(self):
+        return (ConfiguracaoImutavel, (dict(self),))
+
+def _congelar(valor):
+    if isinstance(valor, dict):
+        return ConfiguracaoImutavel(valor)
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(item) for item in valor)
+    return valor
+
+def validar_configuracao(config):
+    """Retorna a lista de erros da configuração (vazia se válida)."""
+    erros = []
+
+    def tipo(chave, tipos, descricao):
+        valor = config.get(chave)
+        # bool é subclasse de int: true/false não valem como número
+        if not isinstance(valor, tipos) or (isinstance(valor, bool) and bool not in tipos):
+            erros.append(f"'{chave}' deve ser {descricao} (recebido: {config.get(chave)!r})")
+            return False
+        return True
+
+    if tipo("duracao_atendimento_minutos", (int,), "um inteiro") and config["duracao_atendimento_minutos"] <= 0:
+        erros.append("'duracao_atendimento_minutos' deve ser maior que zero")
+
+    if tipo("colunas_esperadas", (list, tuple), "uma lista de nomes de coluna"):
+        colunas = config["colunas_esperadas"]
+        if not all(isinstance(coluna, str) and coluna.strip() for coluna in colunas):
+            erros.append("'colunas_esperadas' deve conter apenas textos não vazios")
+        faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+        if faltando:
+            erros.append(f"'colunas_esperadas' deve incluir {', '.join(faltando)}")
+
+    if tipo("formato_hora", (str,), "um texto"):
         try:
-            with open(caminho_config, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                logger.info(f"✓ Configurações carregadas de '{caminho_config}'")
-                return {**CONFIG_PADRAO, **config}
-        except json.JSONDecodeError as e:
-            logger.warning(f"⚠ Erro ao ler config.json: {e}. Usando configurações padrão.")
-            return CONFIG_PADRAO
-        except Exception as e:
-            logger.warning(f"⚠ Erro inesperado ao carregar config: {e}. Usando configurações padrão.")
-            return CONFIG_PADRAO
+            exemplo = datetime(2000, 1, 1, 8, 30)
+            if datetime.strptime(exemplo.strftime(config["formato_hora"]), config["formato_hora"]).time() != exemplo.time():
+                erros.append(f"'formato_hora' não preserva hora e minuto: {config['formato_hora']!r}")
+        except ValueError as e:
+            erros.append(f"'formato_hora' inválido ({config['formato_hora']!r}): {e}")
+
+    tipo("permitir_data_vazia_primeira_linha", (bool,), "true ou false")
+    tipo("extrair_cabecalho_de_entrada", (bool,), "true ou false")
+
+    if tipo("caminho_template", (str,), "um texto") and not config["caminho_template"].strip():
+        erros.append("'caminho_template' não pode ser vazio")
+
+    tipo("diretorio_templates", (str,), "um texto (vazio = apenas o template padrão)")
+
+    if config.get("extrator_tabelas") not in EXTRATORES_TABELAS:
+        erros.append(f"'extrator_tabelas' deve ser um de {', '.join(EXTRATORES_TABELAS)} "
+                     f"(recebido: {config.get('extrator_tabelas')!r})")
+
+    if tipo("nivel_compressao_saida", (int,), "um inteiro de 0 a 9") and not 0 <= config["nivel_compressao_saida"] <= 9:
+        erros.append("'nivel_compressao_saida' deve estar entre 0 (sem compressão) e 9 (máxima)")
+
+    if tipo("escrita_streaming_a_partir_de_linhas", (int,), "um inteiro (0 = nunca)") and \
+            config["escrita_streaming_a_partir_de_linhas"] < 0:
+        erros.append("'escrita_streaming_a_partir_de_linhas' não pode ser negativo")
+
+    for chave in ("lote_maximo_arquivos", "lote_maximo_descompactado_mb"):
+        if tipo(chave, (int,), "um inteiro positivo") and config[chave] < 1:
+            erros.append(f"'{chave}' deve ser maior que zero")
+
+    tipo("layout_cabecalho", (str,), "um texto")
+
+    if tipo("layouts_cabecalho", (dict,), "um objeto {nome: layout}"):
+        for nome, layout in config["layouts_cabecalho"].items():
+            if not isinstance(layout, dict) or not all(
+                isinstance(definicao, dict) and isinstance(definicao.get("padrao"), str)
+                for definicao in layout.values()
+            ):
+                erros.append(f"Layout de cabeçalho '{nome}': cada campo deve ter um \"padrao\" (texto)")
+
+    return erros
+
+# caminho do config.json → {"config", "assinatura", "verificado_em"}
+_cache_configuracao = {}
+_lock_configuracao = threading.Lock()
+
+def _ler_configuracao(caminho_config):
+    """
+    Lê e valida o arquivo. Retorna (ConfiguracaoImutavel, []) ou, se o arquivo
+    for inválido, (None, erros).
+    """
+    if not os.path.exists(caminho_config):
+        logger.info(f"ℹ Arquivo {caminho_config} não encontrado. Usando configurações padrão.")
+        return ConfiguracaoImutavel(CONFIG_PADRAO), []
+
+    try:
+        with open(caminho_config, 'r', encoding='utf-8') as f:
+            valores = json.load(f)
+    except json.JSONDecodeError as e:
+        erros = [f"JSON inválido: {e}"]
+    except Exception as e:
+        erros = [f"Erro inesperado ao ler o arquivo: {e}"]
     else:
-        logger.info("ℹ Arquivo config.json não encontrado. Usando configurações padrão.")
-        return CONFIG_PADRAO
+        if isinstance(valores, dict):
+            config = {**CONFIG_PADRAO, **valores}
+            erros = validar_configuracao(config)
+            if not erros:
+                logger.info(f"✓ Configurações carregadas de '{caminho_config}'")
+                return ConfiguracaoImutavel(config), []
+        else:
+            erros = ["o conteúdo deve ser um objeto JSON"]
 
-def validar_arquivo_entrada(caminho):
-    """Valida se o arquivo de entrada existe e é válido."""
-    logger.info(f"→ Validando arquivo de entrada: '{caminho}'")
+    for erro in erros:
+        logger.warning(f"⚠ {caminho_config}: {erro}")
+    return None, erros
+
+def _diferencas_configuracao(anterior, nova):
+    """{chave: {"antes": valor, "depois": valor}} das chaves alteradas."""
+    return {
+        chave: {"antes": anterior.get(chave), "depois": nova.get(chave)}
+        for chave in sorted(set(anterior) | set(nova))
+        if anterior.get(chave) != nova.get(chave)
+    }
+
+def recarregar_configuracao(caminho_config='config.json', forcar=False):
+    """
+    Relê o arquivo de configuração se ele mudou (mtime/tamanho) ou se `forcar`.
+
+    Um arquivo inválido não substitui a configuração em uso (na primeira carga,
+    são usados os padrões); os erros são registrados no log e retornados.
+
+    Returns:
+        dict: {"config", "recarregada", "alteracoes", "erros"}
+    """
+    try:
+        assinatura = _assinatura_arquivo(caminho_config)
+    except OSError:
+        assinatura = None
+
+    with _lock_configuracao:
+        entrada = _cache_configuracao.get(caminho_config)
+        if entrada is not None and not forcar and entrada["assinatura"] == assinatura:
+            entrada["verificado_em"] = time.monotonic()
+            return {"config": entrada["config"], "recarregada": False, "alteracoes": {}, "erros": []}
+
+        anterior = entrada["config"] if entrada is not None else None
+        config, erros = _ler_configuracao(caminho_config)
+        if config is None:
+            config = anterior if anterior is not None else ConfiguracaoImutavel(CONFIG_PADRAO)
+        alteracoes = _diferencas_configuracao(anterior, config) if anterior is not None else {}
+        _cache_configuracao[caminho_config] = {
+            "config": config, "assinatura": assinatura, "verificado_em": time.monotonic()
+        }
+
+    if alteracoes:
+        logger.info(f"ℹ Configuração recarregada. Alterações: {', '.join(alteracoes)}")
+    return {
+        "config": config,
+        "recarregada": config is not anterior,
+        "alteracoes": alteracoes,
+        "erros": erros
+    }
+
+def carregar_configuracao(caminho_config='config.json'):
+    """
+    Retorna a configuração (ConfiguracaoImutavel) carregada do arquivo JSON ou os padrões.
+
+    O arquivo é lido uma vez e mantido em memória; a cada
+    INTERVALO_VERIFICACAO_CONFIG_SEGUNDOS, no máximo, verifica-se se ele mudou
+    e, nesse caso, ele é relido.
+    """
+    entrada = _cache_configuracao.get(caminho_config)
+    if entrada is not None and time.monotonic() - entrada["verificado_em"] < INTERVALO_VERIFICACAO_CONFIG_SEGUNDOS:
+        return entrada["config"]
+    return recarregar_configuracao(caminho_config)["config"]
+
+def _tamanho_destino(destino):
+    """Tamanho em bytes do que foi gravado em um caminho ou objeto file-like."""
+    if isinstance(destino, (str, os.PathLike)):
+        return os.path.getsize(destino)
+    return destino.tell()
+
+def descrever_arquivo(arquivo):
+    """Descrição de um arquivo para os logs (caminho, '<em memória>' ou '<arquivo temporário>')."""
+    if isinstance(arquivo, (str, os.PathLike)):
+        return str(arquivo)
+    if isinstance(arquivo, (bytes, bytearray, io.BytesIO)):
+        return "<em memória>"
+    return "<arquivo temporário>"
+
+@medir_etapa("abrir_documento")
+def abrir_documento_entrada(origem):
+    """
+    Valida o arquivo de entrada e o abre uma única vez.
     
-    if not os.path.exists(caminho):
-        logger.error(f"✗ ERRO: Arquivo '{caminho}' não encontrado!")
-        return False
+    A origem pode ser um caminho, bytes ou um objeto file-like (ex.: BytesIO),
+    permitindo processar o documento sem gravá-lo em disco.
     
-    if not caminho.endswith('.docx'):
-        logger.error(f"✗ ERRO: Arquivo '{caminho}' não é um documento Word (.docx)!")
-        return False
+    Retorna o objeto Document já carregado (para ser reaproveitado pelas
+    etapas de extração) ou None se o arquivo for inválido.
+    """
+    logger.info(f"→ Validando arquivo de entrada: '{descrever_arquivo(origem)}'")
+    
+    if isinstance(origem, (bytes, bytearray)):
+        origem = io.BytesIO(origem)
+    elif isinstance(origem, (str, os.PathLike)):
+        caminho = str(origem)
+        if not os.path.exists(caminho):
+            logger.error(f"✗ ERRO: Arquivo '{caminho}' não encontrado!")
+            return None
+        
+        if not caminho.endswith('.docx'):
+            logger.error(f"✗ ERRO: Arquivo '{caminho}' não é um documento Word (.docx)!")
+            return None
     
     try:
-        # Tenta abrir o documento para verificar se é válido
-        Document(caminho)
+        # Abre o documento (zip + XML) uma única vez
+        doc = Document(origem)
         logger.info(f"✓ Arquivo válido e acessível")
-        return True
+        return doc
     except Exception as e:
         logger.error(f"✗ ERRO: Não foi possível abrir o documento: {e}")
-        return False
+        return None
+
+def validar_arquivo_entrada(caminho):
+    """Valida se o arquivo de entrada existe e é válido."""
+    return abrir_documento_entrada(caminho) is not None
+
+def extrair_dados_cabecalho(caminho_origem, config=None):
+    """Extrai dados do cabeçalho do documento de entrada (a partir do caminho)."""
+    try:
+        doc = Document(caminho_origem)
+    except Exception as e:
+        logger.error(f"✗ Erro ao extrair dados do cabeçalho: {e}")
+        return None
+    return extrair_dados_cabecalho_documento(doc, config)
+
+# Rótulos dos campos do cabeçalho no log
+ROTULOS_CAMPOS_CABECALHO = {
+    "nome_paciente": "Nome",
+    "iniciais": "Iniciais",
+    "data_nascimento": "Data Nascimento",
+    "mes_ano": "Mês/Ano",
+    "codigos_cid_e_descricao": "CID"
+}
 
-def extrair_dados_cabecalho(caminho_origem):
-    """Extrai dados do cabeçalho do documento de entrada."""
+@medir_etapa("extrair_cabecalho")
+def extrair_dados_cabecalho_documento(doc, config=None):
+    """
+    Extrai dados do cabeçalho de um documento de entrada já carregado.
+    
+    O texto do cabeçalho é lido do XML já em memória e os campos são extraídos
+    com os padrões pré-compilados do módulo cabecalho (layouts configuráveis em
+    config["layouts_cabecalho"]). Retorna {campo: valor} com a confiança de cada
+    campo em dados["confianca"], ou None se nenhum campo for encontrado.
+    """
     logger.info(f"→ Extraindo dados do cabeçalho")
     
     try:
-        doc = Document(caminho_origem)
-        
         # Tenta extrair do cabeçalho do documento
-        if doc.sections and doc.sections[0].header.paragraphs:
-            header_text = "\n".join([p.text for p in doc.sections[0].header.paragraphs])
-            
-            # Extração de dados (adaptável ao formato)
-            dados_cabecalho = {
-                "nome_paciente": "",
-                "iniciais": "",
-                "data_nascimento": "",
-                "mes_ano": "",
-                "codigos_cid_e_descricao": ""
-            }
-            
-            # Busca por padrões no cabeçalho
-            import re
-            
-            # Nome (sem iniciais neste formato): "Nome: João Paulo Braz Nunes"
-            match_nome = re.search(r'Nome:\s*([^\n]+?)(?:\s+Nasc)', header_text, re.IGNORECASE)
-            if match_nome:
-                nome_completo = match_nome.group(1).strip()
-                dados_cabecalho["nome_paciente"] = nome_completo
-                
-                # Gera iniciais automaticamente
-                palavras = nome_completo.split()
-                iniciais = ''.join([p[0].upper() for p in palavras if p])
-                dados_cabecalho["iniciais"] = iniciais
-            
-            # Data de nascimento: "Nasc.: 27/12/2018" ou "Nasc: 27/12/2018"
-            match_nasc = re.search(r'Nasc\.?:\s*(\d{2}/\d{2}/\d{4})', header_text, re.IGNORECASE)
-            if match_nasc:
-                dados_cabecalho["data_nascimento"] = match_nasc.group(1)
-            
-            # Mês/Ano: "MÊS DE JULHO/2025" ou "JULHO/2025"
-            match_mes = re.search(r'(?:M[ÊE]S\s+DE\s+)?([A-Z]+/\d{4})', header_text, re.IGNORECASE)
-            if match_mes:
-                dados_cabecalho["mes_ano"] = match_mes.group(1).upper()
+        cabecalho = doc.sections[0].header._element if doc.sections else None
+        if cabecalho is not None and cabecalho.find(_W_P) is not None:
+            header_text = _texto_celula_xml(cabecalho)
             
-            # CID: Captura todos os CIDs e descrições em uma linha
-            # Formato: "F84.9 Transtornos..., F90.0 Transtorno..., 6A02.Z Transtorno..."
-            match_cid = re.search(r'Diagn[óo]stico:\s*(.+?)(?:\n|$)', header_text, re.IGNORECASE | re.DOTALL)
-            if match_cid:
-                diagnostico_completo = match_cid.group(1).strip()
-                # Remove espaços extras e normaliza
-                diagnostico_completo = ' '.join(diagnostico_completo.split())
-                dados_cabecalho["codigos_cid_e_descricao"] = diagnostico_completo
+            campos, layout = extrair_campos_cabecalho(header_text, config)
+            dados_cabecalho = {campo: resultado["valor"] for campo, resultado in campos.items()}
             
             # Verifica se extraiu algum dado
             tem_dados = any(v for v in dados_cabecalho.values() if v)
             
             if tem_dados:
-                logger.info(f"✓ Dados extraídos do cabeçalho:")
-                if dados_cabecalho['nome_paciente']:
-                    logger.info(f"  • Nome: {dados_cabecalho['nome_paciente']}")
-                if dados_cabecalho['iniciais']:
-                    logger.info(f"  • Iniciais: {dados_cabecalho['iniciais']}")
-                if dados_cabecalho['data_nascimento']:
-                    logger.info(f"  • Data Nascimento: {dados_cabecalho['data_nascimento']}")
-                if dados_cabecalho['mes_ano']:
-                    logger.info(f"  • Mês/Ano: {dados_cabecalho['mes_ano']}")
-                if dados_cabecalho['codigos_cid_e_descricao']:
-                    logger.info(f"  • CID: {dados_cabecalho['codigos_cid_e_descricao']}")
+                logger.info(f"✓ Dados extraídos do cabeçalho (layout '{layout}'):")
+                for campo, resultado in campos.items():
+                    if resultado["valor"]:
+                        rotulo = ROTULOS_CAMPOS_CABECALHO.get(campo, campo)
+                        confianca = "" if resultado["confianca"] == 1.0 else f" (confiança {resultado['confianca']:.0%})"
+                        logger.info(f"  • {rotulo}: {resultado['valor']}{confianca}")
                 
+                dados_cabecalho["confianca"] = {campo: resultado["confianca"] for campo, resultado in campos.items()}
                 return dados_cabecalho
             else:
                 logger.warning("⚠ Nenhum dado extraído do cabeçalho (padrões não encontrados)")
@@ -149,10 +393,239 @@ def extrair_dados_cabecalho(caminho_origem):
         return None
 
 def identificar_e_extrair_tabelas(caminho_origem, config):
-    """Identifica e extrai dados das tabelas do documento."""
-    logger.info(f"→ Iniciando extração de dados de '{caminho_origem}'")
+    """
+    Identifica e extrai dados das tabelas do documento (a partir do caminho).
+    
+    Usa o extrator XML em streaming (sem carregar o documento com python-docx),
+    exceto se config["extrator_tabelas"] for "docx".
+    """
+    logger.info(f"→ Iniciando extração de dados de '{descrever_arquivo(caminho_origem)}'")
+    if config.get("extrator_tabelas", "xml") == "docx":
+        return identificar_e_extrair_tabelas_documento(Document(caminho_origem), config)
+    return identificar_e_extrair_tabelas_xml(caminho_origem, config)
+
+# Falhas de leitura do XML ou de estrutura das tabelas (ex.: linha com menos
+# células que o cabeçalho) que fazem o extrator XML recorrer ao python-docx
+_ERROS_EXTRATOR_XML = (etree.LxmlError, zipfile.BadZipFile, KeyError, IndexError)
+
+def identificar_e_extrair_tabelas_documento(doc, config):
+    """
+    Identifica e extrai dados das tabelas de um documento já carregado.
+    
+    Por padrão lê o XML das tabelas diretamente (sem os objetos de célula do
+    python-docx); em caso de falha de XML/estrutura, ou com
+    config["extrator_tabelas"] = "docx", usa o extrator baseado em python-docx.
+    """
+    if config.get("extrator_tabelas", "xml") != "docx":
+        try:
+            tabelas = (tbl for tbl in doc.element.body if tbl.tag == _W_TBL)
+            return _contar_extracao(_extrair_registros_tabelas(_tabelas_xml(tabelas), config))
+        except _ERROS_EXTRATOR_XML as e:
+            logger.warning(f"⚠ Extrator XML falhou ({e}). Usando extrator python-docx.")
+    
+    return _contar_extracao(_extrair_registros_tabelas(_tabelas_docx(doc), config))
+
+def identificar_e_extrair_tabelas_xml(origem, config):
+    """
+    Extrai os dados das tabelas lendo word/document.xml em streaming (lxml iterparse).
+    
+    Cada tabela do corpo é processada assim que termina de ser lida e depois
+    descartada, sem montar a árvore do documento inteiro. A origem pode ser um
+    caminho, bytes ou um objeto file-like. Retorna exatamente os mesmos
+    registros, erros e avisos do extrator python-docx, que é usado se a leitura
+    do XML falhar.
+    """
+    if isinstance(origem, (bytes, bytearray)):
+        origem = io.BytesIO(origem)
+    
+    try:
+        with zipfile.ZipFile(origem) as pacote, pacote.open('word/document.xml') as xml:
+            resultado = _extrair_registros_tabelas(_tabelas_xml(_iterar_tabelas_corpo(xml)), config)
+        return _contar_extracao(resultado)
+    except _ERROS_EXTRATOR_XML as e:
+        logger.warning(f"⚠ Extrator XML falhou ({e}). Usando extrator python-docx.")
+    
+    if hasattr(origem, 'seek'):
+        origem.seek(0)
+    return _contar_extracao(_extrair_registros_tabelas(_tabelas_docx(Document(origem)), config))
+
+def _iterar_tabelas_corpo(xml):
+    """Gera as tabelas de primeiro nível do corpo (w:body/w:tbl) à medida que são lidas."""
+    for _, tbl in etree.iterparse(xml, events=('end',), tag=_W_TBL, resolve_entities=False):
+        corpo = tbl.getparent()
+        if corpo is None or corpo.tag != _W_BODY:
+            continue  # Tabela aninhada: faz parte de uma célula da tabela externa
+        yield tbl
+        # Libera a tabela já processada e tudo o que veio antes dela no corpo
+        tbl.clear()
+        while tbl.getprevious() is not None:
+            del corpo[0]
+
+def _texto_run_xml(r):
+    """Texto de um w:r, com a mesma conversão de w:tab, w:br etc. do python-docx."""
+    partes = []
+    for filho in r:
+        tag = filho.tag
+        if tag == _W_T:
+            partes.append(filho.text or "")
+        elif tag == _W_TAB or tag == _W_PTAB:
+            partes.append("\t")
+        elif tag == _W_BR:
+            # Apenas quebras de linha viram "\n" (quebras de página/coluna não têm texto)
+            if filho.get(_W_TYPE, "textWrapping") == "textWrapping":
+                partes.append("\n")
+        elif tag == _W_CR:
+            partes.append("\n")
+        elif tag == _W_NO_BREAK_HYPHEN:
+            partes.append("-")
+    return "".join(partes)
+
+def _texto_paragrafo_xml(p):
+    """Texto de um parágrafo (w:p), como Paragraph.text."""
+    partes = []
+    for filho in p.iterchildren(_W_R, _W_HYPERLINK):
+        if filho.tag == _W_R:
+            partes.append(_texto_run_xml(filho))
+        else:
+            partes.extend(_texto_run_xml(r) for r in filho.iterchildren(_W_R))
+    return "".join(partes)
+
+def _texto_celula_xml(tc):
+    """Texto de uma célula (w:tc): parágrafos diretos unidos por "\\n", como _Cell.text."""
+    return "\n".join(_texto_paragrafo_xml(p) for p in tc.iterchildren(_W_P))
+
+def _propriedade_celula_xml(tc, tag):
+    """Valor w:val de uma propriedade de w:tcPr (ou o próprio elemento, se não tiver val)."""
+    tcPr = tc.find(_W_TCPR)
+    if tcPr is None:
+        return None
+    return tcPr.find(tag)
+
+def _grid_span_xml(tc):
+    gridSpan = _propriedade_celula_xml(tc, _W_GRID_SPAN)
+    return 1 if gridSpan is None else int(gridSpan.get(_W_VAL, "1"))
+
+def _grid_before_xml(tr):
+    trPr = tr.find(_W_TRPR)
+    gridBefore = None if trPr is None else trPr.find(_W_GRID_BEFORE)
+    return 0 if gridBefore is None else int(gridBefore.get(_W_VAL, "0"))
+
+def _tc_acima_xml(tc):
+    """Célula da linha anterior na mesma posição da grade (mesclagem vertical)."""
+    tr = tc.getparent()
+    offset = _grid_before_xml(tr) + sum(_grid_span_xml(anterior) for anterior in tc.itersiblings(_W_TC, preceding=True))
+    tr_acima = tr.getprevious()
+    while tr_acima is not None and tr_acima.tag != _W_TR:
+        tr_acima = tr_acima.getprevious()
+    if tr_acima is None:
+        raise ValueError("no tr above topmost tr in w:tbl")
+    restante = offset - _grid_before_xml(tr_acima)
+    for candidato in tr_acima.iterchildren(_W_TC):
+        if restante < 0:
+            break
+        if restante == 0:
+            return candidato
+        restante -= _grid_span_xml(candidato)
+    raise ValueError(f"no `tc` element at grid_offset={offset}")
+
+def _textos_celulas_xml(tr):
+    """Textos das células de uma linha na grade, com a mesma semântica de _Row.cells."""
+    textos = []
+    for tc in tr.iterchildren(_W_TC):
+        # Célula de continuação de mesclagem vertical: o conteúdo é o da célula de cima
+        while True:
+            vMerge = _propriedade_celula_xml(tc, _W_VMERGE)
+            if vMerge is None or vMerge.get(_W_VAL, "continue") != "continue":
+                break
+            tc = _tc_acima_xml(tc)
+        texto = _texto_celula_xml(tc)
+        textos.extend([texto] * _grid_span_xml(tc))
+    return textos
+
+def _tabelas_xml(tabelas):
+    """Adapta elementos w:tbl para _extrair_registros_tabelas (textos lidos direto do XML)."""
+    for idx_tabela, tbl in enumerate(tabelas, start=1):
+        linhas = tbl.findall(_W_TR)
+        yield idx_tabela, len(linhas), (_textos_celulas_xml(tr) for tr in linhas)
+
+def _tabelas_docx(doc):
+    """Adapta as tabelas do python-docx para _extrair_registros_tabelas."""
+    for idx_tabela, tabela in enumerate(doc.tables, start=1):
+        linhas = tabela.rows
+        yield idx_tabela, len(linhas), ([celula.text for celula in row.cells] for row in linhas)
+
+# Horários: os mesmos textos ("08:00", "08:40"...) se repetem centenas de vezes,
+# então cada (texto, formato) é interpretado uma única vez (cache LRU de
+# LIMITE_CACHE_HORARIOS entradas). Os registros guardam o
+# início em segundos desde a meia-noite ("inicio_segundos") e o gerador calcula
+# os términos de uma especialidade inteira de uma vez, sem strptime por linha.
+LIMITE_CACHE_HORARIOS = 4096
+_SEGUNDOS_DIA = 24 * 60 * 60
+_DATA_BASE_HORARIO = datetime(1900, 1, 1)  # data usada pelo strptime quando o formato só tem hora
+
+@functools.lru_cache(maxsize=LIMITE_CACHE_HORARIOS)
+def _segundos_horario(texto, formato):
+    # -1 para textos fora do formato: os inválidos também ficam em cache
+    try:
+        horario = datetime.strptime(texto, formato)
+    except ValueError:
+        return -1
+    return (horario - _DATA_BASE_HORARIO).seconds
+
+def interpretar_horario(texto, formato):
+    """
+    Segundos desde a meia-noite do horário `texto` no `formato` (strptime).
+    Lança ValueError se o texto não estiver no formato.
+    """
+    segundos = _segundos_horario(texto, formato)
+    if segundos < 0:
+        raise ValueError(f"time data '{texto}' does not match format '{formato}'")
+    return segundos
+
+@functools.lru_cache(maxsize=LIMITE_CACHE_HORARIOS)
+def formatar_horario(segundos, formato):
+    """Texto do horário (segundos desde a meia-noite, com virada do dia) no `formato`."""
+    return (_DATA_BASE_HORARIO + timedelta(seconds=segundos % _SEGUNDOS_DIA)).strftime(formato)
+
+def calcular_terminos(atendimentos, config):
+    """
+    Términos (texto no formato configurado) de uma lista de atendimentos, na mesma
+    ordem: início + duracao_atendimento_minutos, calculados de uma vez.
+    None para os atendimentos com início inválido.
+    """
+    formato = config["formato_hora"]
+    duracao = config["duracao_atendimento_minutos"] * 60
+    return [
+        None if item.inicio_segundos is None else formatar_horario(item.inicio_segundos + duracao, formato)
+        for item in atendimentos
+    ]
+
+@dataclass
+class RegistroAtendimento:
+    """
+    Um atendimento extraído da folha de frequência.
+
+    Com __slots__ (sem __dict__ por registro) e com data, início e procedimento
+    internados: os mesmos textos se repetem em milhares de registros de um lote.
+    inicio_segundos é None se o início não estiver no formato configurado.
+    """
+    __slots__ = ("data", "inicio", "inicio_segundos", "procedimento", "linha_origem", "tabela_origem")
+
+    data: str
+    inicio: str
+    inicio_segundos: Optional[int]
+    procedimento: str
+    linha_origem: int
+    tabela_origem: int
+
+@medir_etapa("extrair_tabelas")
+def _extrair_registros_tabelas(tabelas, config):
+    """
+    Núcleo da extração, comum aos extratores XML e python-docx.
     
-    doc = Document(caminho_origem)
+    Recebe (índice da tabela, total de linhas, linhas) para cada tabela, onde cada
+    linha é a lista de textos das suas células e a primeira é o cabeçalho.
+    """
     dados_totais = []
     tabelas_encontradas = 0
     erros_parsing = []
@@ -161,13 +634,17 @@ def identificar_e_extrair_tabelas(caminho_origem, config):
     colunas_alvo = config["colunas_esperadas"]
     logger.info(f"→ Procurando tabelas com colunas: {', '.join(colunas_alvo)}")
 
-    for idx_tabela, tabela in enumerate(doc.tables, start=1):
+    for idx_tabela, total_linhas, linhas in tabelas:
+        if total_linhas == 0:
+            raise IndexError(f"Tabela {idx_tabela} não possui linhas")
+        
         # Verifica se a primeira linha da tabela contém nossas colunas alvo
-        cabecalho = [celula.text.strip().upper() for celula in tabela.rows[0].cells]
+        linhas = iter(linhas)
+        cabecalho = [texto.strip().upper() for texto in next(linhas)]
         
         if all(coluna in cabecalho for coluna in colunas_alvo):
             tabelas_encontradas += 1
-            logger.info(f"✓ Tabela {idx_tabela} identificada como válida ({len(tabela.rows)-1} linhas de dados)")
+            logger.info(f"✓ Tabela {idx_tabela} identificada como válida ({total_linhas-1} linhas de dados)")
             
             # Mapeia os índices das colunas
             idx_data = cabecalho.index("DATA")
@@ -175,12 +652,10 @@ def identificar_e_extrair_tabelas(caminho_origem, config):
             idx_proc = cabecalho.index("PROCEDIMENTO")
             
             data_atual = ""
-            for i, row in enumerate(tabela.rows):
-                if i == 0: continue # Pula o cabeçalho
-                
-                texto_data = row.cells[idx_data].text.strip()
-                texto_hora = row.cells[idx_hora].text.strip()
-                texto_proc = row.cells[idx_proc].text.strip().upper()
+            for i, celulas in enumerate(linhas, start=1):
+                texto_data = celulas[idx_data].strip()
+                texto_hora = celulas[idx_hora].strip()
+                texto_proc = celulas[idx_proc].strip().upper()
 
                 # Lógica de persistência da data
                 if texto_data:
@@ -197,14 +672,15 @@ def identificar_e_extrair_tabelas(caminho_origem, config):
                 if texto_hora and texto_proc:
                     # Validação de formato de hora
                     try:
-                        datetime.strptime(texto_hora, config["formato_hora"])
-                        dados_totais.append({
-                            "data": data_atual,
-                            "inicio": texto_hora,
-                            "procedimento": texto_proc,
-                            "linha_origem": i + 1,
-                            "tabela_origem": idx_tabela
-                        })
+                        inicio_segundos = interpretar_horario(texto_hora, config["formato_hora"])
+                        dados_totais.append(RegistroAtendimento(
+                            sys.intern(data_atual),
+                            sys.intern(texto_hora),
+                            inicio_segundos,
+                            sys.intern(texto_proc),
+                            i + 1,
+                            idx_tabela
+                        ))
                     except ValueError:
                         msg = f"Tabela {idx_tabela}, Linha {i+1}: Formato de hora inválido '{texto_hora}' (esperado {config['formato_hora']})"
                         erros_parsing.append(msg)
@@ -229,6 +705,17 @@ def identificar_e_extrair_tabelas(caminho_origem, config):
     
     return dados_totais, erros_parsing, avisos_data
 
+def _contar_extracao(resultado):
+    """
+    Soma nas métricas os registros, erros e avisos de uma extração concluída
+    (só a que é devolvida: uma tentativa do extrator XML que falhou não conta).
+    """
+    dados, erros, avisos = resultado
+    incrementar("folha_registros_extraidos_total", len(dados))
+    incrementar("folha_erros_parsing_total", len(erros))
+    incrementar("folha_avisos_data_total", len(avisos))
+    return resultado
+
 def adicionar_logo_e_confidencial_ao_cabecalho(doc, caminho_logo='logo_extraida.png'):
     """Adiciona a logo e o texto CONFIDENCIAL ao cabeçalho do documento."""
     from docx.shared import Inches, RGBColor, Pt
@@ -350,6 +837,16 @@ def copiar_cabecalho_completo(doc_template, doc_destino):
             
             logger.info(f"✓ Cabeçalho da seção {i+1} copiado com sucesso")
 
+def montar_variaveis_cabecalho(dados_cabecalho):
+    """Monta o mapeamento {VARIAVEL} → valor usado nas substituições do template."""
+    return {
+        "{MES_ANO}": dados_cabecalho.get("mes_ano", ""),
+        "{NOME_PACIENTE}": dados_cabecalho.get("nome_paciente", ""),
+        "{INICIAIS}": dados_cabecalho.get("iniciais", ""),
+        "{DATA_NASCIMENTO}": dados_cabecalho.get("data_nascimento", ""),
+        "{CODIGOS_CID_E_DESCRICAO}": dados_cabecalho.get("codigos_cid_e_descricao", "")
+    }
+
 def substituir_variaveis_cabecalho(doc, dados_cabecalho):
     """Substitui as variáveis no cabeçalho do documento preservando TODA a formatação."""
     if not dados_cabecalho:
@@ -358,14 +855,7 @@ def substituir_variaveis_cabecalho(doc, dados_cabecalho):
     
     logger.info("→ Substituindo variáveis no cabeçalho do template")
     
-    # Mapeamento de variáveis
-    variaveis = {
-        "{MES_ANO}": dados_cabecalho.get("mes_ano", ""),
-        "{NOME_PACIENTE}": dados_cabecalho.get("nome_paciente", ""),
-        "{INICIAIS}": dados_cabecalho.get("iniciais", ""),
-        "{DATA_NASCIMENTO}": dados_cabecalho.get("data_nascimento", ""),
-        "{CODIGOS_CID_E_DESCRICAO}": dados_cabecalho.get("codigos_cid_e_descricao", "")
-    }
+    variaveis = montar_variaveis_cabecalho(dados_cabecalho)
     
     # Substitui no cabeçalho
     for section in doc.sections:
@@ -449,103 +939,39 @@ def substituir_variaveis_em_paragrafo(para, variaveis):
             run.text = texto_novo[posicao_atual:posicao_atual + tamanho_run_novo]
             posicao_atual += tamanho_run_novo
 
-def clonar_tabela_completa(tabela_modelo, doc):
-    """
-    Clona uma tabela preservando TODAS as propriedades:
-    - Larguras de colunas
-    - Alturas de linhas
-    - Estilo da tabela
-    - Bordas, cores, fonte, alinhamento
-    """
-    from docx.oxml import parse_xml
-    from copy import deepcopy
-    
-    # Clona o elemento XML da tabela inteira
-    tbl_element = deepcopy(tabela_modelo._element)
-    
-    # Adiciona a tabela clonada ao documento
-    doc._element.body.append(tbl_element)
-    
-    # Retorna a nova tabela (último item na lista de tabelas)
-    return doc.tables[-1]
-
-def clonar_linha_tabela(tabela_destino, linha_modelo):
-    """Clona uma linha de tabela preservando toda a formatação."""
-    from copy import deepcopy
-    
-    # Clona o elemento XML da linha
-    tr_element = deepcopy(linha_modelo._element)
-    
-    # Adiciona a linha clonada à tabela
-    tabela_destino._element.append(tr_element)
-    
-    # Retorna a nova linha
-    return tabela_destino.rows[-1]
+# Cache de templates já carregados e preparados (chave: caminho do template)
+_cache_templates = {}
+_lock_cache_templates = threading.Lock()
 
-def preencher_linha_tabela(linha, dados_linha):
-    """Preenche uma linha da tabela com dados mantendo a formatação."""
-    for i, dado in enumerate(dados_linha):
-        if i < len(linha.cells):
-            celula = linha.cells[i]
-            # Limpa o conteúdo preservando formatação
-            if celula.paragraphs:
-                para = celula.paragraphs[0]
-                # Limpa texto mas mantém formatação dos runs
-                for run in para.runs:
-                    run.text = ''
-                # Adiciona o novo texto no primeiro run (mantém formatação)
-                if para.runs:
-                    para.runs[0].text = str(dado)
-                else:
-                    # Se não tem runs, adiciona texto simples
-                    para.add_run(str(dado))
-
-def gerar_word_evolucao(dados, caminho_destino, config, dados_cabecalho=None):
-    """Gera o documento Word de evolução usando template com substituição de variáveis."""
-    if not dados:
-        logger.error("✗ Nenhum dado válido para gerar o documento de evolução.")
-        return False
+def _assinatura_arquivo(caminho):
+    """Retorna (mtime, tamanho) do arquivo, usado para detectar alterações no template e no config.json."""
+    info = os.stat(caminho)
+    return (info.st_mtime_ns, info.st_size)
 
-    logger.info(f"→ Gerando documento de evolução: '{caminho_destino}'")
-    
-    # Verifica se o template existe
-    caminho_template = config["caminho_template"]
-    if not os.path.exists(caminho_template):
-        logger.error(f"✗ Template não encontrado: '{caminho_template}'")
-        logger.error("   Certifique-se de que o template foi criado corretamente.")
-        return False
+@medir_etapa("preparar_template")
+def _preparar_template(caminho_template):
+    """
+    Carrega o template do disco e o deixa pronto para ser copiado:
+    - adiciona logo e CONFIDENCIAL ao cabeçalho (se necessário);
+    - localiza a tabela modelo, a linha de dados modelo e o título {NOME_ESPECIALIDADE};
+    - remove do corpo a tabela modelo e o título (eles são clonados a cada especialidade).
     
+    Retorna um dicionário com o documento base e os elementos modelo, ou None em caso de erro.
+    """
     logger.info(f"→ Carregando template: '{caminho_template}'")
-    
-    # SOLUÇÃO DEFINITIVA: Copiar o template fisicamente antes de abrir
-    # Isso preserva TUDO: imagens, relationships, formatação
-    import shutil
-    import tempfile
-    
-    # Cria uma cópia temporária do template
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-    temp_template_path = temp_file.name
-    temp_file.close()
-    
-    shutil.copy2(caminho_template, temp_template_path)
-    logger.info(f"✓ Template copiado para: {temp_template_path}")
-    
-    # Carrega a CÓPIA do template (que preserva tudo)
-    doc = Document(temp_template_path)
-    
-    logger.info("✓ Template carregado (cabeçalho preservado com logo e CONFIDENCIAL)")
+    inicio_carga = time.perf_counter()
+    assinatura = _assinatura_arquivo(caminho_template)
+    with open(caminho_template, 'rb') as f:
+        conteudo_template = f.read()
+    doc = Document(io.BytesIO(conteudo_template))
     
     # Adiciona logo e CONFIDENCIAL se não estiverem presentes
     adicionar_logo_e_confidencial_ao_cabecalho(doc)
     
-    # Substitui variáveis do cabeçalho (SEM remover/recriar nada)
-    if dados_cabecalho:
-        substituir_variaveis_cabecalho(doc, dados_cabecalho)
-    
     # Localiza a tabela modelo (primeira tabela do template)
     if not doc.tables:
         logger.error("✗ Template não contém nenhuma tabela modelo!")
-        return False
+        return None
     
     tabela_modelo = doc.tables[0]
     logger.info(f"✓ Tabela modelo identificada: {len(tabela_modelo.rows)} linhas, {len(tabela_modelo.columns)} colunas")
@@ -553,9 +979,14 @@ def gerar_word_evolucao(dados, caminho_destino, config, dados_cabecalho=None):
     # Verifica se a tabela modelo tem pelo menos 2 linhas (cabeçalho + 1 linha de exemplo)
     if len(tabela_modelo.rows) < 2:
         logger.error("✗ Tabela modelo deve ter pelo menos 2 linhas (cabeçalho + linha de dados exemplo)")
-        return False
+        return None
     
     linha_dados_modelo = tabela_modelo.rows[1]  # Segunda linha como modelo de formatação
+    plano_linha = compilar_plano_linha(
+        linha_dados_modelo, _TOTAL_COLUNAS, (_COLUNA_NUMERO, _COLUNA_DATA, _COLUNA_INICIO, _COLUNA_TERMINO)
+    )
+    if plano_linha is None:
+        logger.warning("⚠ Linha modelo com mesclagem vertical: as linhas serão clonadas e preenchidas uma a uma")
     
     # Localiza e salva o parágrafo do título como modelo
     paragrafo_titulo_modelo = None
@@ -583,100 +1014,1449 @@ def gerar_word_evolucao(dados, caminho_destino, config, dados_cabecalho=None):
         except Exception as e:
             logger.warning(f"⚠ Não foi possível remover elemento: {e}")
     
-    # Agrupa por especialidade
-    especialidades = sorted(list(set(d['procedimento'] for d in dados)))
-    logger.info(f"→ Processando {len(especialidades)} especialidade(s): {', '.join(especialidades)}")
+    elementos_clonados = [tabela_modelo._element]
+    if paragrafo_titulo_modelo is not None:
+        elementos_clonados.append(paragrafo_titulo_modelo._element)
+    plano_saida = _planejar_saida(doc, elementos_clonados)
+    if plano_saida["duplicatas"] or plano_saida["relacoes_removidas"]:
+        _aplicar_plano_saida(doc.part.package, plano_saida)
+        logger.info(f"  • Saída enxuta: {len(plano_saida['duplicatas'])} mídia(s) duplicada(s), "
+                    f"{sum(map(len, plano_saida['relacoes_removidas'].values()))} relação(ões) não usada(s) removidas")
+    partes_compartilhadas = _partes_compartilhaveis(doc)
+    
+    memoria_estimada = _tamanho_pacote_em_memoria(doc) + len(etree.tostring(tabela_modelo._element))
+    if paragrafo_titulo_modelo is not None:
+        memoria_estimada += len(etree.tostring(paragrafo_titulo_modelo._element))
+    tempo_carga_ms = (time.perf_counter() - inicio_carga) * 1000
+    
+    logger.info("✓ Template carregado e mantido em memória (cabeçalho preservado com logo e CONFIDENCIAL)")
+    logger.info(f"  • Carga: {tempo_carga_ms:.0f} ms | Memória estimada: {memoria_estimada / 1024:.0f} KB")
+    
+    return {
+        "caminho": caminho_template,
+        "assinatura": assinatura,
+        # Impressão digital do conteúdo (usada, por exemplo, em chaves de cache de resultados)
+        "hash": hashlib.sha256(conteudo_template).hexdigest(),
+        "documento": doc,
+        "tabela_modelo": tabela_modelo,
+        "linha_dados_modelo": linha_dados_modelo,
+        "plano_linha": plano_linha,
+        "paragrafo_titulo_modelo": paragrafo_titulo_modelo,
+        "plano_saida": plano_saida,
+        "partes_compartilhadas": partes_compartilhadas,
+        "tempo_carga_ms": round(tempo_carga_ms, 1),
+        "memoria_estimada_bytes": memoria_estimada
+    }
 
-    total_linhas_geradas = 0
-    duracao = config["duracao_atendimento_minutos"]
+def _tamanho_pacote_em_memoria(doc):
+    """
+    Estimativa do espaço ocupado pelo documento em memória: XML serializado
+    das partes + conteúdo binário (imagens, fontes etc.).
+    """
+    total = 0
+    for parte in doc.part.package.iter_parts():
+        elemento = getattr(parte, '_element', None)
+        total += len(etree.tostring(elemento)) if elemento is not None else len(parte.blob)
+    return total
 
-    for esp in especialidades:
-        atendimentos_esp = [d for d in dados if d['procedimento'] == esp]
-        logger.info(f"  • {esp}: {len(atendimentos_esp)} atendimento(s)")
-        
-        # CLONA o parágrafo do título preservando toda a formatação
-        from copy import deepcopy
-        if paragrafo_titulo_modelo:
-            # Clona o elemento XML do título
-            titulo_element = deepcopy(paragrafo_titulo_modelo._element)
-            doc._element.body.append(titulo_element)
-            
-            # Acessa o novo parágrafo adicionado
-            novo_titulo = doc.paragraphs[-1]
-            
-            # Substitui a variável pelo nome da especialidade
-            for run in novo_titulo.runs:
-                if '{NOME_ESPECIALIDADE}' in run.text:
-                    run.text = run.text.replace('{NOME_ESPECIALIDADE}', esp)
-        else:
-            # Fallback: se não encontrou o modelo, adiciona texto simples
-            titulo = doc.add_paragraph(esp)
-            titulo.style = 'Normal'
+def obter_template(caminho_template):
+    """
+    Retorna o template preparado a partir do cache em memória.
+    
+    O template é lido do disco apenas na primeira chamada ou quando o arquivo
+    é alterado (mtime/tamanho diferentes), sem precisar reiniciar o servidor.
+    Retorna None se o template não existir ou for inválido.
+    """
+    if not os.path.exists(caminho_template):
+        logger.error(f"✗ Template não encontrado: '{caminho_template}'")
+        logger.error("   Certifique-se de que o template foi criado corretamente.")
+        return None
+    
+    with _lock_cache_templates:
+        template = _cache_templates.get(caminho_template)
+        try:
+            assinatura = _assinatura_arquivo(caminho_template)
+        except OSError as e:
+            logger.error(f"✗ Não foi possível acessar o template '{caminho_template}': {e}")
+            return None
         
-        # CLONA A TABELA COMPLETA (preserva tudo: larguras, alturas, bordas, cores)
-        nova_tabela = clonar_tabela_completa(tabela_modelo, doc)
+        if template is not None and template["assinatura"] == assinatura:
+            return template
         
-        # Remove todas as linhas de dados (mantém só o cabeçalho)
-        # A tabela clonada vem com todas as linhas do template
-        linhas_para_remover = len(nova_tabela.rows) - 1  # Remove todas exceto cabeçalho
-        for _ in range(linhas_para_remover):
-            # Remove sempre a segunda linha (índice 1, pois índice 0 é o cabeçalho)
-            if len(nova_tabela.rows) > 1:
-                nova_tabela._element.remove(nova_tabela.rows[1]._element)
-
-        # Preenche a tabela com dados da especialidade
-        contador_sessao = 1  # Contador sequencial para cada especialidade
-        for item in atendimentos_esp:
-            try:
-                inicio = datetime.strptime(item['inicio'], config["formato_hora"])
-                termino = (inicio + timedelta(minutes=duracao)).strftime(config["formato_hora"])
-                
-                # Clona a linha de dados do modelo (linha 1 da tabela modelo)
-                nova_linha = clonar_linha_tabela(nova_tabela, linha_dados_modelo)
-                
-                # Dados da linha: [Nº, DATA, INÍCIO, TÉRMINO, EVOLUÇÃO DIÁRIA (vazio), TÉCNICO (vazio)]
-                dados_linha = [
-                    str(contador_sessao),  # Nº - Contador sequencial
-                    item['data'],
-                    item['inicio'],
-                    termino,
-                    "",  # EVOLUÇÃO DIÁRIA
-                    ""   # TÉCNICO
-                ]
-                
-                preencher_linha_tabela(nova_linha, dados_linha)
-                total_linhas_geradas += 1
-                contador_sessao += 1  # Incrementa contador
-                
-            except ValueError as e:
-                logger.error(f"✗ Erro ao processar {esp} (Tabela {item['tabela_origem']}, Linha {item['linha_origem']}): {e}")
-
-    try:
-        doc.save(caminho_destino)
+        if template is not None:
+            logger.info(f"ℹ Template alterado em disco, recarregando: '{caminho_template}'")
         
-        # Limpa o arquivo temporário
         try:
-            os.unlink(temp_template_path)
-        except:
-            pass
+            template = _preparar_template(caminho_template)
+        except Exception as e:
+            logger.error(f"✗ ERRO ao carregar template '{caminho_template}': {e}")
+            return None
         
-        logger.info(f"\n{'='*60}")
-        logger.info(f"✓ SUCESSO! Documento gerado:")
-        logger.info(f"  • Arquivo: '{caminho_destino}'")
-        logger.info(f"  • Total de linhas: {total_linhas_geradas}")
-        logger.info(f"  • Especialidades: {len(especialidades)}")
-        logger.info(f"  • Duração padrão: {duracao} minutos")
+        if template is None:
+            _cache_templates.pop(caminho_template, None)
+            return None
+        
+        _cache_templates[caminho_template] = template
+        return template
+
+# Registro de templates: {nome: caminho} dos .docx de config["diretorio_templates"]
+# (nome = nome do arquivo sem extensão) mais o template padrão (config["caminho_template"])
+_registro_templates = {"origem": None, "templates": {}}
+_lock_registro_templates = threading.Lock()
+
+def nome_template_padrao(config):
+    return os.path.splitext(os.path.basename(config["caminho_template"]))[0]
+
+def _descobrir_templates(config):
+    """Varre config["diretorio_templates"] e monta {nome: caminho} (com o template padrão)."""
+    padrao = config["caminho_template"]
+    templates = {}
+    diretorio = config.get("diretorio_templates") or ""
+    if diretorio and os.path.isdir(diretorio):
+        for nome_arquivo in sorted(os.listdir(diretorio)):
+            # ~$arquivo.docx: arquivo de bloqueio criado pelo Word enquanto o template está aberto
+            if not nome_arquivo.lower().endswith('.docx') or nome_arquivo.startswith('~$'):
+                continue
+            caminho = os.path.join(diretorio, nome_arquivo)
+            # O padrão usa o caminho do config, a mesma chave do cache de templates
+            if os.path.normpath(caminho) == os.path.normpath(padrao):
+                caminho = padrao
+            templates[os.path.splitext(nome_arquivo)[0]] = caminho
+    templates.setdefault(nome_template_padrao(config), padrao)
+    return templates
+
+def _atualizar_registro_templates(config):
+    templates = _descobrir_templates(config)
+    with _lock_registro_templates:
+        _registro_templates["origem"] = (config.get("diretorio_templates"), config["caminho_template"])
+        _registro_templates["templates"] = templates
+    return templates
+
+def carregar_registro_templates(config):
+    """
+    Descobre os templates disponíveis e pré-carrega todos em memória.
+
+    Returns:
+        dict: {nome: caminho} dos templates registrados
+    """
+    templates = _atualizar_registro_templates(config)
+    logger.info(f"→ Registro de templates: {len(templates)} template(s)")
+    for caminho in templates.values():
+        obter_template(caminho)
+    return templates
+
+def resolver_template(nome, config):
+    """
+    Caminho do template `nome` no registro (None ou vazio: template padrão).
+
+    Nomes desconhecidos fazem o diretório ser varrido de novo (templates
+    adicionados sem reiniciar); retorna None se o template não existir.
+    """
+    if not nome:
+        return config["caminho_template"]
+    with _lock_registro_templates:
+        origem_atual = _registro_templates["origem"] == (config.get("diretorio_templates"), config["caminho_template"])
+        caminho = _registro_templates["templates"].get(nome) if origem_atual else None
+    if caminho is None:
+        caminho = _atualizar_registro_templates(config).get(nome)
+    return caminho
+
+def listar_templates(config):
+    """
+    Situação de cada template do registro: caminho, se está carregado em
+    memória, tempo de carga e memória estimada.
+    """
+    padrao = nome_template_padrao(config)
+    templates = []
+    for nome, caminho in _atualizar_registro_templates(config).items():
+        with _lock_cache_templates:
+            carregado = _cache_templates.get(caminho)
+        templates.append({
+            "nome": nome,
+            "caminho": caminho,
+            "padrao": nome == padrao,
+            "carregado": carregado is not None,
+            "tempo_carga_ms": carregado["tempo_carga_ms"] if carregado else None,
+            "memoria_estimada_bytes": carregado["memoria_estimada_bytes"] if carregado else None,
+            "hash": carregado["hash"] if carregado else None
+        })
+    return templates
+
+def _partes_compartilhaveis(doc):
+    """
+    Partes do template que as cópias podem compartilhar em vez de copiar: as que
+    os documentos gerados só leem (estilos, tema, fontes, imagens...). O corpo e
+    os cabeçalhos/rodapés (variáveis substituídas) são copiados, assim como as
+    partes que apontam para uma parte copiada.
+    """
+    copiadas = {doc.part} | {
+        rel.target_part for rel in doc.part.rels.values()
+        if not rel.is_external and rel.reltype in (RT.HEADER, RT.FOOTER)
+    }
+    compartilhadas = set(doc.part.package.iter_parts()) - copiadas
+    alterou = True
+    while alterou:
+        alterou = False
+        for parte in list(compartilhadas):
+            if any(not rel.is_external and rel.target_part not in compartilhadas for rel in parte.rels.values()):
+                compartilhadas.discard(parte)
+                alterou = True
+    return frozenset(compartilhadas)
+
+def copiar_documento_template(template):
+    """Cria uma cópia (em memória) do documento base do template, independente nas partes alteradas."""
+    # Copia o pacote (partes e relationships) e não o objeto Document: os elementos
+    # lxml não compartilham o memo do deepcopy, então copiar o Document separaria
+    # doc._element do XML que é efetivamente salvo pela parte principal.
+    # As partes só lidas entram no memo já "copiadas": a cópia usa as do template.
+    memo = {id(parte): parte for parte in template["partes_compartilhadas"]}
+    pacote = copy.deepcopy(template["documento"].part.package, memo)
+    return pacote.main_document_part.document
+
+# Relações que só fazem sentido se referenciadas (r:id, r:embed...) no XML da parte de origem
+_RELACOES_POR_REFERENCIA = {RT.IMAGE, RT.HYPERLINK, RT.HEADER, RT.FOOTER, RT.OLE_OBJECT, RT.CHART}
+# Partes do template que nunca são usadas no documento gerado (miniatura, blocos de construção)
+_RELACOES_DESCARTAVEIS = {RT.THUMBNAIL, RT.GLOSSARY_DOCUMENT}
+# Formatos em que o deflate não reduz nada (só custaria CPU): gravados sem compressão.
+# PNG/GIF ficam de fora: o deflate do zip ainda costuma ganhar alguns bytes neles
+_EXTENSOES_JA_COMPRIMIDAS = {"jpg", "jpeg", "wdp", "emz", "wmz", "mp3", "mp4", "m4a", "zip"}
+_XPATH_REFERENCIAS = etree.XPath(
+    "//@r:* | //@o:relid",
+    namespaces={
+        "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+        "o": "urn:schemas-microsoft-com:office:office",
+    },
+)
+
+def _planejar_saida(doc, elementos_clonados=()):
+    """
+    Calcula, uma vez por template, o que enxugar no pacote dos documentos gerados:
+    - mídias com conteúdo idêntico (a primeira fica, as demais passam a apontar para ela);
+    - relações não referenciadas no XML (imagens, cabeçalhos, links... que sobraram
+      no template) e partes nunca usadas (miniatura, blocos de construção).
+
+    elementos_clonados são os elementos removidos do corpo do template e clonados
+    nos documentos (tabela e título modelo): suas referências continuam valendo.
+    Os documentos gerados só acrescentam texto e tabelas clonadas, sem novas
+    relações: o plano é aplicado uma vez ao template e vale para todas as cópias.
+    """
+    pacote = doc.part.package
+    partes = list(pacote.iter_parts())
+
+    duplicatas = {}
+    por_conteudo = {}
+    for parte in partes:
+        if isinstance(parte, XmlPart):
+            continue
+        chave = (parte.content_type, hashlib.sha256(parte.blob).digest())
+        original = por_conteudo.setdefault(chave, parte)
+        if original is not parte:
+            duplicatas[str(parte.partname)] = str(original.partname)
+
+    relacoes_removidas = {}
+    for origem in [pacote] + partes:
+        referenciados = set()
+        if isinstance(origem, XmlPart):
+            referenciados.update(_XPATH_REFERENCIAS(origem._element))
+        if origem is doc.part:
+            for elemento in elementos_clonados:
+                referenciados.update(_XPATH_REFERENCIAS(elemento))
+        remover = [
+            rId for rId, rel in origem.rels.items()
+            if rel.reltype in _RELACOES_DESCARTAVEIS
+            or (rel.reltype in _RELACOES_POR_REFERENCIA and rId not in referenciados)
+        ]
+        if remover:
+            relacoes_removidas["/" if origem is pacote else str(origem.partname)] = remover
+
+    return {"duplicatas": duplicatas, "relacoes_removidas": relacoes_removidas}
+
+def _aplicar_plano_saida(pacote, plano):
+    """Aplica o plano de _planejar_saida ao pacote do template."""
+    partes = {str(parte.partname): parte for parte in pacote.iter_parts()}
+    origens = [pacote] + list(partes.values())
+
+    for partname, rIds in plano["relacoes_removidas"].items():
+        if partname == "/":
+            for rId in rIds:
+                pacote.rels.pop(rId, None)
+            continue
+        origem = partes.get(partname)
+        if origem is None:
+            continue
+        for rId in rIds:
+            if rId in origem.rels:
+                origem.drop_rel(rId)
+
+    if plano["duplicatas"]:
+        for origem in origens:
+            for rId, rel in list(origem.rels.items()):
+                if rel.is_external:
+                    continue
+                original = partes.get(plano["duplicatas"].get(str(rel.target_part.partname)))
+                if original is not None:
+                    # Mesmo rId, agora apontando para a mídia que fica no pacote
+                    origem.rels.add_relationship(rel.reltype, original, rId)
+
+class _EscritorZipSaida:
+    """
+    Escritor físico do pacote (mesma interface do PhysPkgWriter do python-docx,
+    usado pelo PackageWriter) com o nível de compressão escolhido e a gravação
+    de uma parte aos poucos (abrir). O PhysPkgWriter usa sempre o nível padrão
+    do deflate e só grava partes já serializadas (blob).
+    """
+
+    def __init__(self, destino, nivel_compressao):
+        self.nivel_compressao = nivel_compressao
+        self._zip = zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED,
+                                    compresslevel=nivel_compressao)
+
+    def write(self, pack_uri, blob):
+        if self.nivel_compressao == 0 or pack_uri.ext.lower() in _EXTENSOES_JA_COMPRIMIDAS:
+            self._zip.writestr(pack_uri.membername, blob, compress_type=zipfile.ZIP_STORED)
+        else:
+            self._zip.writestr(pack_uri.membername, blob, compresslevel=self.nivel_compressao)
+
+    def abrir(self, pack_uri):
+        """Arquivo (modo escrita) para gravar o conteúdo de uma parte aos poucos."""
+        if self.nivel_compressao == 0:
+            info = zipfile.ZipInfo(pack_uri.membername, date_time=time.localtime(time.time())[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            return self._zip.open(info, 'w')
+        return self._zip.open(pack_uri.membername, 'w')
+
+    def close(self):
+        self._zip.close()
+
+@medir_etapa("salvar_documento")
+def salvar_documento(doc, destino, config, escrever_corpo=None):
+    """
+    Grava o documento (caminho ou file-like) com o nível de compressão de
+    config["nivel_compressao_saida"].
+
+    escrever_corpo(arquivo), se informado, grava o word/document.xml no lugar
+    da serialização do DOM (ver escrever_corpo_streaming).
+
+    Num caminho, grava em um temporário na mesma pasta e só então substitui o
+    destino: uma falha no meio da gravação não deixa um .docx truncado.
+    """
+    if isinstance(destino, (str, os.PathLike)):
+        temporario = f"{os.fspath(destino)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            _gravar_pacote(doc, temporario, config, escrever_corpo)
+            os.replace(temporario, destino)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+    else:
+        _gravar_pacote(doc, destino, config, escrever_corpo)
+
+def _gravar_pacote(doc, destino, config, escrever_corpo):
+    pacote = doc.part.package
+
+    partes = list(pacote.iter_parts())
+    for parte in partes:
+        parte.before_marshal()
+
+    # Mesmo roteiro do doc.save() (OpcPackage.save + PackageWriter), trocando só
+    # o escritor físico: nível de compressão escolhido e corpo em streaming
+    escritor = _EscritorZipSaida(destino, config.get("nivel_compressao_saida", 6))
+    try:
+        PackageWriter._write_content_types_stream(escritor, partes)
+        PackageWriter._write_pkg_rels(escritor, pacote.rels)
+        for parte in partes:
+            if parte is doc.part and escrever_corpo is not None:
+                with escritor.abrir(parte.partname) as arquivo:
+                    escrever_corpo(arquivo)
+                if len(parte.rels):
+                    escritor.write(parte.partname.rels_uri, parte.rels.xml)
+            else:
+                PackageWriter._write_parts(escritor, [parte])
+    finally:
+        escritor.close()
+
+def clonar_tabela_completa(tabela_modelo, doc):
+    """
+    Clona uma tabela preservando TODAS as propriedades:
+    - Larguras de colunas
+    - Alturas de linhas
+    - Estilo da tabela
+    - Bordas, cores, fonte, alinhamento
+    """
+    from copy import deepcopy
+    
+    # Clona o elemento XML da tabela inteira
+    tbl_element = deepcopy(tabela_modelo._element)
+    
+    # Adiciona a tabela clonada ao documento
+    doc._element.body.append(tbl_element)
+    
+    # Retorna a nova tabela apontando direto para o elemento adicionado
+    # (doc.tables reconstrói a lista varrendo o corpo inteiro a cada acesso)
+    return Table(tbl_element, doc._body)
+
+def clonar_linha_tabela(tabela_destino, linha_modelo):
+    """Clona uma linha de tabela preservando toda a formatação."""
+    from copy import deepcopy
+    
+    # Clona o elemento XML da linha
+    tr_element = deepcopy(linha_modelo._element)
+    
+    # Adiciona a linha clonada à tabela
+    tabela_destino._element.append(tr_element)
+    
+    # Retorna a nova linha apontando direto para o elemento adicionado
+    # (tabela.rows reconstrói a lista de linhas a cada acesso)
+    return _Row(tr_element, tabela_destino)
+
+def preencher_celula(celula, dado):
+    """Substitui o texto de uma célula mantendo a formatação do primeiro run."""
+    # Limpa o conteúdo preservando formatação
+    if celula.paragraphs:
+        para = celula.paragraphs[0]
+        # Limpa texto mas mantém formatação dos runs
+        for run in para.runs:
+            run.text = ''
+        # Adiciona o novo texto no primeiro run (mantém formatação)
+        if para.runs:
+            para.runs[0].text = str(dado)
+        else:
+            # Se não tem runs, adiciona texto simples
+            para.add_run(str(dado))
+
+def preencher_linha_tabela(linha, dados_linha):
+    """Preenche uma linha da tabela com dados mantendo a formatação."""
+    # linha.cells recalcula a grade de células a cada acesso: obtém uma única vez
+    celulas = linha.cells
+    for i, dado in enumerate(dados_linha):
+        if i < len(celulas):
+            preencher_celula(celulas[i], dado)
+
+# Marcador das colunas variáveis na compilação do plano de carimbo (caractere de uso privado)
+_MARCADOR_COLUNA = "\ue000{}\ue000"
+
+def compilar_plano_linha(linha_modelo, total_colunas, colunas_variaveis):
+    """
+    Compila a linha de dados modelo num plano de carimbo.
+
+    A linha é preenchida uma única vez com preencher_linha_tabela (colunas fixas
+    vazias, variáveis com um marcador) e o plano guarda essa linha pronta e a
+    posição, entre os w:t da linha, do texto de cada coluna variável. Gerar uma
+    linha passa a ser copiar a linha pronta e trocar esses textos.
+
+    Retorna None se a linha tiver células de continuação de mesclagem vertical
+    (o conteúdo delas está na linha de cima): nesse caso cada linha é clonada e
+    preenchida como antes.
+    """
+    tr = copy.deepcopy(linha_modelo._element)
+    for tc in tr.iterchildren(_W_TC):
+        vMerge = _propriedade_celula_xml(tc, _W_VMERGE)
+        if vMerge is not None and vMerge.get(_W_VAL, "continue") == "continue":
+            return None
+
+    marcadores = {_MARCADOR_COLUNA.format(coluna): coluna for coluna in colunas_variaveis}
+    preencher_linha_tabela(_Row(tr, linha_modelo.table), [
+        _MARCADOR_COLUNA.format(coluna) if coluna in colunas_variaveis else "" for coluna in range(total_colunas)
+    ])
+    posicoes = tuple(
+        (posicao, marcadores[t.text]) for posicao, t in enumerate(tr.iter(_W_T)) if t.text in marcadores
+    )
+    return {"tr": tr, "posicoes": posicoes}
+
+def _texto_carimbavel(valor):
+    """O texto vira um único w:t sem xml:space (o que preencher_celula produziria)."""
+    return bool(valor) and valor == valor.strip() and not any(c in valor for c in "\t\r\n")
+
+def carimbar_linha(tabela, template, dados_linha):
+    """
+    Acrescenta à tabela uma linha de dados com os textos de dados_linha (ver
+    montar_linha_evolucao) e retorna o elemento w:tr.
+
+    Usa o plano compilado do template quando possível; textos que o preenchimento
+    normal transformaria em mais de um elemento (tabulações, quebras, espaços nas
+    pontas, vazio) usam o caminho clonar + preencher.
+    """
+    plano = template["plano_linha"]
+    if plano is None or not all(_texto_carimbavel(dados_linha[coluna]) for _, coluna in plano["posicoes"]):
+        linha = clonar_linha_tabela(tabela, template["linha_dados_modelo"])
+        preencher_linha_tabela(linha, dados_linha)
+        return linha._element
+
+    tr = copy.deepcopy(plano["tr"])
+    textos = list(tr.iter(_W_T))
+    for posicao, coluna in plano["posicoes"]:
+        textos[posicao].text = dados_linha[coluna]
+    tabela._element.append(tr)
+    return tr
+
+@medir_etapa("agrupar_especialidades")
+def agrupar_por_especialidade(dados):
+    """
+    Agrupa os atendimentos por especialidade em uma única passada.
+    
+    Retorna um dicionário {especialidade: [atendimentos]} com as especialidades em
+    ordem alfabética e os atendimentos na ordem original de extração.
+    """
+    grupos = {}
+    for item in dados:
+        grupos.setdefault(item.procedimento, []).append(item)
+    return {esp: grupos[esp] for esp in sorted(grupos)}
+
+def contar_por_especialidade(grupos):
+    """Resumo {especialidade: quantidade de atendimentos} de um agrupamento."""
+    return {esp: len(atendimentos) for esp, atendimentos in grupos.items()}
+
+def clonar_titulo_modelo(template, doc, dados_cabecalho=None):
+    """
+    Cópia do parágrafo de título modelo ({NOME_ESPECIALIDADE}) para um documento,
+    com as variáveis do cabeçalho já substituídas. None se o template não tiver título.
+    """
+    if template["paragrafo_titulo_modelo"] is None:
+        return None
+    paragrafo = Paragraph(copy.deepcopy(template["paragrafo_titulo_modelo"]._element), doc._body)
+    if dados_cabecalho:
+        substituir_variaveis_em_paragrafo(paragrafo, montar_variaveis_cabecalho(dados_cabecalho))
+    return paragrafo
+
+# Colunas das tabelas de evolução (ver montar_linha_evolucao); a partir de
+# EVOLUÇÃO DIÁRIA, o conteúdo é preenchido à mão pelos profissionais
+_COLUNA_NUMERO, _COLUNA_DATA, _COLUNA_INICIO, _COLUNA_TERMINO, _PRIMEIRA_COLUNA_MANUAL = range(5)
+_TOTAL_COLUNAS = 6
+
+def montar_linha_evolucao(numero, item, config, termino=None):
+    """
+    Textos de uma linha da tabela de evolução:
+    [Nº, DATA, INÍCIO, TÉRMINO, EVOLUÇÃO DIÁRIA (vazio), TÉCNICO (vazio)].
+    O término vem pronto de calcular_terminos ou é calculado aqui.
+    Lança ValueError se o início não estiver em config["formato_hora"].
+    """
+    if termino is None:
+        if item.inicio_segundos is None:
+            raise ValueError(f"horário inválido '{item.inicio}' (esperado {config['formato_hora']})")
+        termino = formatar_horario(
+            item.inicio_segundos + config["duracao_atendimento_minutos"] * 60, config["formato_hora"]
+        )
+    return [
+        str(numero),  # Nº - Contador sequencial
+        item.data,
+        item.inicio,
+        termino,
+        "",  # EVOLUÇÃO DIÁRIA
+        ""   # TÉCNICO
+    ]
+
+def adicionar_titulo_especialidade(doc, esp, paragrafo_titulo_modelo):
+    """Acrescenta ao corpo o título de uma especialidade e retorna o elemento w:p."""
+    # CLONA o parágrafo do título preservando toda a formatação
+    if paragrafo_titulo_modelo:
+        # Clona o elemento XML do título
+        titulo_element = copy.deepcopy(paragrafo_titulo_modelo._element)
+        doc._element.body.append(titulo_element)
+        
+        # Acessa o novo parágrafo adicionado (sem varrer doc.paragraphs)
+        novo_titulo = Paragraph(titulo_element, doc._body)
+        
+        # Substitui a variável pelo nome da especialidade
+        for run in novo_titulo.runs:
+            if '{NOME_ESPECIALIDADE}' in run.text:
+                run.text = run.text.replace('{NOME_ESPECIALIDADE}', esp)
+    else:
+        # Fallback: se não encontrou o modelo, adiciona texto simples
+        titulo = doc.add_paragraph(esp)
+        titulo.style = 'Normal'
+        titulo_element = titulo._element
+    return titulo_element
+
+def gerar_linhas_especialidade(tabela, esp, atendimentos_esp, template, config):
+    """
+    Acrescenta à tabela uma linha por atendimento (numeradas a partir de 1),
+    gerando cada elemento w:tr logo depois de acrescentá-lo.
+    """
+    contador_sessao = 1  # Contador sequencial para cada especialidade
+    for item, termino in zip(atendimentos_esp, calcular_terminos(atendimentos_esp, config)):
+        try:
+            dados_linha = montar_linha_evolucao(contador_sessao, item, config, termino)
+        except ValueError as e:
+            logger.error(f"✗ Erro ao processar {esp} (Tabela {item.tabela_origem}, Linha {item.linha_origem}): {e}")
+            continue
+        
+        # Linha de dados com a formatação da linha 1 da tabela modelo
+        yield carimbar_linha(tabela, template, dados_linha)
+        contador_sessao += 1  # Incrementa contador
+
+def adicionar_especialidade(doc, esp, atendimentos_esp, template, paragrafo_titulo_modelo, config):
+    """
+    Acrescenta ao fim do corpo o título e a tabela de uma especialidade.
+
+    Returns:
+        tuple: ([elemento do título, elemento da tabela], linhas geradas)
+    """
+    titulo_element = adicionar_titulo_especialidade(doc, esp, paragrafo_titulo_modelo)
+    
+    # CLONA A TABELA COMPLETA (preserva tudo: larguras, alturas, bordas, cores)
+    nova_tabela = clonar_tabela_completa(template["tabela_modelo"], doc)
+    
+    # Remove todas as linhas de dados (mantém só o cabeçalho)
+    # A tabela clonada vem com todas as linhas do template
+    for tr in nova_tabela._element.tr_lst[1:]:
+        nova_tabela._element.remove(tr)
+
+    # Preenche a tabela com dados da especialidade
+    linhas_geradas = sum(1 for _ in gerar_linhas_especialidade(nova_tabela, esp, atendimentos_esp, template, config))
+
+    return [titulo_element, nova_tabela._element], linhas_geradas
+
+# Marcador do conteúdo ao separar as tags de abertura e fechamento de um elemento
+_MARCADOR_CONTEUDO = "\ue001"
+_MARCADOR_CONTEUDO_BYTES = _MARCADOR_CONTEUDO.encode("utf-8")
+_ATRIBUTO_XML = re.compile(rb'\s+([^\s=/>]+)="([^"]*)"')
+_INICIO_TAG_XML = re.compile(rb'<[^\s/>]+')
+
+def _serializar_no_escopo(elemento, nsmap):
+    """
+    XML (UTF-8) de um elemento a ser gravado dentro da raiz do documento.
+
+    O tostring de um elemento isolado declara de novo, na primeira tag, os
+    namespaces que ele usa; as declarações que a raiz já faz (nsmap) são
+    omitidas, como na serialização do DOM.
+    """
+    xml = etree.tostring(elemento, encoding="UTF-8")
+    posicao = _INICIO_TAG_XML.match(xml).end()
+    partes = [xml[:posicao]]
+    while True:
+        atributo = _ATRIBUTO_XML.match(xml, posicao)
+        if atributo is None:
+            break
+        posicao = atributo.end()
+        nome = atributo.group(1)
+        if nome == b"xmlns" or nome.startswith(b"xmlns:"):
+            prefixo = nome[len(b"xmlns:"):].decode() or None
+            if nsmap.get(prefixo) == atributo.group(2).decode():
+                continue
+        partes.append(atributo.group(0))
+    partes.append(xml[posicao:])
+    return b"".join(partes)
+
+def _tags_elemento(elemento, nsmap, filhos=()):
+    """
+    (abertura, fechamento) de um elemento, para gravar o conteúdo entre as duas
+    aos poucos. filhos (cópias) são gravados na abertura, antes do conteúdo.
+    """
+    casca = etree.Element(elemento.tag, dict(elemento.attrib), nsmap=elemento.nsmap)
+    for filho in filhos:
+        casca.append(copy.deepcopy(filho))
+    if len(casca):
+        casca[-1].tail = (casca[-1].tail or "") + _MARCADOR_CONTEUDO
+    else:
+        casca.text = (elemento.text or "") + _MARCADOR_CONTEUDO
+    abertura, fechamento = _serializar_no_escopo(casca, nsmap).split(_MARCADOR_CONTEUDO_BYTES)
+    return abertura, fechamento
+
+def escrever_corpo_streaming(arquivo, doc, grupos, template, paragrafo_titulo_modelo, config):
+    """
+    Grava o word/document.xml de um documento de evolução aos poucos, sem
+    montar as tabelas no DOM: o corpo do template (já com as variáveis
+    substituídas) e, para cada especialidade, o título, a tabela modelo sem as
+    linhas de dados e as linhas, gravadas uma a uma logo depois de carimbadas.
+    A memória usada não depende do número de atendimentos.
+
+    Os elementos são gravados no escopo de namespaces da raiz (sem repetir as
+    declarações), então o XML fica igual ao da serialização do DOM.
+
+    Returns:
+        int: linhas geradas
+    """
+    raiz = doc.element
+    corpo = raiz.body
+    nsmap = raiz.nsmap
+    tabela_modelo = template["tabela_modelo"]._element
+    cabecalho_tabela = tabela_modelo.tr_lst[0]
+
+    # Tabela de rascunho (só o cabeçalho) onde cada linha é carimbada antes de ser gravada
+    tbl_rascunho = copy.deepcopy(tabela_modelo)
+    for tr in tbl_rascunho.tr_lst[1:]:
+        tbl_rascunho.remove(tr)
+    tabela_rascunho = Table(tbl_rascunho, doc._body)
+    abertura_tabela, fechamento_tabela = _tags_elemento(
+        tabela_modelo, nsmap,
+        [elemento for elemento in tabela_modelo if elemento.tag != _W_TR or elemento is cabecalho_tabela]
+    )
+
+    # Raiz: declarações de namespace completas; os filhos antes do corpo vão na abertura
+    indice_corpo = list(raiz).index(corpo)
+    abertura_raiz, fechamento_raiz = _tags_elemento(raiz, {}, raiz[:indice_corpo])
+    abertura_corpo, fechamento_corpo = _tags_elemento(corpo, nsmap, list(corpo))
+
+    linhas_geradas = 0
+    arquivo.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+    arquivo.write(abertura_raiz)
+    arquivo.write(abertura_corpo)
+    for esp, atendimentos_esp in grupos.items():
+        logger.info(f"  • {esp}: {len(atendimentos_esp)} atendimento(s)")
+        titulo = adicionar_titulo_especialidade(doc, esp, paragrafo_titulo_modelo)
+        arquivo.write(_serializar_no_escopo(titulo, nsmap))
+        corpo.remove(titulo)
+
+        arquivo.write(abertura_tabela)
+        # A linha anterior fica no rascunho (mesclagem vertical usa a linha de cima)
+        anterior = None
+        for tr in gerar_linhas_especialidade(tabela_rascunho, esp, atendimentos_esp, template, config):
+            arquivo.write(_serializar_no_escopo(tr, nsmap))
+            if anterior is not None:
+                tbl_rascunho.remove(anterior)
+            anterior = tr
+            linhas_geradas += 1
+        if anterior is not None:
+            tbl_rascunho.remove(anterior)
+        arquivo.write(fechamento_tabela)
+    arquivo.write(fechamento_corpo)
+    for filho in raiz[indice_corpo + 1:]:
+        arquivo.write(_serializar_no_escopo(filho, nsmap))
+    arquivo.write(fechamento_raiz)
+    return linhas_geradas
+
+def gerar_word_evolucao(dados, caminho_destino, config, dados_cabecalho=None, grupos=None,
+                        caminho_template=None):
+    """
+    Gera o documento Word de evolução usando template com substituição de variáveis.
+    
+    caminho_destino pode ser um caminho ou um objeto file-like (ex.: BytesIO),
+    para gerar o documento inteiramente em memória. grupos pode receber o resultado
+    de agrupar_por_especialidade(dados), se o chamador já o tiver calculado.
+    caminho_template escolhe outro template do registro (padrão: config["caminho_template"]).
+    """
+    if not dados:
+        logger.error("✗ Nenhum dado válido para gerar o documento de evolução.")
+        return False
+
+    inicio_geracao = time.perf_counter()
+    logger.info(f"→ Gerando documento de evolução: '{descrever_arquivo(caminho_destino)}'")
+    
+    # Obtém o template já carregado em memória (relido do disco só se foi alterado)
+    template = obter_template(caminho_template or config["caminho_template"])
+    if template is None:
+        return False
+    
+    # Cópia em memória do template preparado (preserva imagens, relationships, formatação)
+    doc = copiar_documento_template(template)
+    
+    logger.info("✓ Template copiado do cache (cabeçalho preservado com logo e CONFIDENCIAL)")
+    
+    # Clona o título modelo para esta requisição, para que as variáveis
+    # do cabeçalho também sejam substituídas nele
+    paragrafo_titulo_modelo = clonar_titulo_modelo(template, doc, dados_cabecalho)
+    
+    # Substitui variáveis do cabeçalho (SEM remover/recriar nada)
+    if dados_cabecalho:
+        substituir_variaveis_cabecalho(doc, dados_cabecalho)
+    
+    # Agrupa por especialidade (uma única passada sobre os dados)
+    if grupos is None:
+        grupos = agrupar_por_especialidade(dados)
+    especialidades = list(grupos)
+    logger.info(f"→ Processando {len(especialidades)} especialidade(s): {', '.join(especialidades)}")
+
+    total_linhas_geradas = 0
+    duracao = config["duracao_atendimento_minutos"]
+
+    # Documentos muito grandes são gravados em streaming (tabelas fora do DOM)
+    limite_streaming = config.get("escrita_streaming_a_partir_de_linhas", 0)
+    if limite_streaming and sum(map(len, grupos.values())) >= limite_streaming:
+        logger.info(f"→ Escrita em streaming (a partir de {limite_streaming} atendimentos)")
+        def escrever_corpo(arquivo):
+            nonlocal total_linhas_geradas
+            total_linhas_geradas = escrever_corpo_streaming(
+                arquivo, doc, grupos, template, paragrafo_titulo_modelo, config
+            )
+            # Aqui as linhas são geradas durante a gravação do corpo
+            registrar_duracao_etapa("gerar_documento", time.perf_counter() - inicio_geracao)
+    else:
+        escrever_corpo = None
+        for esp, atendimentos_esp in grupos.items():
+            logger.info(f"  • {esp}: {len(atendimentos_esp)} atendimento(s)")
+            _, linhas_geradas = adicionar_especialidade(
+                doc, esp, atendimentos_esp, template, paragrafo_titulo_modelo, config
+            )
+            total_linhas_geradas += linhas_geradas
+
+        registrar_duracao_etapa("gerar_documento", time.perf_counter() - inicio_geracao)
+
+    try:
+        salvar_documento(doc, caminho_destino, config, escrever_corpo)
+        
+        incrementar("folha_documentos_gerados_total")
+        incrementar("folha_especialidades_total", len(especialidades))
+        registrar_tamanho_arquivo("saida", _tamanho_destino(caminho_destino))
+        
+        logger.info(f"\n{'='*60}")
+        logger.info(f"✓ SUCESSO! Documento gerado:")
+        logger.info(f"  • Arquivo: '{descrever_arquivo(caminho_destino)}'")
+        logger.info(f"  • Total de linhas: {total_linhas_geradas}")
+        logger.info(f"  • Especialidades: {len(especialidades)}")
+        logger.info(f"  • Duração padrão: {duracao} minutos")
         logger.info(f"  • Formatação: 100% preservada do template")
         logger.info(f"{'='*60}\n")
         return True
     except Exception as e:
         logger.error(f"✗ ERRO ao salvar documento: {e}")
-        # Limpa o arquivo temporário mesmo em caso de erro
+        return False
+
+def criar_relatorio_arquivo(arquivo_origem, arquivo_destino):
+    """Relatório (inicialmente sem sucesso) do processamento de um arquivo."""
+    return {
+        "arquivo": os.path.basename(arquivo_origem),
+        "saida": os.path.basename(arquivo_destino),
+        "sucesso": False,
+        "mensagem": "",
+        "registros": 0,
+        "especialidades": 0,
+        "atendimentos_por_especialidade": {},
+        "erros": [],
+        "avisos": []
+    }
+
+def gerar_word_evolucao_bytes(dados, config, dados_cabecalho=None):
+    """Gera o documento de evolução em memória e retorna seus bytes (ou None em caso de erro)."""
+    buffer = io.BytesIO()
+    if not gerar_word_evolucao(dados, buffer, config, dados_cabecalho):
+        return None
+    return buffer.getvalue()
+
+def _secoes_evolucao(doc, template, paragrafo_titulo_modelo):
+    """
+    Localiza as especialidades de um documento de evolução gerado com o template:
+    tabelas com o mesmo cabeçalho da tabela modelo, precedidas do título.
+
+    Returns:
+        list: [{"nome", "titulo", "tabela"}] na ordem do documento
+
+    Lança ValueError se o título de alguma tabela não puder ser interpretado.
+    """
+    cabecalho_modelo = [texto.strip() for texto in _textos_celulas_xml(template["tabela_modelo"]._element.tr_lst[0])]
+
+    # Texto do título ao redor de {NOME_ESPECIALIDADE} (o nome é o que sobra)
+    texto_modelo = paragrafo_titulo_modelo.text if paragrafo_titulo_modelo is not None else "{NOME_ESPECIALIDADE}"
+    prefixo, _, sufixo = texto_modelo.partition('{NOME_ESPECIALIDADE}')
+    prefixo, sufixo = prefixo.strip(), sufixo.strip()
+
+    secoes = []
+    anterior = None
+    for elemento in doc.element.body.iterchildren():
+        if elemento.tag == _W_TBL:
+            linhas = elemento.findall(_W_TR)
+            if linhas and [texto.strip() for texto in _textos_celulas_xml(linhas[0])] == cabecalho_modelo:
+                texto_titulo = _texto_paragrafo_xml(anterior).strip() if anterior is not None and anterior.tag == _W_P else ""
+                if (not texto_titulo or not texto_titulo.startswith(prefixo) or not texto_titulo.endswith(sufixo)
+                        or len(texto_titulo) <= len(prefixo) + len(sufixo)):
+                    raise ValueError(f"Título da tabela {len(secoes) + 1} não reconhecido: '{texto_titulo}'")
+                nome = texto_titulo[len(prefixo):len(texto_titulo) - len(sufixo)].strip()
+                if any(secao["nome"] == nome for secao in secoes):
+                    raise ValueError(f"Especialidade repetida no documento: '{nome}'")
+                secoes.append({"nome": nome, "titulo": anterior, "tabela": elemento})
+        anterior = elemento
+    return secoes
+
+def _atualizar_tabela_especialidade(doc, tabela, atendimentos, template, config):
+    """
+    Atualiza as linhas de uma tabela de especialidade existente.
+
+    Sessões que continuam na folha mantêm a linha (com a evolução já digitada);
+    as novas ganham linhas clonadas do modelo; as removidas saem, exceto as que
+    já têm evolução/técnico preenchidos, que ficam (na posição original) para revisão.
+
+    Returns:
+        dict: {"adicionadas", "removidas", "mantidas_com_evolucao"} ou None se nada mudou
+    """
+    linhas_antigas = []
+    por_sessao = {}
+    termino_atual = {}
+    for tr in tabela.tr_lst[1:]:
+        textos = _textos_celulas_xml(tr)
+        sessao = (textos[_COLUNA_DATA].strip(), textos[_COLUNA_INICIO].strip()) if len(textos) > _COLUNA_INICIO else None
+        termino_atual[tr] = textos[_COLUNA_TERMINO].strip() if len(textos) > _COLUNA_TERMINO else None
+        preenchida = any(texto.strip() for texto in textos[_PRIMEIRA_COLUNA_MANUAL:])
+        linhas_antigas.append((tr, sessao, preenchida))
+        por_sessao.setdefault(sessao, []).append(tr)
+
+    # Cada atendimento reaproveita a primeira linha ainda livre da mesma sessão (data, início)
+    novas = []
+    reaproveitadas = set()
+    for item, termino in zip(atendimentos, calcular_terminos(atendimentos, config)):
+        candidatas = por_sessao.get((item.data, item.inicio))
+        tr = candidatas.pop(0) if candidatas else None
+        if tr is not None:
+            reaproveitadas.add(tr)
+        novas.append((item, termino, tr))
+
+    if len(reaproveitadas) == len(linhas_antigas) == len(novas) and \
+            all(tr is antiga and termino in (None, termino_atual[tr])
+                for (_, termino, tr), (antiga, _, _) in zip(novas, linhas_antigas)):
+        return None
+
+    # Linhas removidas com conteúdo digitado ficam logo após a linha mantida que as precedia
+    mantidas_apos = {}
+    ultima_mantida = None
+    removidas = 0
+    for tr, _, preenchida in linhas_antigas:
+        if tr in reaproveitadas:
+            ultima_mantida = tr
+        elif preenchida:
+            mantidas_apos.setdefault(ultima_mantida, []).append(tr)
+        else:
+            removidas += 1
+
+    for tr, _, _ in linhas_antigas:
+        tabela.remove(tr)
+
+    tabela_docx = Table(tabela, doc._body)
+    ordem = list(mantidas_apos.get(None, []))
+    adicionadas = 0
+    for item, termino, tr in novas:
+        if tr is None:
+            if termino is None:
+                logger.error(f"✗ Erro ao processar {item.procedimento} (Tabela {item.tabela_origem}, Linha {item.linha_origem}): horário inválido '{item.inicio}'")
+                continue
+            dados_linha = montar_linha_evolucao(0, item, config, termino)
+            tr = carimbar_linha(tabela_docx, template, dados_linha)
+            adicionadas += 1
+        ordem.append(tr)
+        ordem.extend(mantidas_apos.get(tr, []))
+
+    # Renumera (Nº) e, nas sessões mantidas, atualiza o TÉRMINO (a duração pode ter mudado)
+    termino_por_linha = {tr: termino for _, termino, tr in novas if tr in reaproveitadas}
+    for numero, tr in enumerate(ordem, start=1):
+        tabela.append(tr)
+        celulas = _Row(tr, tabela_docx).cells
+        valores = {_COLUNA_NUMERO: str(numero)}
+        if termino_por_linha.get(tr) is not None:
+            valores[_COLUNA_TERMINO] = termino_por_linha[tr]
+        for coluna, valor in valores.items():
+            if coluna < len(celulas) and celulas[coluna].text != valor:
+                preencher_celula(celulas[coluna], valor)
+
+    return {
+        "adicionadas": adicionadas,
+        "removidas": removidas,
+        "mantidas_com_evolucao": sum(map(len, mantidas_apos.values()))
+    }
+
+def atualizar_word_evolucao(documento_anterior, dados, caminho_destino, config, dados_cabecalho=None,
+                            grupos=None, caminho_template=None):
+    """
+    Atualiza um documento de evolução gerado anteriormente com uma nova versão
+    da folha de frequência, alterando apenas as tabelas das especialidades cujas
+    sessões mudaram. O texto já digitado em EVOLUÇÃO DIÁRIA/TÉCNICO é preservado.
+
+    documento_anterior e caminho_destino podem ser caminhos ou objetos file-like
+    (o documento anterior é lido por inteiro antes da gravação, então podem ser o
+    mesmo arquivo). Especialidades novas são inseridas em ordem alfabética;
+    especialidades e sessões que saíram da folha são removidas, exceto se já
+    tiverem evolução digitada (nesse caso ficam e são informadas no relatório).
+
+    Returns:
+        dict: relatório {"alteradas", "novas", "removidas", "mantidas", "inalteradas"}
+        ou None em caso de erro
+    """
+    if not dados:
+        logger.error("✗ Nenhum dado válido para atualizar o documento de evolução.")
+        return None
+
+    inicio_atualizacao = time.perf_counter()
+    logger.info(f"→ Atualizando documento de evolução: '{descrever_arquivo(documento_anterior)}'")
+
+    template = obter_template(caminho_template or config["caminho_template"])
+    if template is None:
+        return None
+
+    try:
+        doc = Document(documento_anterior)
+        paragrafo_titulo_modelo = clonar_titulo_modelo(template, doc, dados_cabecalho)
+        secoes = _secoes_evolucao(doc, template, paragrafo_titulo_modelo)
+    except ValueError as e:
+        logger.error(f"✗ Documento anterior não reconhecido: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"✗ ERRO ao abrir o documento anterior: {e}")
+        return None
+    if not secoes:
+        logger.error("✗ Documento anterior não contém tabelas de especialidade deste template.")
+        return None
+
+    if grupos is None:
+        grupos = agrupar_por_especialidade(dados)
+
+    relatorio = {"alteradas": {}, "novas": [], "removidas": [], "mantidas": [], "inalteradas": []}
+    existentes = {secao["nome"]: secao for secao in secoes}
+    ultimo_elemento = secoes[-1]["tabela"]
+
+    for esp, atendimentos_esp in grupos.items():
+        secao = existentes.get(esp)
+        if secao is not None:
+            alteracoes = _atualizar_tabela_especialidade(doc, secao["tabela"], atendimentos_esp, template, config)
+            if alteracoes is None:
+                relatorio["inalteradas"].append(esp)
+            else:
+                relatorio["alteradas"][esp] = alteracoes
+                logger.info(f"  • {esp}: +{alteracoes['adicionadas']} / -{alteracoes['removidas']} sessão(ões)")
+            continue
+
+        # Especialidade nova: título + tabela antes da próxima em ordem alfabética
+        # (ou após a última, como na geração completa)
+        elementos, linhas = adicionar_especialidade(doc, esp, atendimentos_esp, template, paragrafo_titulo_modelo, config)
+        seguinte = next((s for s in secoes if s["nome"] > esp), None)
+        if seguinte is not None:
+            ancora = seguinte["titulo"] if seguinte["titulo"] is not None else seguinte["tabela"]
+            for elemento in elementos:
+                ancora.addprevious(elemento)
+        else:
+            for elemento in elementos:
+                ultimo_elemento.addnext(elemento)
+                ultimo_elemento = elemento
+        relatorio["novas"].append(esp)
+        logger.info(f"  • {esp}: nova especialidade ({linhas} sessão(ões))")
+
+    # Especialidades que saíram da folha
+    for esp, secao in existentes.items():
+        if esp in grupos:
+            continue
+        if any(any(texto.strip() for texto in _textos_celulas_xml(tr)[_PRIMEIRA_COLUNA_MANUAL:])
+               for tr in secao["tabela"].tr_lst[1:]):
+            relatorio["mantidas"].append(esp)
+            logger.warning(f"⚠ {esp}: não está mais na folha, mas tem evolução preenchida - mantida para revisão")
+            continue
+        for elemento in (secao["titulo"], secao["tabela"]):
+            if elemento is not None:
+                elemento.getparent().remove(elemento)
+        relatorio["removidas"].append(esp)
+        logger.info(f"  • {esp}: removida (não está mais na folha)")
+
+    for esp, alteracoes in relatorio["alteradas"].items():
+        if alteracoes["mantidas_com_evolucao"]:
+            logger.warning(f"⚠ {esp}: {alteracoes['mantidas_com_evolucao']} sessão(ões) fora da folha mantida(s) por ter(em) evolução preenchida")
+
+    registrar_duracao_etapa("atualizar_documento", time.perf_counter() - inicio_atualizacao)
+
+    try:
+        salvar_documento(doc, caminho_destino, config)
+        incrementar("folha_documentos_atualizados_total")
+        registrar_tamanho_arquivo("saida", _tamanho_destino(caminho_destino))
+    except Exception as e:
+        logger.error(f"✗ ERRO ao salvar documento: {e}")
+        return None
+
+    logger.info(f"\n{'='*60}")
+    logger.info(f"✓ SUCESSO! Documento atualizado:")
+    logger.info(f"  • Arquivo: '{descrever_arquivo(caminho_destino)}'")
+    logger.info(f"  • Especialidades alteradas: {len(relatorio['alteradas'])} | novas: {len(relatorio['novas'])} | "
+                f"removidas: {len(relatorio['removidas'])} | inalteradas: {len(relatorio['inalteradas'])}")
+    logger.info(f"{'='*60}\n")
+    return relatorio
+
+def extrair_dados_entrada(origem, config, notificar_etapa=None):
+    """
+    Abre a folha de frequência uma única vez e extrai o cabeçalho (se
+    config["extrair_cabecalho_de_entrada"]) e as tabelas.
+    
+    notificar_etapa, se informado, é chamado com "validando",
+    "extraindo_cabecalho" e "extraindo_tabelas" ao iniciar cada etapa.
+    
+    Returns:
+        tuple: (doc, dados_cabecalho, dados, erros, avisos); doc é None (e as
+        listas ficam vazias) se o arquivo for inválido
+    """
+    notificar_etapa = notificar_etapa or (lambda etapa: None)
+    
+    notificar_etapa("validando")
+    doc = abrir_documento_entrada(origem)
+    if doc is None:
+        return None, None, [], [], []
+    
+    dados_cabecalho = None
+    if config.get("extrair_cabecalho_de_entrada", False):
+        notificar_etapa("extraindo_cabecalho")
+        dados_cabecalho = extrair_dados_cabecalho_documento(doc, config)
+    
+    notificar_etapa("extraindo_tabelas")
+    logger.info(f"→ Iniciando extração de dados de '{descrever_arquivo(origem)}'")
+    dados, erros, avisos = identificar_e_extrair_tabelas_documento(doc, config)
+    return doc, dados_cabecalho, dados, erros, avisos
+
+def processar_arquivo(arquivo_origem, arquivo_destino, config):
+    """
+    Executa o pipeline completo para um arquivo (validação, cabeçalho, tabelas e geração).
+    
+    Não interrompe o processo em caso de erro: retorna um relatório com o resultado,
+    os erros de parsing e os avisos de data coletados na extração.
+    """
+    relatorio = criar_relatorio_arquivo(arquivo_origem, arquivo_destino)
+    
+    doc_origem, dados_cabecalho, dados, erros, avisos = extrair_dados_entrada(arquivo_origem, config)
+    if doc_origem is None:
+        relatorio["mensagem"] = "Arquivo inválido ou corrompido"
+        return relatorio
+    
+    relatorio["erros"] = erros
+    relatorio["avisos"] = avisos
+    
+    if not dados:
+        relatorio["mensagem"] = "Nenhum dado válido encontrado (verifique as colunas: " + ", ".join(config["colunas_esperadas"]) + ")"
+        return relatorio
+    
+    grupos = agrupar_por_especialidade(dados)
+    relatorio["registros"] = len(dados)
+    relatorio["especialidades"] = len(grupos)
+    relatorio["atendimentos_por_especialidade"] = contar_por_especialidade(grupos)
+    
+    # Geração do documento
+    if not gerar_word_evolucao(dados, arquivo_destino, config, dados_cabecalho, grupos):
+        relatorio["mensagem"] = "Erro ao gerar o documento de evolução"
+        return relatorio
+    
+    relatorio["sucesso"] = True
+    relatorio["mensagem"] = "OK"
+    return relatorio
+
+def _inicializar_worker_lote(caminho_template):
+    """Pré-carrega o template em cada processo do pool (uma vez por worker)."""
+    obter_template(caminho_template)
+
+def _processar_arquivo_lote(arquivo_origem, arquivo_destino, config):
+    """Executa processar_arquivo() em um worker, convertendo exceções em relatório de erro."""
+    inicio = time.perf_counter()
+    try:
+        relatorio = processar_arquivo(arquivo_origem, arquivo_destino, config)
+    except Exception as e:
+        logger.error(f"✗ ERRO inesperado ao processar '{arquivo_origem}': {e}")
+        relatorio = criar_relatorio_arquivo(arquivo_origem, arquivo_destino)
+        relatorio["mensagem"] = f"Erro inesperado: {e}"
+    relatorio["duracao_segundos"] = round(time.perf_counter() - inicio, 3)
+    return relatorio
+
+def _processar_arquivo_worker(arquivo_origem, arquivo_destino, config):
+    """
+    _processar_arquivo_lote() em um processo do pool: as métricas do worker
+    (etapas, tamanhos, contadores) voltam no relatório, em "metricas", para
+    serem somadas às do processo principal por executar_tarefas_lote().
+    """
+    relatorio = _processar_arquivo_lote(arquivo_origem, arquivo_destino, config)
+    relatorio["metricas"] = extrair_metricas()
+    return relatorio
+
+def criar_pool_lote(workers, caminho_template):
+    """
+    Pool de processos do lote. Cada worker carrega o template ao iniciar e o
+    reaproveita para todos os arquivos que processar; a API mantém um único
+    pool durante toda a execução, a linha de comando cria um por lote.
+    """
+    # 'spawn' evita herdar locks de threads do processo pai (ex.: servidor da API)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_inicializar_worker_lote,
+        initargs=(caminho_template,)
+    )
+
+def nome_arquivo_evolucao(arquivo_origem):
+    """Nome padrão do arquivo de evolução gerado a partir de uma folha de frequência."""
+    return f"Evolucao_{os.path.splitext(os.path.basename(arquivo_origem))[0]}.docx"
+
+def listar_arquivos_lote(origem, diretorio_extracao, config=None, uso=None):
+    """
+    Lista os arquivos .docx de um lote.
+    
+    A origem pode ser um diretório ou um arquivo .zip (caminho ou objeto
+    file-like); no caso do zip, os .docx são extraídos (sem a estrutura de
+    pastas) para diretorio_extracao.
+    
+    Os zips respeitam config["lote_maximo_arquivos"] e
+    config["lote_maximo_descompactado_mb"]: os tamanhos declarados são somados
+    antes de extrair e a cópia é interrompida se o conteúdo real passar do
+    limite. uso ({"arquivos", "bytes"}) acumula o que já foi contado em outros
+    arquivos do mesmo lote. Lança ValueError se o lote exceder os limites.
+    """
+    if isinstance(origem, (str, os.PathLike)) and os.path.isdir(origem):
+        return sorted(
+            os.path.join(origem, nome) for nome in os.listdir(origem)
+            if nome.lower().endswith('.docx') and not nome.startswith('~$')
+        )
+    
+    if zipfile.is_zipfile(origem):
+        config = config or CONFIG_PADRAO
+        uso = uso if uso is not None else {"arquivos": 0, "bytes": 0}
+        maximo_arquivos = config.get("lote_maximo_arquivos", CONFIG_PADRAO["lote_maximo_arquivos"])
+        maximo_bytes = config.get("lote_maximo_descompactado_mb", CONFIG_PADRAO["lote_maximo_descompactado_mb"]) * 1024 * 1024
+        
+        os.makedirs(diretorio_extracao, exist_ok=True)
+        caminhos = []
+        with zipfile.ZipFile(origem) as zf:
+            membros = [
+                info for info in zf.infolist()
+                if not info.is_dir() and os.path.basename(info.filename).lower().endswith('.docx')
+                and not os.path.basename(info.filename).startswith('~$')
+            ]
+            if uso["arquivos"] + len(membros) > maximo_arquivos:
+                raise ValueError(f"Lote excede o limite de {maximo_arquivos} arquivos .docx")
+            if uso["bytes"] + sum(info.file_size for info in membros) > maximo_bytes:
+                raise ValueError(f"Lote excede o limite de {maximo_bytes // (1024 * 1024)} MB descompactados")
+            
+            for info in membros:
+                nome = os.path.basename(info.filename)
+                # Evita sobrescrever arquivos com o mesmo nome em pastas diferentes do zip
+                destino = os.path.join(diretorio_extracao, nome)
+                contador = 1
+                while os.path.exists(destino):
+                    base, ext = os.path.splitext(nome)
+                    destino = os.path.join(diretorio_extracao, f"{base}_{contador}{ext}")
+                    contador += 1
+                # O tamanho declarado no zip pode mentir: conta o que é realmente extraído
+                with zf.open(info) as origem_zip, open(destino, 'wb') as destino_arq:
+                    for bloco in iter(lambda: origem_zip.read(1024 * 1024), b''):
+                        uso["bytes"] += len(bloco)
+                        if uso["bytes"] > maximo_bytes:
+                            break
+                        destino_arq.write(bloco)
+                if uso["bytes"] > maximo_bytes:
+                    os.remove(destino)
+                    raise ValueError(f"Lote excede o limite de {maximo_bytes // (1024 * 1024)} MB descompactados")
+                uso["arquivos"] += 1
+                caminhos.append(destino)
+        return sorted(caminhos)
+    
+    logger.error(f"✗ ERRO: '{descrever_arquivo(origem)}' não é um diretório nem um arquivo .zip válido")
+    return []
+
+def definir_arquivos_saida(arquivos_origem, diretorio_saida):
+    """Lista de (origem, destino) com o arquivo de saída de cada entrada (sem sobrescrever nomes repetidos)."""
+    tarefas = []
+    nomes_saida = set()
+    for origem in arquivos_origem:
+        nome = nome_arquivo_evolucao(origem)
+        base, ext = os.path.splitext(nome)
+        contador = 1
+        while nome in nomes_saida:
+            nome = f"{base}_{contador}{ext}"
+            contador += 1
+        nomes_saida.add(nome)
+        tarefas.append((origem, os.path.join(diretorio_saida, nome)))
+    return tarefas
+
+def processar_lote(arquivos_origem, diretorio_saida, config, workers=None, executor=None):
+    """
+    Processa vários arquivos em paralelo (um processo por núcleo, por padrão).
+    
+    Cada worker carrega o template uma única vez e o reaproveita para todos os
+    arquivos que processar. Retorna a lista de relatórios na ordem de entrada.
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    return executar_tarefas_lote(definir_arquivos_saida(arquivos_origem, diretorio_saida), config, workers, executor)
+
+def executar_tarefas_lote(tarefas, config, workers=None, executor=None):
+    """
+    Processa as tarefas (origem, destino) em um pool de processos; relatórios na ordem das tarefas.
+    
+    executor é um pool já criado por criar_pool_lote() (o da API); sem ele, um
+    pool com `workers` processos é criado só para estas tarefas.
+    """
+    if not tarefas:
+        return []
+    
+    if executor is not None:
+        logger.info(f"→ Processando lote: {len(tarefas)} arquivo(s) no pool de processos")
+        return _executar_no_pool_lote(executor, tarefas, config)
+    
+    workers = min(workers or os.cpu_count() or 1, len(tarefas)) or 1
+    logger.info(f"→ Processando lote: {len(tarefas)} arquivo(s) com {workers} worker(s)")
+    
+    if workers == 1:
+        return [_processar_arquivo_lote(origem, destino, config) for origem, destino in tarefas]
+    
+    with criar_pool_lote(workers, config["caminho_template"]) as executor:
+        return _executar_no_pool_lote(executor, tarefas, config)
+
+def _executar_no_pool_lote(executor, tarefas, config):
+    futuros = [
+        executor.submit(_processar_arquivo_worker, origem, destino, config)
+        for origem, destino in tarefas
+    ]
+    relatorios = [futuro.result() for futuro in futuros]
+    for relatorio in relatorios:
+        mesclar_metricas(relatorio.pop("metricas"))
+    return relatorios
+
+def registrar_resumo_lote(relatorios, duracao_total=None):
+    """Loga o resumo de um processamento em lote: tabela com tempo, registros, erros e avisos por arquivo."""
+    sucessos = sum(1 for r in relatorios if r["sucesso"])
+    pulados = sum(1 for r in relatorios if r.get("pulado"))
+    largura = min(max([len("Arquivo")] + [len(r["arquivo"]) for r in relatorios]), 40)
+    
+    resumo = f"RESUMO DO LOTE: {sucessos}/{len(relatorios)} arquivo(s) gerado(s)"
+    if pulados:
+        resumo += f" ({pulados} inalterado(s), pulado(s))"
+    if duracao_total is not None:
+        resumo += f" em {duracao_total:.2f}s"
+    logger.info(f"\n{'='*60}")
+    logger.info(resumo)
+    logger.info(f"  {'Arquivo':<{largura}}  {'Status':<9} {'Tempo':>8} {'Registros':>9} {'Erros':>6} {'Avisos':>6}")
+    for r in relatorios:
+        if r.get("pulado"):
+            status, tempo = "• pulado", "-"
+        else:
+            status = "✓ gerado" if r["sucesso"] else "✗ erro"
+            tempo = f"{r['duracao_segundos']:.2f}s" if "duracao_segundos" in r else "-"
+        nome = r["arquivo"] if len(r["arquivo"]) <= largura else r["arquivo"][:largura - 1] + "…"
+        logger.info(
+            f"  {nome:<{largura}}  {status:<9} {tempo:>8} {r['registros']:>9} {len(r['erros']):>6} {len(r['avisos']):>6}"
+        )
+    for r in relatorios:
+        if not r["sucesso"]:
+            logger.info(f"  ✗ {r['arquivo']}: {r['mensagem']}")
+    logger.info(f"{'='*60}\n")
+
+# Manifesto do modo --entrada/--saida: o que foi gerado a partir de cada entrada,
+# para pular os arquivos que não mudaram desde a última execução
+NOME_MANIFESTO = ".manifesto_evolucoes.json"
+
+def _ler_manifesto(diretorio_saida):
+    caminho = os.path.join(diretorio_saida, NOME_MANIFESTO)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f).get("arquivos", {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"⚠ Manifesto '{caminho}' ignorado ({e}): todos os arquivos serão processados")
+        return {}
+
+def _gravar_manifesto(diretorio_saida, arquivos):
+    caminho = os.path.join(diretorio_saida, NOME_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({"arquivos": arquivos}, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def executar_modo_diretorio(diretorio_entrada, diretorio_saida, workers=None, forcar=False):
+    """
+    Modo de linha de comando --entrada/--saida: processa todos os .docx da pasta
+    em um pool de processos (o template é carregado uma vez por worker).
+
+    Arquivos que não mudaram (mesmo mtime/tamanho, mesma configuração e mesmo
+    template) desde a última geração, com a saída ainda presente, são pulados;
+    forcar=True processa todos.
+    """
+    inicio = time.perf_counter()
+    config = carregar_configuracao()
+    
+    if not os.path.isdir(diretorio_entrada):
+        logger.error(f"✗ ERRO: '{diretorio_entrada}' não é um diretório")
+        return False
+    arquivos = listar_arquivos_lote(diretorio_entrada, None)
+    if not arquivos:
+        logger.error(f"\n✗ Processo interrompido: nenhum arquivo .docx em '{diretorio_entrada}'.")
+        return False
+    
+    template = obter_template(config["caminho_template"])
+    if template is None:
+        return False
+    impressao_config = hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    os.makedirs(diretorio_saida, exist_ok=True)
+    manifesto = {} if forcar else _ler_manifesto(diretorio_saida)
+    
+    relatorios = {}
+    pendentes = []
+    versoes = {}
+    for origem, destino in definir_arquivos_saida(arquivos, diretorio_saida):
+        nome = os.path.basename(origem)
+        versoes[nome] = {
+            "assinatura": list(_assinatura_arquivo(origem)),
+            "config": impressao_config,
+            "template": template["hash"],
+            "saida": os.path.basename(destino)
+        }
+        anterior = manifesto.get(nome)
+        if (anterior is not None and os.path.exists(destino)
+                and all(anterior.get(chave) == valor for chave, valor in versoes[nome].items())):
+            relatorios[origem] = {**anterior["relatorio"], "pulado": True}
+        else:
+            pendentes.append((origem, destino))
+    
+    logger.info(f"→ {len(arquivos)} arquivo(s) em '{diretorio_entrada}': "
+                f"{len(pendentes)} a processar, {len(arquivos) - len(pendentes)} inalterado(s)")
+    for (origem, _), relatorio in zip(pendentes, executar_tarefas_lote(pendentes, config, workers)):
+        relatorios[origem] = relatorio
+    
+    # Só entradas geradas com sucesso ficam no manifesto (as demais são tentadas de novo)
+    _gravar_manifesto(diretorio_saida, {
+        os.path.basename(origem): {**versoes[os.path.basename(origem)], "relatorio": {
+            chave: valor for chave, valor in relatorio.items() if chave not in ("pulado", "duracao_segundos")
+        }}
+        for origem, relatorio in relatorios.items() if relatorio["sucesso"]
+    })
+    
+    relatorios = [relatorios[origem] for origem in arquivos]
+    caminho_relatorio = os.path.join(diretorio_saida, 'relatorio_lote.json')
+    with open(caminho_relatorio, 'w', encoding='utf-8') as f:
+        json.dump(relatorios, f, indent=4, ensure_ascii=False)
+    
+    registrar_resumo_lote(relatorios, time.perf_counter() - inicio)
+    logger.info(f"ℹ Relatório detalhado salvo em '{caminho_relatorio}'")
+    return all(r["sucesso"] for r in relatorios)
+
+def executar_modo_lote(origem, diretorio_saida, workers=None):
+    """Modo de linha de comando --lote: processa um diretório ou .zip de folhas de frequência."""
+    inicio = time.perf_counter()
+    config = carregar_configuracao()
+    
+    with tempfile.TemporaryDirectory() as diretorio_extracao:
         try:
-            os.unlink(temp_template_path)
-        except:
-            pass
+            arquivos = listar_arquivos_lote(origem, diretorio_extracao, config)
+        except ValueError as e:
+            logger.error(f"\n✗ Processo interrompido: {e}.")
+            return False
+        if not arquivos:
+            logger.error("\n✗ Processo interrompido: nenhum arquivo .docx encontrado no lote.")
+            return False
+        
+        relatorios = processar_lote(arquivos, diretorio_saida, config, workers)
+    
+    caminho_relatorio = os.path.join(diretorio_saida, 'relatorio_lote.json')
+    with open(caminho_relatorio, 'w', encoding='utf-8') as f:
+        json.dump(relatorios, f, indent=4, ensure_ascii=False)
+    
+    registrar_resumo_lote(relatorios, time.perf_counter() - inicio)
+    logger.info(f"ℹ Relatório detalhado salvo em '{caminho_relatorio}'")
+    return all(r["sucesso"] for r in relatorios)
+
+def executar_modo_atualizacao(arquivo_origem, evolucao_anterior, arquivo_destino=None):
+    """
+    Modo de linha de comando --atualizar: atualiza uma evolução já gerada (e
+    possivelmente preenchida) com a nova versão da folha de frequência.
+    Sem arquivo_destino, a própria evolução anterior é substituída.
+    """
+    config = carregar_configuracao()
+    arquivo_destino = arquivo_destino or evolucao_anterior
+    
+    doc_origem, dados_cabecalho, dados, erros, avisos = extrair_dados_entrada(arquivo_origem, config)
+    if doc_origem is None:
+        return False
+    if not dados:
+        logger.error("✗ Nenhum dado válido extraído.")
         return False
+    
+    # Grava em um temporário na mesma pasta e só então substitui o destino:
+    # uma falha no meio da gravação não corrompe a evolução já preenchida
+    diretorio_destino = os.path.dirname(os.path.abspath(arquivo_destino))
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir=diretorio_destino) as tmp:
+        temporario = tmp.name
+    try:
+        relatorio = atualizar_word_evolucao(evolucao_anterior, dados, temporario, config, dados_cabecalho)
+        if relatorio is None:
+            return False
+        os.replace(temporario, arquivo_destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return True
 
 def gerar_config_exemplo():
     """Gera um arquivo de configuração de exemplo."""
@@ -695,6 +2475,26 @@ def criar_diretorios_padrao():
             os.makedirs(diretorio)
             logger.info(f"✓ Diretório '{diretorio}/' criado")
 
+def criar_parser_argumentos():
+    parser = argparse.ArgumentParser(
+        description="Gerador de Folha de Evolução Transdisciplinar",
+        epilog="Sem argumentos, processa o arquivo padrão de entrada/."
+    )
+    parser.add_argument("origem", nargs="?", help="Folha de frequência (.docx)")
+    parser.add_argument("destino", nargs="?", help="Evolução a gerar (.docx)")
+    parser.add_argument("--entrada", metavar="PASTA",
+                        help="Processa todos os .docx da pasta (pula os que não mudaram desde a última geração)")
+    parser.add_argument("--saida", metavar="PASTA", help="Pasta das evoluções geradas (padrão: saida)")
+    parser.add_argument("--workers", type=int, metavar="N", help="Processos em paralelo (padrão: nº de núcleos)")
+    parser.add_argument("--forcar", action="store_true", help="Com --entrada: processa também os arquivos inalterados")
+    parser.add_argument("--lote", nargs="+", metavar="ARQ", help="<pasta|arquivo.zip> [saida]: processa vários arquivos")
+    parser.add_argument("--atualizar", nargs="+", metavar="ARQ",
+                        help="<origem.docx> <evolucao.docx> [destino.docx]: atualiza uma evolução já preenchida")
+    parser.add_argument("--gerar-config", action="store_true", help="Cria um config.json de exemplo")
+    parser.add_argument("--perfil", "--profile", action="store_true",
+                        help="Executa sob cProfile e tracemalloc e grava o perfil (.pstats + resumo .json) em perfis/")
+    return parser
+
 def main():
     """Função principal com argumentos de linha de comando."""
     logger.info("="*60)
@@ -705,37 +2505,98 @@ def main():
     criar_diretorios_padrao()
     
     # Verifica argumentos de linha de comando
-    if len(sys.argv) == 3:
-        arquivo_origem = sys.argv[1]
-        arquivo_destino = sys.argv[2]
-        logger.info(f"→ Modo: Linha de comando")
-    elif len(sys.argv) == 2 and sys.argv[1] == '--gerar-config':
+    parser = criar_parser_argumentos()
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers deve ser maior ou igual a 1")
+    # Os modos (--entrada, --lote...) têm precedência sobre <origem> <destino>:
+    # misturar as formas é erro, em vez de cair silenciosamente em um dos modos
+    modos = [
+        opcao for opcao, valor in (
+            ("--entrada", args.entrada), ("--lote", args.lote),
+            ("--atualizar", args.atualizar), ("--gerar-config", args.gerar_config)
+        ) if valor
+    ]
+    if len(modos) > 1:
+        parser.error(f"use apenas um modo por vez (recebido: {', '.join(modos)})")
+    if modos and args.origem:
+        parser.error(f"{modos[0]} não aceita <origem> <destino> posicionais")
+    if args.origem and not args.destino:
+        parser.error("informe também o <destino.docx>")
+
+    if not args.perfil:
+        executar_linha_de_comando(args)
+        return
+    
+    from perfil import DIRETORIO_PERFIS, executar_com_perfil, novo_id_perfil
+    if (args.entrada or args.lote) and args.workers != 1:
+        # O cProfile só mede o processo atual: o lote roda sem processos auxiliares
+        logger.info("ℹ Com --perfil, o lote é processado com 1 worker")
+        args.workers = 1
+    id_perfil = novo_id_perfil()
+    try:
+        executar_com_perfil(id_perfil, "linha de comando: " + " ".join(sys.argv[1:]), executar_linha_de_comando, args)
+    finally:
+        logger.info(f"ℹ Perfil gravado: {DIRETORIO_PERFIS}/{id_perfil}.pstats e {DIRETORIO_PERFIS}/{id_perfil}.json")
+
+def executar_linha_de_comando(args):
+    """Executa o modo escolhido nos argumentos (ver criar_parser_argumentos)."""
+    if args.gerar_config:
         gerar_config_exemplo()
         return
+    elif args.entrada:
+        diretorio_saida = args.saida or 'saida'
+        logger.info(f"→ Modo: Diretório ('{args.entrada}' → '{diretorio_saida}/')")
+        if not executar_modo_diretorio(args.entrada, diretorio_saida, args.workers, args.forcar):
+            logger.error("\n✗ Processamento concluído com erros.")
+            sys.exit(1)
+        logger.info("✓ Processamento concluído com sucesso!")
+        return
+    elif args.lote:
+        if len(args.lote) > 2:
+            logger.error("✗ Use: python main.py --lote <pasta|arquivo.zip> [saida]")
+            sys.exit(2)
+        diretorio_saida = args.lote[1] if len(args.lote) == 2 else (args.saida or 'saida')
+        logger.info(f"→ Modo: Lote ('{args.lote[0]}' → '{diretorio_saida}/')")
+        if not executar_modo_lote(args.lote[0], diretorio_saida, args.workers):
+            logger.error("\n✗ Lote concluído com erros.")
+            sys.exit(1)
+        logger.info("✓ Lote concluído com sucesso!")
+        return
+    elif args.atualizar:
+        if len(args.atualizar) not in (2, 3):
+            logger.error("✗ Use: python main.py --atualizar <origem.docx> <evolucao.docx> [destino.docx]")
+            sys.exit(2)
+        logger.info(f"→ Modo: Atualização ('{args.atualizar[0]}' → '{args.atualizar[-1]}')")
+        if not executar_modo_atualizacao(*args.atualizar):
+            logger.error("\n✗ Atualização não concluída.")
+            sys.exit(1)
+        logger.info("✓ Evolução atualizada com sucesso!")
+        return
+    elif args.origem and args.destino:
+        arquivo_origem = args.origem
+        arquivo_destino = args.destino
+        logger.info(f"→ Modo: Linha de comando")
     else:
         # Modo padrão (hardcoded para uso pessoal)
         arquivo_origem = 'entrada/JOAO PAULO NUNES - Folha de frequência JULHO.docx'
         arquivo_destino = 'saida/Evolucao_Julho_Final.docx'
         logger.info(f"→ Modo: Execução padrão")
         logger.info(f"ℹ Dica: Use 'python main.py <origem.docx> <destino.docx>' para especificar arquivos")
+        logger.info(f"ℹ Dica: Use 'python main.py --entrada <pasta> --saida <pasta> [--workers N]' para processar uma pasta inteira")
+        logger.info(f"ℹ Dica: Use 'python main.py --lote <pasta|arquivo.zip> [saida]' para processar vários arquivos")
+        logger.info(f"ℹ Dica: Use 'python main.py --atualizar <origem.docx> <evolucao.docx> [destino.docx]' para atualizar uma evolução já preenchida")
         logger.info(f"ℹ Dica: Use 'python main.py --gerar-config' para criar config.json\n")
     
     # Carrega configurações
     config = carregar_configuracao()
     
-    # Validação de entrada
-    if not validar_arquivo_entrada(arquivo_origem):
+    # Validação e extração (o documento é aberto uma única vez e reaproveitado)
+    doc_origem, dados_cabecalho, dados, erros, avisos = extrair_dados_entrada(arquivo_origem, config)
+    if doc_origem is None:
         logger.error("\n✗ Processo interrompido devido a erros de validação.")
         sys.exit(1)
     
-    # Extração de dados do cabeçalho (se configurado)
-    dados_cabecalho = None
-    if config.get("extrair_cabecalho_de_entrada", False):
-        dados_cabecalho = extrair_dados_cabecalho(arquivo_origem)
-    
-    # Extração de dados das tabelas
-    dados, erros, avisos = identificar_e_extrair_tabelas(arquivo_origem, config)
-    
     if not dados:
         logger.error("\n✗ Processo interrompido: nenhum dado válido extraído.")
         sys.exit(1)
@@ -0,0 +1,137 @@
+"""
+Métricas do processamento, no formato de texto do Prometheus.
+
+Registro em memória (por processo) com histogramas de duração das etapas do
+pipeline e de tamanho dos arquivos, e contadores de registros, especialidades,
+erros e avisos. As funções de main.py registram as medições; a API as expõe
+em GET /metrics.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Faixas (limite superior) dos histogramas
+LIMITES_DURACAO_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_TAMANHO_BYTES = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216, 67_108_864)
+
+# nome: (descrição, faixas, nome do rótulo)
+HISTOGRAMAS = {
+    "folha_etapa_duracao_segundos": (
+        "Duração de cada etapa do processamento", LIMITES_DURACAO_SEGUNDOS, "etapa"
+    ),
+    "folha_arquivo_tamanho_bytes": (
+        "Tamanho dos arquivos recebidos (upload) e gerados (saida)", LIMITES_TAMANHO_BYTES, "tipo"
+    ),
+}
+
+# nome: descrição
+CONTADORES = {
+    "folha_documentos_gerados_total": "Documentos de evolução gerados",
+    "folha_documentos_atualizados_total": "Documentos de evolução atualizados (regeneração incremental)",
+    "folha_registros_extraidos_total": "Registros (atendimentos) extraídos das folhas de frequência",
+    "folha_especialidades_total": "Especialidades (tabelas) geradas nos documentos de evolução",
+    "folha_erros_parsing_total": "Linhas descartadas por horário em formato inválido",
+    "folha_avisos_data_total": "Linhas descartadas por não terem data",
+}
+
+_lock_metricas = threading.Lock()
+# nome do histograma → {rótulo: [contagem por faixa..., +Inf, soma]}
+_series_histogramas = {nome: {} for nome in HISTOGRAMAS}
+_valores_contadores = {nome: 0 for nome in CONTADORES}
+
+def observar(nome, rotulo, valor):
+    """Registra uma observação no histograma `nome`, na série do `rotulo`."""
+    limites = HISTOGRAMAS[nome][1]
+    with _lock_metricas:
+        serie = _series_histogramas[nome].get(rotulo)
+        if serie is None:
+            serie = _series_histogramas[nome][rotulo] = [0] * (len(limites) + 1) + [0.0]
+        serie[bisect_left(limites, valor)] += 1
+        serie[-1] += valor
+
+def incrementar(nome, valor=1):
+    """Soma `valor` ao contador `nome`."""
+    with _lock_metricas:
+        _valores_contadores[nome] += valor
+
+def registrar_duracao_etapa(etapa, segundos):
+    observar("folha_etapa_duracao_segundos", etapa, segundos)
+
+def registrar_tamanho_arquivo(tipo, tamanho):
+    observar("folha_arquivo_tamanho_bytes", tipo, tamanho)
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mede a duração de um bloco (with medir_etapa("x"):) ou de uma função
+    (@medir_etapa("x")) no histograma de etapas.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_duracao_etapa(etapa, time.perf_counter() - inicio)
+
+def extrair_metricas():
+    """
+    Retira as medições deste processo, zerando o registro. Usado pelos workers
+    do lote, que as devolvem ao processo principal (ver mesclar_metricas).
+    """
+    with _lock_metricas:
+        dados = {
+            "histogramas": {nome: dict(rotulos) for nome, rotulos in _series_histogramas.items()},
+            "contadores": dict(_valores_contadores)
+        }
+        for rotulos in _series_histogramas.values():
+            rotulos.clear()
+        for nome in _valores_contadores:
+            _valores_contadores[nome] = 0
+    return dados
+
+def mesclar_metricas(dados):
+    """Soma ao registro deste processo as medições retiradas de outro (extrair_metricas)."""
+    with _lock_metricas:
+        for nome, rotulos in dados["histogramas"].items():
+            for rotulo, serie in rotulos.items():
+                atual = _series_histogramas[nome].get(rotulo)
+                if atual is None:
+                    _series_histogramas[nome][rotulo] = list(serie)
+                else:
+                    for indice, valor in enumerate(serie):
+                        atual[indice] += valor
+        for nome, valor in dados["contadores"].items():
+            _valores_contadores[nome] += valor
+
+def _formatar_numero(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+def exportar_prometheus():
+    """Retorna todas as métricas no formato de exposição de texto do Prometheus."""
+    with _lock_metricas:
+        series = {nome: {rotulo: list(serie) for rotulo, serie in rotulos.items()}
+                  for nome, rotulos in _series_histogramas.items()}
+        contadores = dict(_valores_contadores)
+
+    linhas = []
+    for nome, (descricao, limites, nome_rotulo) in HISTOGRAMAS.items():
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} histogram")
+        for rotulo, serie in sorted(series[nome].items()):
+            acumulado = 0
+            for limite, contagem in zip(limites + ("+Inf",), serie):
+                acumulado += contagem
+                le = limite if limite == "+Inf" else _formatar_numero(float(limite))
+                linhas.append(f'{nome}_bucket{{{nome_rotulo}="{rotulo}",le="{le}"}} {acumulado}')
+            linhas.append(f'{nome}_sum{{{nome_rotulo}="{rotulo}"}} {_formatar_numero(serie[-1])}')
+            linhas.append(f'{nome}_count{{{nome_rotulo}="{rotulo}"}} {acumulado}')
+
+    for nome, descricao in CONTADORES.items():
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} counter")
+        linhas.append(f"{nome} {contadores[nome]}")
+
+    return "\n".join(linhas) + "\n"
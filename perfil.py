@@ -0,0 +1,149 @@
+"""
+Perfil de CPU (cProfile) e memória (tracemalloc) de uma execução, sob demanda.
+
+Usado por POST /processar (com o token de administrador) e por --perfil na
+linha de comando. Desligado, não custa nada: cProfile, pstats e tracemalloc só
+são importados e ativados dentro de executar_com_perfil. Cada execução grava,
+em DIRETORIO_PERFIS:
+- <id>.pstats: estatísticas completas do cProfile (pstats, snakeviz...);
+- <id>.json: resumo com as funções mais caras, as maiores alocações e o pico de memória.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_PERFIS = os.environ.get("DIRETORIO_PERFIS", "perfis")
+# Perfis mantidos em disco (os mais antigos são removidos)
+PERFIS_MAXIMOS = max(1, int(os.environ.get("PERFIS_MAXIMOS", "50")))
+TOP_FUNCOES = 30
+TOP_ALOCACOES = 30
+
+_FORMATO_ID = re.compile(r"[0-9a-f]{32}")
+
+# tracemalloc é global ao processo: uma execução com perfil de cada vez
+_lock_perfil = threading.Lock()
+
+def novo_id_perfil():
+    return uuid.uuid4().hex
+
+def caminhos_perfil(id_perfil):
+    """(caminho do .pstats, caminho do .json) do perfil, ou None se o id for inválido."""
+    if not _FORMATO_ID.fullmatch(id_perfil or ""):
+        return None
+    base = os.path.join(DIRETORIO_PERFIS, id_perfil)
+    return base + ".pstats", base + ".json"
+
+def carregar_resumo_perfil(id_perfil):
+    """Resumo (dict) de um perfil gravado, ou None se não existir."""
+    caminhos = caminhos_perfil(id_perfil)
+    if caminhos is None or not os.path.exists(caminhos[1]):
+        return None
+    with open(caminhos[1], encoding="utf-8") as f:
+        return json.load(f)
+
+def _resumir_funcoes(estatisticas):
+    """Funções com maior tempo acumulado (inclui as chamadas internas)."""
+    funcoes = sorted(estatisticas.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "funcao": f"{arquivo}:{linha}({nome})",
+            "chamadas": chamadas,
+            "tempo_proprio_s": round(tempo_proprio, 6),
+            "tempo_acumulado_s": round(tempo_acumulado, 6)
+        }
+        for (arquivo, linha, nome), (_, chamadas, tempo_proprio, tempo_acumulado, _) in funcoes[:TOP_FUNCOES]
+    ]
+
+def _resumir_alocacoes(snapshot_inicio, snapshot_fim):
+    """Linhas de código que mais alocaram memória ainda em uso ao fim da execução."""
+    import tracemalloc
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diferencas = snapshot_fim.filter_traces(filtros).compare_to(snapshot_inicio.filter_traces(filtros), "lineno")
+    return [
+        {
+            "local": f"{diferenca.traceback[0].filename}:{diferenca.traceback[0].lineno}",
+            "tamanho_bytes": diferenca.size_diff,
+            "blocos": diferenca.count_diff
+        }
+        for diferenca in diferencas[:TOP_ALOCACOES] if diferenca.size_diff > 0
+    ]
+
+def _remover_perfis_antigos():
+    resumos = [
+        os.path.join(DIRETORIO_PERFIS, nome) for nome in os.listdir(DIRETORIO_PERFIS) if nome.endswith(".json")
+    ]
+    resumos.sort(key=os.path.getmtime)
+    for caminho in resumos[:-PERFIS_MAXIMOS]:
+        for arquivo in (caminho, caminho[:-len(".json")] + ".pstats"):
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+
+def executar_com_perfil(id_perfil, descricao, funcao, *args):
+    """
+    Executa funcao(*args) sob cProfile e tracemalloc e grava o perfil com o id
+    informado (mesmo se a função lançar exceção). Retorna o resultado da função.
+
+    O cProfile mede só a thread que chama; o tracemalloc vê as alocações de todo
+    o processo, por isso as execuções com perfil são serializadas.
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    caminho_pstats, caminho_resumo = caminhos_perfil(id_perfil)
+    with _lock_perfil:
+        ja_rastreando = tracemalloc.is_tracing()
+        if not ja_rastreando:
+            tracemalloc.start()
+        memoria_inicio = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        snapshot_inicio = tracemalloc.take_snapshot()
+        perfilador = cProfile.Profile()
+        erro = None
+        inicio = time.perf_counter()
+        perfilador.enable()
+        try:
+            return funcao(*args)
+        except BaseException as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            perfilador.disable()
+            duracao = time.perf_counter() - inicio
+            snapshot_fim = tracemalloc.take_snapshot()
+            pico = tracemalloc.get_traced_memory()[1]
+            if not ja_rastreando:
+                tracemalloc.stop()
+
+            try:
+                os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+                estatisticas = pstats.Stats(perfilador)
+                estatisticas.dump_stats(caminho_pstats)
+                resumo = {
+                    "id": id_perfil,
+                    "descricao": descricao,
+                    "criado_em": datetime.now().isoformat(timespec="seconds"),
+                    "duracao_segundos": round(duracao, 4),
+                    "erro": erro,
+                    "memoria_pico_bytes": max(0, pico - memoria_inicio),
+                    "funcoes": _resumir_funcoes(estatisticas),
+                    "alocacoes": _resumir_alocacoes(snapshot_inicio, snapshot_fim)
+                }
+                with open(caminho_resumo, "w", encoding="utf-8") as f:
+                    json.dump(resumo, f, ensure_ascii=False, indent=2)
+                _remover_perfis_antigos()
+                logger.info(f"Perfil {id_perfil} gravado em {DIRETORIO_PERFIS}/ "
+                            f"({duracao:.2f}s, pico {resumo['memoria_pico_bytes'] / 1024:.0f} KB)")
+            except Exception as e:
+                logger.error(f"Nao foi possivel gravar o perfil {id_perfil}: {e}")